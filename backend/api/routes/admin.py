@@ -1,33 +1,50 @@
 """Admin API routes."""
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Header, Query
+from fastapi.responses import FileResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import Optional
 from backend.db.database import get_db
-from backend.db.models import Product, Order, Inventory, AdminUser, OrderStatus
+from backend.db.models import Product, Order, Inventory, AdminUser, OrderStatus, MovementKind
 from backend.models.product import ProductCreate, ProductUpdate, ProductResponse
 from backend.models.order import OrderUpdate, OrderListResponse, OrderResponse
+from backend.db.slow_queries import slow_queries
+from backend.app.profiling import list_profiles, profile_path
+from backend.app.responses import ORJSONResponse
 from backend.services.inventory import InventoryService
-from passlib.context import CryptContext
+from backend.services.inventory_ledger import InventoryLedger
+from backend.services.order_payments import OrderPaymentService
+from backend.services.rate_limit import client_ip, limit_by_ip, rate_limiter
+from backend.api.routes.orders import ORDER_DETAIL
+from backend.services.order_search import OrderSearchService, MIN_SUBSTRING_LENGTH
 from jose import JWTError, jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from backend.app.config import get_settings
 
 router = APIRouter()
 settings = get_settings()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 SECRET_KEY = "your-secret-key-change-in-production"  # Should be in settings
 ALGORITHM = "HS256"
 
 
+@lru_cache
+def pwd_context():
+    """Build the password hashing context on first login (passlib is slow to import)."""
+    from passlib.context import CryptContext
+    
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password."""
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -42,6 +59,22 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def decode_access_token(authorization: str) -> Optional[str]:
+    """Return the username from a "Bearer <jwt>" header value, or None if invalid."""
+    try:
+        token = authorization.replace("Bearer ", "")
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
+def active_admin(db: Session, username: str) -> Optional[AdminUser]:
+    """Return the admin named in a token, or None if it no longer exists or is inactive."""
+    admin = db.query(AdminUser).filter(AdminUser.username == username).first()
+    return admin if admin and admin.is_active else None
+
+
 async def get_current_admin(
     authorization: Optional[str] = Header(None),
     db: Session = Depends(get_db)
@@ -53,23 +86,15 @@ async def get_current_admin(
             detail="Authorization header missing"
         )
     
-    try:
-        token = authorization.replace("Bearer ", "")
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-    except JWTError:
+    username = decode_access_token(authorization)
+    if username is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
         )
     
-    admin = db.query(AdminUser).filter(AdminUser.username == username).first()
-    if not admin or not admin.is_active:
+    admin = active_admin(db, username)
+    if not admin:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Admin user not found or inactive"
@@ -78,13 +103,19 @@ async def get_current_admin(
     return admin
 
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(limit_by_ip("login"))])
 async def admin_login(
+    request: Request,
     username: str,
     password: str,
     db: Session = Depends(get_db)
 ):
     """Admin login endpoint."""
+    # Checked before bcrypt. Guesses at one account are throttled per IP, plus a
+    # much higher limit across IPs, so a single client cannot lock the admin out.
+    await rate_limiter.enforce("login", f"user:{username}|ip:{client_ip(request)}")
+    await rate_limiter.enforce("login_user", f"user:{username}")
+    
     admin = db.query(AdminUser).filter(AdminUser.username == username).first()
     
     if not admin or not verify_password(password, admin.hashed_password):
@@ -128,24 +159,13 @@ async def create_product(
         quantity=product_data.initial_stock,
         low_stock_threshold=product_data.low_stock_threshold,
     )
+    inventory.sync_stock_flags()
     db.add(inventory)
+    InventoryLedger(db).record(product.id, product_data.initial_stock, MovementKind.RESTOCK, note="initial stock")
     db.commit()
     db.refresh(product)
     
-    return ProductResponse(
-        id=product.id,
-        name=product.name,
-        description=product.description,
-        price_cad=product.price_cad,
-        image_url=product.image_url,
-        specifications=product.specifications,
-        is_active=product.is_active,
-        created_at=product.created_at,
-        updated_at=product.updated_at,
-        stock_quantity=inventory.quantity,
-        is_in_stock=inventory.quantity > 0,
-        is_low_stock=inventory.quantity <= inventory.low_stock_threshold,
-    )
+    return ORJSONResponse(ProductResponse.payload(product, inventory), status_code=status.HTTP_201_CREATED)
 
 
 @router.put("/products/{product_id}", response_model=ProductResponse)
@@ -182,20 +202,7 @@ async def update_product(
     
     inventory = db.query(Inventory).filter(Inventory.product_id == product.id).first()
     
-    return ProductResponse(
-        id=product.id,
-        name=product.name,
-        description=product.description,
-        price_cad=product.price_cad,
-        image_url=product.image_url,
-        specifications=product.specifications,
-        is_active=product.is_active,
-        created_at=product.created_at,
-        updated_at=product.updated_at,
-        stock_quantity=inventory.quantity if inventory else 0,
-        is_in_stock=(inventory.quantity > 0) if inventory else False,
-        is_low_stock=(inventory.quantity <= inventory.low_stock_threshold) if inventory else False,
-    )
+    return ORJSONResponse(ProductResponse.payload(product, inventory))
 
 
 @router.delete("/products/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -220,6 +227,38 @@ async def delete_product(
 
 
 # Order management
+@router.get("/orders/search", response_model=OrderListResponse)
+async def search_orders(
+    email: Optional[str] = Query(None, min_length=MIN_SUBSTRING_LENGTH),
+    name: Optional[str] = Query(None, min_length=MIN_SUBSTRING_LENGTH),
+    order_number: Optional[str] = Query(None, min_length=1, description="Order number prefix"),
+    tracking_number: Optional[str] = Query(None, min_length=MIN_SUBSTRING_LENGTH),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    status_filter: Optional[OrderStatus] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Search orders by customer email/name, order number prefix, tracking number and date range."""
+    orders, total = OrderSearchService(db).search(
+        skip=skip,
+        limit=limit,
+        email=email,
+        name=name,
+        order_number=order_number,
+        tracking_number=tracking_number,
+        created_from=created_from,
+        created_to=created_to,
+        status=status_filter,
+    )
+    return ORJSONResponse({
+        "orders": [OrderResponse.payload(order) for order in orders],
+        "total": total,
+    })
+
+
 @router.put("/orders/{order_id}", response_model=OrderResponse)
 async def update_order(
     order_id: int,
@@ -236,7 +275,10 @@ async def update_order(
             detail=f"Order with ID {order_id} not found"
         )
     
-    if order_data.status is not None:
+    if order_data.status == OrderStatus.CANCELLED:
+        # Locks the order and returns its stock
+        OrderPaymentService(db).cancel(order)
+    elif order_data.status is not None:
         order.status = order_data.status
         if order_data.status == OrderStatus.SHIPPED:
             order.shipped_at = datetime.utcnow()
@@ -247,48 +289,9 @@ async def update_order(
         order.tracking_number = order_data.tracking_number
     
     db.commit()
-    db.refresh(order)
-    
-    # Get order items for response
-    from backend.db.models import OrderItem
-    items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-    from backend.db.models import Product
-    item_responses = []
-    for item in items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        item_responses.append({
-            "id": item.id,
-            "product_id": item.product_id,
-            "product_name": product.name if product else "Unknown",
-            "quantity": item.quantity,
-            "price_cad": item.price_cad,
-            "subtotal_cad": item.quantity * item.price_cad,
-        })
     
-    return OrderResponse(
-        id=order.id,
-        order_number=order.order_number,
-        status=order.status,
-        payment_method=order.payment_method,
-        customer_name=order.customer_name,
-        customer_email=order.customer_email,
-        customer_phone=order.customer_phone,
-        shipping_address_line1=order.shipping_address_line1,
-        shipping_address_line2=order.shipping_address_line2,
-        shipping_city=order.shipping_city,
-        shipping_state=order.shipping_state,
-        shipping_postal_code=order.shipping_postal_code,
-        shipping_country=order.shipping_country,
-        subtotal_cad=order.subtotal_cad,
-        shipping_cost_cad=order.shipping_cost_cad,
-        total_cad=order.total_cad,
-        tracking_number=order.tracking_number,
-        items=item_responses,
-        created_at=order.created_at,
-        updated_at=order.updated_at,
-        shipped_at=order.shipped_at,
-        delivered_at=order.delivered_at,
-    )
+    order = db.query(Order).options(ORDER_DETAIL).filter(Order.id == order.id).first()
+    return ORJSONResponse(OrderResponse.payload(order))
 
 
 @router.get("/dashboard/stats")
@@ -302,16 +305,13 @@ async def get_dashboard_stats(
     pending_orders = db.query(Order).filter(Order.status == OrderStatus.PENDING).count()
     paid_orders = db.query(Order).filter(Order.status == OrderStatus.PAID).count()
     
-    # Low stock products
-    low_stock_products = db.query(Inventory).join(Product).filter(
-        Inventory.quantity <= Inventory.low_stock_threshold,
-        Product.is_active == True
-    ).count()
+    # Low stock products (flagged at write time, see InventoryService)
+    low_stock_products = InventoryService(db).count_low_stock_products()
     
     # Total revenue
     total_revenue = db.query(Order).filter(
         Order.status.in_([OrderStatus.PAID, OrderStatus.PROCESSING, OrderStatus.SHIPPED, OrderStatus.DELIVERED])
-    ).with_entities(db.func.sum(Order.total_cad)).scalar() or 0.0
+    ).with_entities(func.sum(Order.total_cad)).scalar() or 0.0
     
     return {
         "total_products": total_products,
@@ -323,6 +323,122 @@ async def get_dashboard_stats(
     }
 
 
+# Inventory
+@router.get("/inventory/low-stock")
+async def get_low_stock_inventory(
+    db: Session = Depends(get_db),
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """List active products currently flagged as low stock."""
+    return {"products": InventoryService(db).get_low_stock_products()}
+
+
+@router.get("/inventory/out-of-stock")
+async def get_out_of_stock_inventory(
+    db: Session = Depends(get_db),
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """List active products currently flagged as out of stock."""
+    return {"products": InventoryService(db).get_out_of_stock_products()}
 
 
+@router.put("/inventory/{product_id}/shards")
+async def set_inventory_shards(
+    product_id: int,
+    shard_count: int = Query(..., ge=0, le=64),
+    db: Session = Depends(get_db),
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Flag a SKU as hot by spreading its stock over ``shard_count`` rows (0 unflags it)."""
+    inventory_service = InventoryService(db)
+    if not inventory_service.set_hot(product_id, shard_count):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Inventory for product {product_id} not found"
+        )
+    return {"product_id": product_id, "shard_count": shard_count, "quantity": inventory_service.get_stock(product_id)}
+
+
+@router.get("/inventory/{product_id}/movements")
+async def get_inventory_movements(
+    product_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    before_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """List a product's stock movements, newest first (page with ``before_id``)."""
+    movements = InventoryLedger(db).movements(product_id, limit, before_id)
+    return {
+        "movements": [
+            {
+                "id": movement.id,
+                "kind": movement.kind,
+                "delta": movement.delta,
+                "order_id": movement.order_id,
+                "note": movement.note,
+                "created_at": movement.created_at,
+            }
+            for movement in movements
+        ],
+        "next_before_id": movements[-1].id if len(movements) == limit else None,
+    }
+
+
+@router.get("/inventory/{product_id}/stock-at")
+async def get_stock_at(
+    product_id: int,
+    at: datetime,
+    db: Session = Depends(get_db),
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Reconstruct a product's stock at a past moment from snapshots and the ledger."""
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    return {"product_id": product_id, "at": at, "quantity": InventoryLedger(db).stock_at(product_id, at)}
+
+
+# Diagnostics
+@router.get("/diagnostics/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(50, ge=1, le=1000),
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """List recently recorded slow SQL statements (newest first)."""
+    return {
+        "threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+        "queries": slow_queries.recent(limit),
+    }
+
+
+@router.delete("/diagnostics/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_slow_queries(
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Clear the slow-query buffer."""
+    slow_queries.clear()
+    return None
+
+
+@router.get("/diagnostics/profiles")
+async def get_profiles(
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """List captured request profiles (newest first)."""
+    return {"profiles": list_profiles()}
+
+
+@router.get("/diagnostics/profiles/{name}")
+async def download_profile(
+    name: str,
+    current_admin: AdminUser = Depends(get_current_admin)
+):
+    """Download a captured profile as speedscope JSON (open at https://www.speedscope.app)."""
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile {name} not found"
+        )
+    return FileResponse(path, media_type="application/json", filename=name)
 
@@ -1,32 +1,69 @@
 """Checkout API routes."""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from datetime import datetime
-import uuid
-from backend.db.database import get_db
-from backend.db.models import Order, OrderItem, Product, Inventory, OrderStatus, PaymentMethod
-from backend.models.order import CheckoutRequest, OrderResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Header
+from sqlalchemy.orm import Session, joinedload
+from typing import Optional
+from backend.db.database import get_db, get_read_db
+from backend.db.models import Order, OrderItem, Product, OrderStatus, PaymentMethod
+from backend.models.order import AdmissionRequest, AdmissionResponse, CheckoutRequest, OrderResponse
 from backend.app.config import get_settings
+from backend.app import tracing
+from backend.app.responses import ORJSONResponse
+from backend.api.routes.orders import ORDER_DETAIL
 from backend.services.payment import PaymentService
 from backend.services.email import EmailService
+from backend.services.inventory import InventoryService
+from backend.services.order_numbers import order_numbers
+from backend.services.order_payments import OrderPaymentService, PaymentOutcome
+from backend.services.rate_limit import limit_by_ip, rate_limiter
+from backend.services.waiting_room import waiting_room
 
 router = APIRouter()
 settings = get_settings()
 
 
-@router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
-async def create_checkout(
-    checkout_data: CheckoutRequest,
-    db: Session = Depends(get_db)
+@router.post(
+    "/admission",
+    response_model=AdmissionResponse,
+    dependencies=[Depends(limit_by_ip("admission"))],
+)
+async def request_admission(
+    admission: AdmissionRequest,
+    db: Session = Depends(get_read_db)
 ):
-    """Create a new order from checkout."""
-    
+    """Ask to check out a cart (the launch-day waiting room).
+    
+    Returns an admission token to send as ``X-Admission-Token`` on checkout,
+    or 202 with ``Retry-After`` while the remaining stock is held by other
+    buyers. Answers 409 once the stock can no longer cover the cart.
+    """
+    if not settings.WAITING_ROOM_ENABLED:
+        return ORJSONResponse({"status": "admitted"})
+    
+    result = await waiting_room.admit(db, admission.quantities())
+    if result["status"] == "waiting":
+        return ORJSONResponse(
+            result,
+            status_code=status.HTTP_202_ACCEPTED,
+            headers={"Retry-After": str(result["retry_after"])},
+        )
+    return ORJSONResponse(result)
+
+
+def _place_order(db: Session, checkout_data: CheckoutRequest) -> tuple[Order, InventoryService]:
+    """Validate the cart, create the order and deduct its stock, then commit."""
     # Validate products and check inventory
     subtotal = 0.0
     order_items_data = []
     
+    # Load every product with its inventory row in one query
+    product_ids = {item.product_id for item in checkout_data.items}
+    products = {
+        product.id: product
+        for product in db.query(Product).options(joinedload(Product.inventory)).filter(Product.id.in_(product_ids))
+    }
+    
     for item in checkout_data.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
+        product = products.get(item.product_id)
         if not product:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -39,14 +76,6 @@ async def create_checkout(
                 detail=f"Product {product.name} is not available"
             )
         
-        # Check inventory
-        inventory = db.query(Inventory).filter(Inventory.product_id == product.id).first()
-        if not inventory or inventory.quantity < item.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Insufficient stock for {product.name}. Available: {inventory.quantity if inventory else 0}"
-            )
-        
         item_total = product.price_cad * item.quantity
         subtotal += item_total
         order_items_data.append({
@@ -55,12 +84,22 @@ async def create_checkout(
             "price": product.price_cad
         })
     
+    # Check inventory against the cart's total per product, since a product may be on several lines
+    quantities = checkout_data.quantities()
+    for product_id, quantity in quantities.items():
+        inventory = products[product_id].inventory
+        if not inventory or inventory.stock_quantity < quantity:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient stock for {products[product_id].name}. Available: {inventory.stock_quantity if inventory else 0}"
+            )
+    
     # Calculate shipping
     shipping_cost = settings.SHIPPING_COST_CAD
     total = subtotal + shipping_cost
     
     # Generate order number
-    order_number = f"ORD-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:8].upper()}"
+    order_number = order_numbers.generate()
     
     # Create order
     order = Order(
@@ -79,6 +118,7 @@ async def create_checkout(
         subtotal_cad=subtotal,
         shipping_cost_cad=shipping_cost,
         total_cad=total,
+        trace_parent=tracing.current_traceparent(),
     )
     
     db.add(order)
@@ -96,61 +136,62 @@ async def create_checkout(
     
     # Reserve inventory (will be confirmed on payment)
     # For now, we'll deduct immediately. In production, you might want to reserve first
-    for item_data in order_items_data:
-        inventory = db.query(Inventory).filter(Inventory.product_id == item_data["product"].id).first()
-        if inventory:
-            inventory.quantity -= item_data["quantity"]
-            db.commit()
+    inventory_service = InventoryService(db)
+    with tracing.span("checkout.reserve_inventory", **{"order.id": order.id}):
+        # Product id order, so concurrent checkouts lock rows in the same order
+        for product_id in sorted(quantities):
+            product = products[product_id]
+            if not inventory_service.deduct_inventory(product.inventory, quantities[product_id], order.id):
+                # Another checkout took the stock since it was checked above
+                db.rollback()
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Insufficient stock for {product.name}"
+                )
+        
+        db.commit()
     
-    db.commit()
+    return order, inventory_service
+
+
+@router.post(
+    "/",
+    response_model=OrderResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limit_by_ip("checkout"))],
+)
+async def create_checkout(
+    checkout_data: CheckoutRequest,
+    db: Session = Depends(get_db),
+    admission_token: Optional[str] = Header(None, alias="X-Admission-Token")
+):
+    """Create a new order from checkout."""
+    await rate_limiter.enforce("checkout", f"email:{checkout_data.shipping_address.email}")
+    admission = None
+    if settings.WAITING_ROOM_ENABLED:
+        admission = await waiting_room.verify(admission_token, checkout_data.quantities())
+    
+    try:
+        order, inventory_service = _place_order(db, checkout_data)
+    except Exception:
+        # No order was placed, so the admission can be used again
+        await waiting_room.restore(admission)
+        raise
+    inventory_service.send_pending_alerts()
+    await waiting_room.release(admission)
     db.refresh(order)
     
     # Send order confirmation email
     try:
-        email_service = EmailService()
-        await email_service.send_order_confirmation(order, db)
+        with tracing.span("email.order_confirmation", **{"order.id": order.id}):
+            email_service = EmailService()
+            await email_service.send_order_confirmation(order, db)
     except Exception:
         # Silently fail - don't block order creation
         pass
     
-    # Get order items for response
-    items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-    item_responses = []
-    for item in items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        item_responses.append({
-            "id": item.id,
-            "product_id": item.product_id,
-            "product_name": product.name if product else "Unknown",
-            "quantity": item.quantity,
-            "price_cad": item.price_cad,
-            "subtotal_cad": item.quantity * item.price_cad,
-        })
-    
-    return OrderResponse(
-        id=order.id,
-        order_number=order.order_number,
-        status=order.status,
-        payment_method=order.payment_method,
-        customer_name=order.customer_name,
-        customer_email=order.customer_email,
-        customer_phone=order.customer_phone,
-        shipping_address_line1=order.shipping_address_line1,
-        shipping_address_line2=order.shipping_address_line2,
-        shipping_city=order.shipping_city,
-        shipping_state=order.shipping_state,
-        shipping_postal_code=order.shipping_postal_code,
-        shipping_country=order.shipping_country,
-        subtotal_cad=order.subtotal_cad,
-        shipping_cost_cad=order.shipping_cost_cad,
-        total_cad=order.total_cad,
-        tracking_number=order.tracking_number,
-        items=item_responses,
-        created_at=order.created_at,
-        updated_at=order.updated_at,
-        shipped_at=order.shipped_at,
-        delivered_at=order.delivered_at,
-    )
+    order = db.query(Order).options(ORDER_DETAIL).filter(Order.id == order.id).first()
+    return ORJSONResponse(OrderResponse.payload(order), status_code=status.HTTP_201_CREATED)
 
 
 @router.post("/{order_id}/payment-confirm")
@@ -168,9 +209,14 @@ async def confirm_payment(
             detail=f"Order with ID {order_id} not found"
         )
     
-    order.payment_id = payment_id
-    order.status = OrderStatus.PAID
-    db.commit()
+    outcome = OrderPaymentService(db).mark_paid(order, payment_id)
+    if outcome == PaymentOutcome.REFUND_DUE:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Order {order_id} was cancelled and its stock is gone; the payment must be refunded"
+        )
+    if outcome == PaymentOutcome.IGNORED:
+        return {"message": "Payment already recorded", "order_id": order_id}
     
     # Send payment confirmation email
     try:
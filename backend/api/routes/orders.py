@@ -1,79 +1,120 @@
 """Order API routes."""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from backend.db.database import get_db
-from backend.db.models import Order, OrderItem, OrderStatus, Product
+import asyncio
+import math
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, selectinload
+from typing import Iterator, List, Optional
+from backend.app.config import get_settings
+from backend.app import responses
+from backend.app.responses import ORJSONResponse
+from backend.db.database import get_read_db, SessionLocal
+from backend.db.models import Order, OrderItem, OrderStatus
 from backend.models.order import OrderResponse, OrderUpdate, OrderListResponse
-from sqlalchemy import desc
+from backend.services.order_archive import order_archive
+from sqlalchemy import desc, tuple_
 
 router = APIRouter()
+settings = get_settings()
+
+# Items and their products are loaded in two IN queries instead of one per row
+ORDER_DETAIL = selectinload(Order.items).selectinload(OrderItem.product)
+
+
+def stream_orders(
+    bind,
+    skip: int,
+    limit: int,
+    status_filter: Optional[OrderStatus],
+    chunk_size: int,
+) -> Iterator[bytes]:
+    """Yield an ``OrderListResponse`` body, paging through orders with a keyset cursor.
+    
+    Each page of ``chunk_size`` orders is loaded, encoded and then expunged
+    from the session, so memory is bounded by the chunk size rather than
+    ``limit``. Runs after the request's session is closed, so it opens its own
+    on the same engine (primary or replica).
+    """
+    db = SessionLocal(bind=bind)
+    try:
+        query = db.query(Order)
+        if status_filter:
+            query = query.filter(Order.status == status_filter)
+        total = query.count()
+        
+        yield b'{"orders":['
+        separator = b""
+        cursor = None
+        remaining = limit
+        while remaining > 0:
+            page = query.options(ORDER_DETAIL).order_by(desc(Order.created_at), desc(Order.id))
+            if cursor is None:
+                page = page.offset(skip)
+            else:
+                page = page.filter(tuple_(Order.created_at, Order.id) < tuple_(*cursor))
+            page_size = min(chunk_size, remaining)
+            orders = page.limit(page_size).all()
+            if orders:
+                yield separator + b",".join(responses.dumps(OrderResponse.payload(order)) for order in orders)
+                separator = b","
+                cursor = (orders[-1].created_at, orders[-1].id)
+            if len(orders) < page_size:
+                break
+            remaining -= page_size
+            db.expunge_all()
+        yield b'],"total":' + str(total).encode() + b"}"
+    finally:
+        db.close()
 
 
 @router.get("/", response_model=OrderListResponse)
 async def list_orders(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     status_filter: Optional[OrderStatus] = None,
-    db: Session = Depends(get_db)
+    stream: bool = False,
+    db: Session = Depends(get_read_db)
 ):
-    """List all orders."""
+    """List all orders.
+    
+    With ``stream=true`` the same body is streamed in pages of
+    ``ORDER_STREAM_CHUNK_SIZE`` orders; use it for large ``limit`` values.
+    """
+    if stream:
+        chunk_size = settings.ORDER_STREAM_CHUNK_SIZE
+        # One count plus three statements per page, repeating by design
+        request.state.query_budget = 1 + 3 * max(math.ceil(limit / chunk_size), 1)
+        request.state.allow_repeated_queries = True
+        return StreamingResponse(
+            stream_orders(db.get_bind(), skip, limit, status_filter, chunk_size),
+            media_type="application/json",
+        )
+    
     query = db.query(Order)
     
     if status_filter:
         query = query.filter(Order.status == status_filter)
     
     total = query.count()
-    orders = query.order_by(desc(Order.created_at)).offset(skip).limit(limit).all()
-    
-    order_responses = []
-    for order in orders:
-        items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-        item_responses = []
-        for item in items:
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            item_responses.append({
-                "id": item.id,
-                "product_id": item.product_id,
-                "product_name": product.name if product else "Unknown",
-                "quantity": item.quantity,
-                "price_cad": item.price_cad,
-                "subtotal_cad": item.quantity * item.price_cad,
-            })
-        
-        order_dict = {
-            "id": order.id,
-            "order_number": order.order_number,
-            "status": order.status,
-            "payment_method": order.payment_method,
-            "customer_name": order.customer_name,
-            "customer_email": order.customer_email,
-            "customer_phone": order.customer_phone,
-            "shipping_address_line1": order.shipping_address_line1,
-            "shipping_address_line2": order.shipping_address_line2,
-            "shipping_city": order.shipping_city,
-            "shipping_state": order.shipping_state,
-            "shipping_postal_code": order.shipping_postal_code,
-            "shipping_country": order.shipping_country,
-            "subtotal_cad": order.subtotal_cad,
-            "shipping_cost_cad": order.shipping_cost_cad,
-            "total_cad": order.total_cad,
-            "tracking_number": order.tracking_number,
-            "items": item_responses,
-            "created_at": order.created_at,
-            "updated_at": order.updated_at,
-            "shipped_at": order.shipped_at,
-            "delivered_at": order.delivered_at,
-        }
-        order_responses.append(OrderResponse(**order_dict))
+    orders = (
+        query.options(ORDER_DETAIL)
+        .order_by(desc(Order.created_at), desc(Order.id))
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
     
-    return OrderListResponse(orders=order_responses, total=total)
+    return ORJSONResponse({
+        "orders": [OrderResponse.payload(order) for order in orders],
+        "total": total,
+    })
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
-async def get_order(order_id: int, db: Session = Depends(get_db)):
+async def get_order(order_id: int, db: Session = Depends(get_read_db)):
     """Get a single order by ID."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = db.query(Order).options(ORDER_DETAIL).filter(Order.id == order_id).first()
     
     if not order:
         raise HTTPException(
@@ -81,93 +122,22 @@ async def get_order(order_id: int, db: Session = Depends(get_db)):
             detail=f"Order with ID {order_id} not found"
         )
     
-    items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-    from backend.db.models import Product
-    item_responses = []
-    for item in items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        item_responses.append({
-            "id": item.id,
-            "product_id": item.product_id,
-            "product_name": product.name if product else "Unknown",
-            "quantity": item.quantity,
-            "price_cad": item.price_cad,
-            "subtotal_cad": item.quantity * item.price_cad,
-        })
-    
-    return OrderResponse(
-        id=order.id,
-        order_number=order.order_number,
-        status=order.status,
-        payment_method=order.payment_method,
-        customer_name=order.customer_name,
-        customer_email=order.customer_email,
-        customer_phone=order.customer_phone,
-        shipping_address_line1=order.shipping_address_line1,
-        shipping_address_line2=order.shipping_address_line2,
-        shipping_city=order.shipping_city,
-        shipping_state=order.shipping_state,
-        shipping_postal_code=order.shipping_postal_code,
-        shipping_country=order.shipping_country,
-        subtotal_cad=order.subtotal_cad,
-        shipping_cost_cad=order.shipping_cost_cad,
-        total_cad=order.total_cad,
-        tracking_number=order.tracking_number,
-        items=item_responses,
-        created_at=order.created_at,
-        updated_at=order.updated_at,
-        shipped_at=order.shipped_at,
-        delivered_at=order.delivered_at,
-    )
+    return ORJSONResponse(OrderResponse.payload(order))
 
 
 @router.get("/by-number/{order_number}", response_model=OrderResponse)
-async def get_order_by_number(order_number: str, db: Session = Depends(get_db)):
-    """Get an order by order number."""
-    order = db.query(Order).filter(Order.order_number == order_number).first()
+async def get_order_by_number(order_number: str, db: Session = Depends(get_read_db)):
+    """Get an order by order number, falling back to the archive for old orders."""
+    order = db.query(Order).options(ORDER_DETAIL).filter(Order.order_number == order_number).first()
     
-    if not order:
+    if order:
+        return ORJSONResponse(OrderResponse.payload(order))
+    
+    archived = await asyncio.to_thread(order_archive.find, order_number)
+    if not archived:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Order with number {order_number} not found"
         )
     
-    items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-    from backend.db.models import Product
-    item_responses = []
-    for item in items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        item_responses.append({
-            "id": item.id,
-            "product_id": item.product_id,
-            "product_name": product.name if product else "Unknown",
-            "quantity": item.quantity,
-            "price_cad": item.price_cad,
-            "subtotal_cad": item.quantity * item.price_cad,
-        })
-    
-    return OrderResponse(
-        id=order.id,
-        order_number=order.order_number,
-        status=order.status,
-        payment_method=order.payment_method,
-        customer_name=order.customer_name,
-        customer_email=order.customer_email,
-        customer_phone=order.customer_phone,
-        shipping_address_line1=order.shipping_address_line1,
-        shipping_address_line2=order.shipping_address_line2,
-        shipping_city=order.shipping_city,
-        shipping_state=order.shipping_state,
-        shipping_postal_code=order.shipping_postal_code,
-        shipping_country=order.shipping_country,
-        subtotal_cad=order.subtotal_cad,
-        shipping_cost_cad=order.shipping_cost_cad,
-        total_cad=order.total_cad,
-        tracking_number=order.tracking_number,
-        items=item_responses,
-        created_at=order.created_at,
-        updated_at=order.updated_at,
-        shipped_at=order.shipped_at,
-        delivered_at=order.delivered_at,
-    )
-
+    return ORJSONResponse(archived, headers={"X-Order-Archived": "true"})
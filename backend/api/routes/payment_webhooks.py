@@ -2,15 +2,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Header
 from sqlalchemy.orm import Session
 from backend.db.database import get_db
-from backend.db.models import Order, OrderStatus
+from backend.app import tracing
+from backend.db.models import Order
 from backend.services.payment import PaymentService
+from backend.services.order_payments import OrderPaymentService, PaymentOutcome
 from backend.services.email import EmailService
+from backend.services.rate_limit import limit_by_ip
 import json
 
 router = APIRouter()
 
 
-@router.post("/stripe")
+@router.post("/stripe", dependencies=[Depends(limit_by_ip("webhook"))])
 async def stripe_webhook(
     request: Request,
     db: Session = Depends(get_db)
@@ -42,16 +45,17 @@ async def stripe_webhook(
         if order_id:
             order = db.query(Order).filter(Order.id == int(order_id)).first()
             if order:
-                order.payment_id = payment_intent["id"]
-                order.status = OrderStatus.PAID
-                db.commit()
-                
-                # Send payment confirmation email
-                try:
-                    email_service = EmailService()
-                    await email_service.send_payment_confirmation(order, db)
-                except Exception:
-                    pass
+                with tracing.span("webhook.stripe.payment_succeeded", parent=order.trace_parent, **{"order.id": order.id}):
+                    outcome = OrderPaymentService(db).mark_paid(order, payment_intent["id"])
+                    
+                    # Send payment confirmation email
+                    if outcome in (PaymentOutcome.PAID, PaymentOutcome.REINSTATED):
+                        try:
+                            with tracing.span("email.payment_confirmation"):
+                                email_service = EmailService()
+                                await email_service.send_payment_confirmation(order, db)
+                        except Exception:
+                            pass
     
     elif event["type"] == "payment_intent.payment_failed":
         payment_intent = event["data"]["object"]
@@ -60,13 +64,13 @@ async def stripe_webhook(
         if order_id:
             order = db.query(Order).filter(Order.id == int(order_id)).first()
             if order:
-                order.status = OrderStatus.CANCELLED
-                db.commit()
+                with tracing.span("webhook.stripe.payment_failed", parent=order.trace_parent, **{"order.id": order.id}):
+                    OrderPaymentService(db).mark_failed(order)
     
     return {"status": "success"}
 
 
-@router.post("/paypal")
+@router.post("/paypal", dependencies=[Depends(limit_by_ip("webhook"))])
 async def paypal_webhook(
     request: Request,
     db: Session = Depends(get_db)
@@ -95,16 +99,17 @@ async def paypal_webhook(
         if custom:
             order = db.query(Order).filter(Order.id == int(custom)).first()
             if order:
-                order.payment_id = resource.get("id")
-                order.status = OrderStatus.PAID
-                db.commit()
-                
-                # Send payment confirmation email
-                try:
-                    email_service = EmailService()
-                    await email_service.send_payment_confirmation(order, db)
-                except Exception:
-                    pass
+                with tracing.span("webhook.paypal.sale_completed", parent=order.trace_parent, **{"order.id": order.id}):
+                    outcome = OrderPaymentService(db).mark_paid(order, resource.get("id"))
+                    
+                    # Send payment confirmation email
+                    if outcome in (PaymentOutcome.PAID, PaymentOutcome.REINSTATED):
+                        try:
+                            with tracing.span("email.payment_confirmation"):
+                                email_service = EmailService()
+                                await email_service.send_payment_confirmation(order, db)
+                        except Exception:
+                            pass
     
     return {"status": "success"}
 
@@ -1,80 +1,98 @@
 """Product API routes."""
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from backend.db.database import get_db
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional
+from backend.app.responses import ORJSONResponse
+from backend.db.database import SessionLocal, engine, get_read_db
 from backend.db.models import Product, Inventory
 from backend.models.product import ProductResponse, ProductCreate, ProductUpdate, ProductListResponse
+from backend.services.catalog_cache import DATABASE_ERRORS, catalog_cache
+from backend.services.single_flight import single_flight
 
 router = APIRouter()
 
 
-@router.get("/", response_model=ProductListResponse)
-async def list_products(
-    active_only: bool = True,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
-):
-    """List all products."""
+def _product_page(db: Session, active_only: bool, skip: int, limit: int) -> dict:
     query = db.query(Product)
     
     if active_only:
         query = query.filter(Product.is_active == True)
     
     total = query.count()
-    products = query.offset(skip).limit(limit).all()
+    # Shards are loaded in one extra query so hot SKUs can be summed without N+1
+    products = (
+        query.options(joinedload(Product.inventory).selectinload(Inventory.shards))
+        .offset(skip).limit(limit).all()
+    )
     
-    # Add inventory information
-    product_responses = []
-    for product in products:
-        inventory = db.query(Inventory).filter(Inventory.product_id == product.id).first()
-        product_dict = {
-            "id": product.id,
-            "name": product.name,
-            "description": product.description,
-            "price_cad": product.price_cad,
-            "image_url": product.image_url,
-            "specifications": product.specifications,
-            "is_active": product.is_active,
-            "created_at": product.created_at,
-            "updated_at": product.updated_at,
-            "stock_quantity": inventory.quantity if inventory else 0,
-            "is_in_stock": (inventory.quantity > 0) if inventory else False,
-            "is_low_stock": (inventory.quantity <= inventory.low_stock_threshold) if inventory else False,
-        }
-        product_responses.append(ProductResponse(**product_dict))
+    return {
+        "products": [ProductResponse.payload(product, product.inventory) for product in products],
+        "total": total,
+    }
+
+
+@router.get("/", response_model=ProductListResponse)
+async def list_products(
+    active_only: bool = True,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_read_db)
+):
+    """List all products.
     
-    return ProductListResponse(products=product_responses, total=total)
+    Served from the catalog snapshot, marked ``X-Catalog-Stale``, while the
+    database is unavailable.
+    """
+    if catalog_cache.database_available():
+        try:
+            page = _product_page(db, active_only, skip, limit)
+        except DATABASE_ERRORS as exc:
+            catalog_cache.database_failed(exc)
+        else:
+            catalog_cache.database_ok()
+            return ORJSONResponse(page)
+    return await catalog_cache.stale_list(active_only, skip, limit)
+
+
+def _fetch_product(bind, product_id: int) -> Optional[dict]:
+    """Load a product's payload in its own session, since it may outlive the request that started it."""
+    db = SessionLocal(bind=bind)
+    try:
+        product = db.query(Product).filter(Product.id == product_id).first()
+        if not product:
+            return None
+        inventory = db.query(Inventory).filter(Inventory.product_id == product.id).first()
+        return ProductResponse.payload(product, inventory)
+    finally:
+        db.close()
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: int, db: Session = Depends(get_db)):
-    """Get a single product by ID."""
-    product = db.query(Product).filter(Product.id == product_id).first()
-    
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Product with ID {product_id} not found"
-        )
+async def get_product(product_id: int, db: Session = Depends(get_read_db)):
+    """Get a single product by ID.
     
-    inventory = db.query(Inventory).filter(Inventory.product_id == product.id).first()
-    
-    return ProductResponse(
-        id=product.id,
-        name=product.name,
-        description=product.description,
-        price_cad=product.price_cad,
-        image_url=product.image_url,
-        specifications=product.specifications,
-        is_active=product.is_active,
-        created_at=product.created_at,
-        updated_at=product.updated_at,
-        stock_quantity=inventory.quantity if inventory else 0,
-        is_in_stock=(inventory.quantity > 0) if inventory else False,
-        is_low_stock=(inventory.quantity <= inventory.low_stock_threshold) if inventory else False,
-    )
+    Concurrent requests for the same product share one fetch (see
+    ``backend.services.single_flight``). Served from the catalog snapshot,
+    marked ``X-Catalog-Stale``, while the database is unavailable.
+    """
+    if catalog_cache.database_available():
+        bind = db.get_bind()
+        try:
+            # Clients pinned to the primary only share fetches made on the primary
+            payload = await single_flight.do(
+                "get_product", (product_id, bind is engine), lambda: _fetch_product(bind, product_id)
+            )
+        except DATABASE_ERRORS as exc:
+            catalog_cache.database_failed(exc)
+        else:
+            catalog_cache.database_ok()
+            if payload is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Product with ID {product_id} not found"
+                )
+            return ORJSONResponse(payload)
+    return await catalog_cache.stale_product(product_id)
 
 
 
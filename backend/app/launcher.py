@@ -0,0 +1,137 @@
+"""Multi-worker production server (gunicorn managing uvicorn workers).
+
+The app is imported once in the master and forked into workers. Each
+worker is recycled after ``WORKER_MAX_REQUESTS`` (plus jitter) to bound
+memory growth, and on SIGTERM or recycle stops accepting connections and
+drains in-flight requests for up to ``WORKER_GRACEFUL_TIMEOUT`` seconds.
+
+Usage:
+    python -m backend.main          (ENVIRONMENT != development)
+"""
+import logging
+import math
+import os
+import shutil
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+from backend.app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+def available_cpus() -> float:
+    """Return the CPUs this process may use, honouring cgroup quotas.
+    
+    ``os.cpu_count()`` reports the host's cores, which in a container is
+    usually far more than the pod's CPU limit.
+    """
+    cpus = float(len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1)
+    
+    quota = period = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as handle:
+            raw_quota, raw_period = handle.read().split()
+        if raw_quota != "max":
+            quota, period = int(raw_quota), int(raw_period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: quota of -1 means unlimited
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as handle:
+                quota = int(handle.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as handle:
+                period = int(handle.read())
+        except (OSError, ValueError):
+            pass
+    
+    if quota and period and quota > 0:
+        cpus = min(cpus, quota / period)
+    return cpus
+
+
+def worker_count() -> int:
+    """Number of workers: ``WEB_WORKERS`` if set, else sized from available CPUs."""
+    if settings.WEB_WORKERS > 0:
+        return settings.WEB_WORKERS
+    workers = math.ceil(available_cpus() * settings.WEB_WORKERS_PER_CPU)
+    return max(1, min(workers, settings.WEB_WORKERS_MAX))
+
+
+class GracefulUvicornWorker(UvicornWorker):
+    """Uvicorn worker that finishes in-flight requests before exiting.
+    
+    Uvicorn gets slightly less time than gunicorn's kill deadline so the
+    app's shutdown hooks still run after the drain.
+    """
+    
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        "timeout_graceful_shutdown": max(settings.WORKER_GRACEFUL_TIMEOUT - 5, 1),
+    }
+
+
+def post_fork(server, worker) -> None:
+    """Give each worker its own connection pools instead of the master's."""
+    from backend.db.database import engine, replica_engines
+    
+    for inherited in [engine, *replica_engines]:
+        inherited.dispose(close=False)
+
+
+def child_exit(server, worker) -> None:
+    """Drop live gauges of a worker that exited or was recycled."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        
+        multiprocess.mark_process_dead(worker.pid)
+
+
+class ServerApplication(BaseApplication):
+    """Gunicorn application serving ``backend.app.server:app``."""
+    
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+    
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+    
+    def load(self):
+        from backend.app.server import app
+        
+        return app
+
+
+def gunicorn_options() -> dict:
+    """Build gunicorn settings from ``Settings``."""
+    return {
+        "bind": f"{settings.API_HOST}:{settings.API_PORT}",
+        "workers": worker_count(),
+        "worker_class": f"{__name__}.GracefulUvicornWorker",
+        "preload_app": True,
+        "max_requests": settings.WORKER_MAX_REQUESTS,
+        "max_requests_jitter": settings.WORKER_MAX_REQUESTS_JITTER,
+        "timeout": settings.WORKER_TIMEOUT,
+        "graceful_timeout": settings.WORKER_GRACEFUL_TIMEOUT,
+        "keepalive": settings.WORKER_KEEPALIVE,
+        "forwarded_allow_ips": settings.FORWARDED_ALLOW_IPS,
+        "accesslog": "-",
+        "errorlog": "-",
+        "post_fork": post_fork,
+        "child_exit": child_exit,
+    }
+
+
+def run() -> None:
+    """Start the master process and workers."""
+    options = gunicorn_options()
+    # Must be set (and emptied of a previous run's files) before the
+    # preloaded app imports prometheus_client
+    if settings.METRICS_ENABLED and options["workers"] > 1:
+        directory = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.METRICS_MULTIPROC_DIR)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+    logger.info("Starting %d workers on %s", options["workers"], options["bind"])
+    ServerApplication(options).run()
@@ -0,0 +1,129 @@
+"""Per-route-class concurrency limits with adaptive queue deadlines."""
+import asyncio
+import time
+from typing import Optional
+from starlette.responses import JSONResponse
+from backend.app.config import get_settings
+from backend.app.metrics import REQUESTS_SHED, QUEUE_WAIT
+from backend.db.database import statement_timeout_ms
+
+settings = get_settings()
+
+# Path prefix -> route class; unlisted paths (health, metrics, docs) are not limited
+ROUTE_CLASSES = (
+    ("/api/products", "catalog"),
+    ("/api/orders", "orders"),
+    ("/api/checkout", "checkout"),
+    ("/api/admin", "admin"),
+    ("/api/webhooks", "webhooks"),
+)
+
+
+def route_class(path: str) -> Optional[str]:
+    """Return the route class for a request path, if it is limited."""
+    for prefix, name in ROUTE_CLASSES:
+        if path.startswith(prefix):
+            return name
+    return None
+
+
+class ConcurrencyLimit:
+    """A semaphore whose queue deadline shrinks while the class stays backed up.
+    
+    Adaptive CoDel: if the queue has been empty within the last
+    ``LOAD_SHED_INTERVAL_MS``, a request waits up to the class's configured
+    deadline; if it has not (a standing queue), requests only wait
+    ``LOAD_SHED_OVERLOAD_TIMEOUT_MS``, so a backlog is shed quickly instead of
+    every request timing out late.
+    """
+    
+    def __init__(self, limit: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.in_use = 0
+        self.waiting = 0
+        self.last_empty = time.monotonic()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+    
+    def deadline(self) -> float:
+        now = time.monotonic()
+        if self.waiting == 0:
+            self.last_empty = now
+            return self.queue_timeout
+        if now - self.last_empty > settings.LOAD_SHED_INTERVAL_MS / 1000:
+            return min(self.queue_timeout, settings.LOAD_SHED_OVERLOAD_TIMEOUT_MS / 1000)
+        return self.queue_timeout
+    
+    async def acquire(self) -> bool:
+        """Wait for a slot; return False if the deadline passes first."""
+        if self._semaphore is None:
+            # Created lazily so it binds to the worker's event loop
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            self.in_use += 1
+            return True
+        
+        timeout = self.deadline()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+        self.in_use += 1
+        return True
+    
+    def release(self) -> None:
+        self.in_use -= 1
+        self._semaphore.release()
+
+
+class LoadSheddingMiddleware:
+    """Bound concurrent requests per route class and fail fast with 503 when saturated.
+    
+    Limits are per worker process. Keeping the slow classes' limits within the
+    DB pool means a checkout burst queues here, briefly, instead of holding
+    every pooled connection while catalog reads wait behind it. Admitted
+    requests also get the class's Postgres ``statement_timeout``.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self.limits = {
+            name: ConcurrencyLimit(limit, settings.QUEUE_TIMEOUTS_MS.get(name, 1000) / 1000)
+            for name, limit in settings.CONCURRENCY_LIMITS.items()
+        }
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        name = route_class(scope["path"])
+        limit = self.limits.get(name)
+        timeout_token = statement_timeout_ms.set(settings.STATEMENT_TIMEOUTS_MS.get(name))
+        try:
+            if limit is None:
+                await self.app(scope, receive, send)
+                return
+            
+            start = time.perf_counter()
+            admitted = await limit.acquire()
+            QUEUE_WAIT.labels(route_class=name).observe(time.perf_counter() - start)
+            if not admitted:
+                REQUESTS_SHED.labels(route_class=name).inc()
+                response = JSONResponse(
+                    {"detail": "Service is busy, please retry shortly"},
+                    status_code=503,
+                    headers={"Retry-After": "1"},
+                )
+                await response(scope, receive, send)
+                return
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                limit.release()
+        finally:
+            statement_timeout_ms.reset(timeout_token)
@@ -0,0 +1,163 @@
+"""Prometheus metric definitions and the /metrics endpoint."""
+import os
+from prometheus_client import (
+    Counter, Gauge, Histogram, CollectorRegistry, CONTENT_TYPE_LATEST, generate_latest, multiprocess, REGISTRY,
+)
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Latency buckets tuned for API calls (5ms .. 10s)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+
+# HTTP
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", multiprocess_mode="livesum"
+)
+
+# Database
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time by operation", ["operation"],
+    buckets=QUERY_BUCKETS,
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements issued per HTTP request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250),
+)
+DB_QUERY_TIME_PER_REQUEST = Histogram(
+    "db_query_time_per_request_seconds", "Total SQL time per HTTP request", ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured connection pool size", ["pool"], multiprocess_mode="livesum")
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool", ["pool"], multiprocess_mode="livesum"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections open beyond the pool size", ["pool"], multiprocess_mode="livesum"
+)
+
+# External services
+PAYMENT_PROVIDER_DURATION = Histogram(
+    "payment_provider_request_duration_seconds", "Payment provider API call latency",
+    ["provider", "operation"], buckets=LATENCY_BUCKETS,
+)
+PAYMENTS_AFTER_CANCEL = Counter(
+    "payments_after_cancel_total", "Payments for already cancelled orders by outcome (reinstated, refund_due)",
+    ["outcome"],
+)
+EMAIL_SEND_DURATION = Histogram(
+    "email_send_duration_seconds", "SMTP send latency by result", ["result"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Caches
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
+SINGLE_FLIGHT_REQUESTS = Counter(
+    "single_flight_requests_total", "Coalesced reads by route and result (fetch, shared, cached)",
+    ["route", "result"],
+)
+
+# Rate limiting
+RATE_LIMIT_DECISIONS = Counter(
+    "rate_limit_decisions_total", "Rate limiter decisions by rule, result and backend",
+    ["rule", "result", "backend"],
+)
+
+# Checkout waiting room
+WAITING_ROOM_DECISIONS = Counter(
+    "waiting_room_decisions_total", "Checkout admission requests by result", ["result"],
+)
+
+# Background jobs
+PENDING_ORDERS_SWEPT = Counter(
+    "pending_orders_swept_total", "Abandoned PENDING orders cancelled by the sweeper",
+)
+STOCK_UNITS_RECLAIMED = Counter(
+    "stock_units_reclaimed_total", "Units returned to inventory from swept orders",
+)
+ORDERS_ARCHIVED = Counter(
+    "orders_archived_total", "Orders exported to the archive and dropped from the database",
+)
+SCHEDULED_JOB_RUNS = Counter(
+    "scheduled_job_runs_total", "Scheduled job runs by result (success, failure, locked, overlap)",
+    ["job", "result"],
+)
+SCHEDULED_JOB_DURATION = Histogram(
+    "scheduled_job_duration_seconds", "Scheduled job run time", ["job"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+SCHEDULER_LEADER = Gauge(
+    "scheduler_leader", "1 while this process is the job scheduler leader", multiprocess_mode="livesum"
+)
+
+# Load shedding
+REQUESTS_SHED = Counter(
+    "http_requests_shed_total", "Requests rejected with 503 because their route class was saturated",
+    ["route_class"],
+)
+QUEUE_WAIT = Histogram(
+    "http_request_queue_wait_seconds", "Time requests waited for a concurrency slot", ["route_class"],
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Count a cache hit or miss; hit ratio is hits / (hits + misses)."""
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def multiprocess_dir():
+    """Return the shared metrics directory when running under multiple workers."""
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def observe_pool(engine, name: str) -> None:
+    """Expose pool size and usage gauges for an engine, labelled ``pool=name``.
+    
+    The engine's current pool is looked up each time, so the gauges survive
+    ``engine.dispose()`` after a fork. Single-process gauges are read at
+    scrape time; callback gauges cannot be shared between workers, so in
+    multiprocess mode the values are written on every checkout and checkin.
+    """
+    size, checked_out, overflow = (
+        DB_POOL_SIZE.labels(pool=name), DB_POOL_CHECKED_OUT.labels(pool=name), DB_POOL_OVERFLOW.labels(pool=name)
+    )
+    if not multiprocess_dir():
+        size.set_function(lambda: engine.pool.size())
+        checked_out.set_function(lambda: engine.pool.checkedout())
+        overflow.set_function(lambda: max(engine.pool.overflow(), 0))
+        return
+    
+    from sqlalchemy import event
+    
+    # Written from the workers only; a value set in the preloading master
+    # would be counted as one more live process
+    def update(returning: int):
+        pool = engine.pool
+        size.set(pool.size())
+        checked_out.set(pool.checkedout() - returning)
+        overflow.set(max(pool.overflow(), 0))
+    
+    # "checkin" fires before the connection is back in the pool
+    event.listen(engine, "checkout", lambda *args: update(0))
+    event.listen(engine, "checkin", lambda *args: update(1))
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Serve metrics in the Prometheus text format, aggregated across workers."""
+    registry = REGISTRY
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,144 @@
+"""ASGI middleware for the FastAPI application."""
+import logging
+import time
+from typing import Optional
+from backend.app.metrics import (
+    HTTP_REQUESTS,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_FLIGHT,
+    DB_QUERIES_PER_REQUEST,
+    DB_QUERY_TIME_PER_REQUEST,
+)
+from backend.db.database import PRIMARY_STICKY_COOKIE
+from backend.db.instrumentation import QueryStats, current_query_stats, start_query_stats, stop_query_stats
+from backend.db.query_budget import QueryBudgetExceeded, budget_for, check_stats
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+_route_templates: dict = {}
+
+
+def route_template(scope) -> str:
+    """Return the matched route's path template, keeping label cardinality bounded."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    template = _route_templates.get(endpoint)
+    if template is None:
+        app = scope.get("app")
+        for route in getattr(app, "routes", []):
+            if getattr(route, "endpoint", None) is endpoint:
+                template = route.path
+                break
+        else:
+            template = getattr(endpoint, "__name__", "unknown")
+        _route_templates[endpoint] = template
+    return template
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and per-request query stats."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        stats: Optional[QueryStats] = start_query_stats(scope)
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            stop_query_stats()
+            method = scope["method"]
+            route = route_template(scope)
+            HTTP_REQUESTS.labels(method=method, route=route, status=str(status_code)).inc()
+            HTTP_REQUEST_DURATION.labels(method=method, route=route).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route=route).observe(stats.count)
+            DB_QUERY_TIME_PER_REQUEST.labels(route=route).observe(stats.duration)
+
+
+class QueryBudgetMiddleware:
+    """Check each request's SQL statements against its route budget.
+    
+    Violations (too many statements, or one statement shape repeated like an
+    N+1 loop) are logged; with ``enforce=True`` they raise, which fails tests
+    using ``TestClient``.
+    """
+    
+    def __init__(self, app, enforce: bool = False):
+        self.app = app
+        self.enforce = enforce
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        stats = current_query_stats()
+        owns_stats = stats is None
+        if owns_stats:
+            stats = start_query_stats(scope)
+        
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if owns_stats:
+                stop_query_stats()
+        
+        route_key = f"{scope['method']} {route_template(scope)}"
+        state = scope.get("state") or {}
+        budget = state.get("query_budget") or budget_for(route_key)
+        problems = check_stats(stats, budget, state.get("allow_repeated_queries", False))
+        if problems:
+            message = f"{route_key}: " + "; ".join(problems)
+            if self.enforce:
+                raise QueryBudgetExceeded(message)
+            logger.warning("Query budget violation on %s", message)
+
+
+class ReadYourWritesMiddleware:
+    """Pin a client's reads to the primary for a while after it writes.
+    
+    Successful non-GET responses set a short-lived cookie that
+    ``get_read_db`` honours, so a client reading its order right after
+    checkout is not served from a replica that has not caught up yet.
+    """
+    
+    def __init__(self, app, sticky_seconds: int):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = int(time.time()) + self.sticky_seconds
+                cookie = (
+                    f"{PRIMARY_STICKY_COOKIE}={until}; Max-Age={self.sticky_seconds}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,139 @@
+"""Opt-in per-request sampling profiler."""
+import asyncio
+import contextvars
+import logging
+import random
+import re
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from backend.app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+PROFILE_SUFFIX = ".speedscope.json"
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def profile_dir() -> Path:
+    """Return the directory profiles are written to."""
+    return Path(settings.PROFILE_DIR)
+
+
+def list_profiles() -> list[dict]:
+    """List stored profiles, newest first."""
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in directory.glob(f"*{PROFILE_SUFFIX}"):
+        stat = path.stat()
+        profiles.append({
+            "name": path.name,
+            "size_bytes": stat.st_size,
+            "created_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+        })
+    profiles.sort(key=lambda profile: profile["created_at"], reverse=True)
+    return profiles
+
+
+def profile_path(name: str) -> Optional[Path]:
+    """Resolve a stored profile by name, refusing anything outside the profile directory."""
+    if name != Path(name).name or not name.endswith(PROFILE_SUFFIX):
+        return None
+    path = profile_dir() / name
+    return path if path.is_file() else None
+
+
+def _write_profile(profiler, name: str) -> None:
+    """Render a finished profile as speedscope JSON and prune old files."""
+    from pyinstrument.renderers import SpeedscopeRenderer
+    
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / name).write_text(profiler.output(renderer=SpeedscopeRenderer()))
+    
+    profiles = sorted(directory.glob(f"*{PROFILE_SUFFIX}"), key=lambda path: path.stat().st_mtime)
+    for stale in profiles[:-settings.PROFILE_MAX_FILES]:
+        stale.unlink(missing_ok=True)
+
+
+def _is_admin_request(scope) -> bool:
+    """Check the request carries a token of an existing, active admin (as ``get_current_admin``)."""
+    from backend.api.routes.admin import decode_access_token
+    
+    for key, value in scope.get("headers", []):
+        if key == b"authorization":
+            username = decode_access_token(value.decode("latin-1"))
+            if username is None:
+                return False
+            # In an empty context, so the lookup is not counted against the request's query budget
+            return contextvars.Context().run(_admin_exists, username)
+    return False
+
+
+def _admin_exists(username: str) -> bool:
+    from backend.api.routes.admin import active_admin
+    from backend.db.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        return active_admin(db, username) is not None
+    finally:
+        db.close()
+
+
+class ProfilingMiddleware:
+    """Profile requests that ask for it (admin + ``X-Profile: 1``) or are sampled.
+    
+    Profiles are written as speedscope JSON to ``PROFILE_DIR``, keeping the
+    newest ``PROFILE_MAX_FILES``; the response carries an ``X-Profile-Id``
+    header naming the file. Requests that are not profiled pay one header
+    scan and a random() call.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    def _should_profile(self, scope) -> bool:
+        if settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE:
+            return True
+        for key, value in scope.get("headers", []):
+            if key == PROFILE_HEADER.encode() and value in (b"1", b"true"):
+                return _is_admin_request(scope)
+        return False
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        
+        from pyinstrument import Profiler
+        
+        path = _SAFE_NAME.sub("_", scope["path"].strip("/")) or "root"
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        name = f"{stamp}-{scope['method']}-{path[:60]}-{uuid.uuid4().hex[:6]}{PROFILE_SUFFIX}"
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, name.encode())]
+            await send(message)
+        
+        profiler = Profiler(interval=settings.PROFILE_INTERVAL_SECONDS, async_mode="enabled")
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            try:
+                await asyncio.to_thread(_write_profile, profiler, name)
+                logger.info("Profiled %s %s in %.1f ms -> %s", scope["method"], scope["path"], elapsed_ms, name)
+            except Exception:
+                logger.exception("Failed to write profile %s", name)
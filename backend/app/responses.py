@@ -0,0 +1,22 @@
+"""JSON encoding for API responses, cached catalog snapshots and the order archive.
+
+orjson writes aware UTC datetimes as ``+00:00`` by default; ``OPT_UTC_Z``
+keeps the ``Z`` suffix the pydantic response models used to produce, so
+clients parsing timestamps see the same format as before.
+"""
+import orjson
+from fastapi.responses import ORJSONResponse as BaseORJSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(content) -> bytes:
+    """Encode ``content`` the way responses are encoded."""
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(BaseORJSONResponse):
+    """``ORJSONResponse`` that writes UTC datetimes with a ``Z`` suffix."""
+    
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -1,10 +1,41 @@
 """FastAPI application factory."""
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from backend.app.config import get_settings
+from backend.app.metrics import metrics_endpoint
+from backend.app.load_shedding import LoadSheddingMiddleware
+from backend.app.middleware import MetricsMiddleware, QueryBudgetMiddleware, ReadYourWritesMiddleware
+from backend.app.profiling import ProfilingMiddleware
+from backend.app.responses import ORJSONResponse
+from backend.app.tracing import TracingMiddleware
+from backend.db.database import engine, replica_engines
+from backend.db.partitioning import maintain_partitions
 from backend.api.routes import products, orders, checkout, admin, payment_webhooks
+from backend.jobs.scheduler import build_scheduler
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the background job scheduler for the lifetime of the worker."""
+    try:
+        # New months need a partition even when the scheduler is off
+        maintain_partitions(engine)
+    except Exception:
+        logger.exception("Could not create upcoming order partitions")
+    scheduler = build_scheduler() if settings.SCHEDULER_ENABLED else None
+    if scheduler:
+        await scheduler.start()
+    try:
+        yield
+    finally:
+        if scheduler:
+            await scheduler.stop()
 
 
 def create_app() -> FastAPI:
@@ -15,6 +46,8 @@ def create_app() -> FastAPI:
         description="Ecommerce API for selling iPhones with international shipping",
         version="0.1.0",
         debug=settings.DEBUG,
+        default_response_class=ORJSONResponse,
+        lifespan=lifespan,
     )
     
     # Add CORS middleware
@@ -26,6 +59,34 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
+    # Compress large payloads (order/product lists); small responses are sent as-is
+    if settings.GZIP_MINIMUM_SIZE > 0:
+        app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE)
+    
+    # Keep clients on the primary briefly after they write (only with replicas)
+    if replica_engines:
+        app.add_middleware(ReadYourWritesMiddleware, sticky_seconds=settings.DB_REPLICA_STICKY_SECONDS)
+    
+    # Request tracing (no-op unless TRACING_EXPORTER is set)
+    app.add_middleware(TracingMiddleware)
+    
+    # On-demand request profiling
+    if settings.PROFILING_ENABLED:
+        app.add_middleware(ProfilingMiddleware)
+    
+    # Per-route SQL query budgets and N+1 detection
+    if settings.QUERY_BUDGET_ENABLED:
+        app.add_middleware(QueryBudgetMiddleware, enforce=settings.QUERY_BUDGET_ENFORCE)
+    
+    # Per-route-class concurrency limits; sheds load with 503 when saturated
+    if settings.LOAD_SHEDDING_ENABLED:
+        app.add_middleware(LoadSheddingMiddleware)
+    
+    # Prometheus metrics (scraped in-cluster; /metrics is not routed by the ingress)
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+        app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+    
     # Include routers
     app.include_router(products.router, prefix="/api/products", tags=["products"])
     app.include_router(orders.router, prefix="/api/orders", tags=["orders"])
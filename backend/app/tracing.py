@@ -0,0 +1,237 @@
+"""Lightweight request tracing with W3C traceparent propagation.
+
+Spans nest through a context variable, so code only wraps work in
+``with span("name"):``. Finished spans go to a pluggable exporter chosen by
+``TRACING_EXPORTER``:
+
+- ``none``: tracing disabled (``span()`` is a no-op)
+- ``console``: one JSON line per span on the ``backend.tracing`` logger
+- ``file``: NDJSON appended to ``TRACING_FILE``
+- ``package.module:factory``: any callable returning an object with
+  ``export(span_dict)``, e.g. an adapter to an OTLP collector
+"""
+import importlib
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from backend.app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("backend.tracing")
+
+
+class Span:
+    """A timed operation within a trace."""
+    
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status", "token")
+    
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.token = None
+    
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent header value identifying this span."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+    
+    def set_attribute(self, key: str, value) -> None:
+        """Attach an attribute to the span."""
+        self.attributes[key] = value
+    
+    def to_dict(self) -> dict:
+        """Serialize the finished span for exporters."""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class ConsoleExporter:
+    """Log finished spans as JSON lines."""
+    
+    def export(self, span: dict) -> None:
+        logger.info(json.dumps(span, default=str))
+
+
+class FileExporter:
+    """Append finished spans to an NDJSON file."""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    def export(self, span: dict) -> None:
+        line = json.dumps(span, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a") as handle:
+                handle.write(line)
+
+
+def _load_exporter(name: str):
+    """Build the exporter named by the TRACING_EXPORTER setting."""
+    if not name or name == "none":
+        return None
+    if name == "console":
+        return ConsoleExporter()
+    if name == "file":
+        return FileExporter(settings.TRACING_FILE)
+    module_name, _, factory = name.partition(":")
+    return getattr(importlib.import_module(module_name), factory)()
+
+
+_exporter = _load_exporter(settings.TRACING_EXPORTER)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def set_exporter(exporter) -> None:
+    """Replace the active exporter (None disables tracing)."""
+    global _exporter
+    _exporter = exporter
+
+
+def is_enabled() -> bool:
+    """Return True if spans are being exported."""
+    return _exporter is not None
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[tuple[str, str]]:
+    """Return (trace_id, parent_span_id) from a traceparent value, or None if malformed."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def current_span() -> Optional[Span]:
+    """Return the active span, if any."""
+    return _current_span.get()
+
+
+def current_traceparent() -> Optional[str]:
+    """Return the traceparent of the active span, for propagation."""
+    active = _current_span.get()
+    return active.traceparent if active else None
+
+
+def start_span(name: str, parent: Optional[str] = None, **attributes) -> Optional[Span]:
+    """Start a span and make it current; pair with ``end_span``.
+    
+    ``parent`` is a traceparent to continue (e.g. one stored on an order); when
+    given while another span is active, the active span is recorded as a link.
+    """
+    if _exporter is None:
+        return None
+    active = _current_span.get()
+    remote = parse_traceparent(parent)
+    if remote:
+        trace_id, parent_id = remote
+        if active:
+            attributes["link.trace_id"] = active.trace_id
+            attributes["link.span_id"] = active.span_id
+    elif active:
+        trace_id, parent_id = active.trace_id, active.span_id
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+    new_span = Span(name, trace_id, parent_id, attributes)
+    new_span.token = _current_span.set(new_span)
+    return new_span
+
+
+def end_span(finished: Optional[Span], error: Optional[BaseException] = None) -> None:
+    """Finish a span started with ``start_span`` and export it."""
+    if finished is None:
+        return
+    finished.end_ns = time.time_ns()
+    try:
+        _current_span.reset(finished.token)
+    except ValueError:
+        # Ended from a different context (e.g. a DB hook on another thread)
+        _current_span.set(None)
+    if error is not None:
+        finished.status = "error"
+        finished.attributes["error"] = repr(error)
+    exporter = _exporter
+    if exporter is not None:
+        try:
+            exporter.export(finished.to_dict())
+        except Exception:
+            logger.exception("Span export failed")
+
+
+@contextmanager
+def span(name: str, parent: Optional[str] = None, **attributes):
+    """Trace the enclosed block as a span (no-op when tracing is disabled)."""
+    active = start_span(name, parent=parent, **attributes)
+    try:
+        yield active
+    except BaseException as exc:
+        end_span(active, error=exc)
+        raise
+    else:
+        end_span(active)
+
+
+class TracingMiddleware:
+    """Open a server span per HTTP request, continuing any incoming traceparent."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _exporter is None:
+            await self.app(scope, receive, send)
+            return
+        
+        incoming = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                incoming = value.decode("latin-1")
+                break
+        
+        server_span = start_span(
+            f"{scope['method']} {scope['path']}",
+            parent=incoming,
+            **{"http.method": scope["method"], "http.target": scope["path"]},
+        )
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                server_span.set_attribute("http.status_code", message["status"])
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"traceparent", server_span.traceparent.encode())
+                ]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as exc:
+            end_span(server_span, error=exc)
+            raise
+        else:
+            from backend.app.middleware import route_template
+            server_span.name = f"{scope['method']} {route_template(scope)}"
+            end_span(server_span)
@@ -1,17 +1,45 @@
 """Database configuration and session management."""
-from sqlalchemy import create_engine
+import itertools
+import time
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from backend.app.config import get_settings
+from backend.db.instrumentation import TimedQueuePool, instrument_engine
 
 settings = get_settings()
 
+# Set on responses to writes; while present, reads go to the primary
+PRIMARY_STICKY_COOKIE = "db_primary_until"
+
+
+def _create_engine(url: str):
+    """Create an instrumented engine with the configured pool settings."""
+    return create_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+        echo=settings.SQL_ECHO
+    )
+
+
 # Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=settings.ENVIRONMENT == "development"
-)
+engine = _create_engine(settings.DATABASE_URL)
+instrument_engine(engine, "primary")
+
+# Read replicas, used round-robin by get_read_db
+replica_urls = [url.strip() for url in (settings.DATABASE_REPLICA_URL or "").split(",") if url.strip()]
+replica_engines = [_create_engine(url) for url in replica_urls]
+for index, replica in enumerate(replica_engines):
+    instrument_engine(replica, "replica" if len(replica_engines) == 1 else f"replica-{index}")
+_next_replica = itertools.cycle(replica_engines)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -19,6 +47,17 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base class for models
 Base = declarative_base()
 
+# Per-request statement timeout (ms), set by LoadSheddingMiddleware per route class
+statement_timeout_ms: ContextVar[Optional[int]] = ContextVar("statement_timeout_ms", default=None)
+
+
+@event.listens_for(SessionLocal, "after_begin")
+def _apply_statement_timeout(session, transaction, connection):
+    """Bound every statement in the transaction so a slow query cannot hold a connection indefinitely."""
+    timeout = statement_timeout_ms.get()
+    if timeout and connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
 
 def get_db():
     """Get database session."""
@@ -29,6 +68,26 @@ def get_db():
         db.close()
 
 
+def is_sticky_to_primary(request: Request) -> bool:
+    """Check whether the client wrote recently enough that a replica may be behind."""
+    try:
+        return float(request.cookies.get(PRIMARY_STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
 
 
-
+def get_read_db(request: Request):
+    """Get a session for read-only routes, on a replica when one is configured.
+    
+    Clients that wrote within ``DB_REPLICA_STICKY_SECONDS`` (see
+    ``ReadYourWritesMiddleware``) stay on the primary so they see their own
+    writes despite replication lag.
+    """
+    if not replica_engines or is_sticky_to_primary(request):
+        db = SessionLocal()
+    else:
+        db = SessionLocal(bind=next(_next_replica))
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,128 @@
+"""SQLAlchemy engine and pool instrumentation."""
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from backend.app import tracing
+from backend.app.metrics import DB_QUERY_DURATION, DB_POOL_CHECKOUT_WAIT, observe_pool
+from backend.db.slow_queries import slow_queries
+
+_OPERATIONS = {"select", "insert", "update", "delete"}
+
+
+class QueryStats:
+    """SQL statements issued while handling one request (or a captured block)."""
+    
+    __slots__ = ("count", "duration", "statements")
+    
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # Raw statement text -> executions; bound parameters are not part of
+        # the text, so an N+1 loop shows up as one statement with a high count
+        self.statements = {}
+    
+    def record(self, statement: str, elapsed: float) -> None:
+        """Record one executed statement."""
+        self.count += 1
+        self.duration += elapsed
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+# Explicit captures (test helpers) see every statement regardless of context
+_captures: list[QueryStats] = []
+
+
+def start_query_stats(scope: Optional[dict] = None) -> QueryStats:
+    """Start collecting query stats for the current request context."""
+    stats = QueryStats()
+    _query_stats.set(stats)
+    _request_scope.set(scope)
+    return stats
+
+
+def stop_query_stats() -> None:
+    """Stop collecting query stats for the current request context."""
+    _query_stats.set(None)
+    _request_scope.set(None)
+
+
+def current_request_scope() -> Optional[dict]:
+    """Return the ASGI scope of the request issuing queries, if any."""
+    return _request_scope.get()
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """Return the stats collector for the current request, if any."""
+    return _query_stats.get()
+
+
+def add_capture(stats: QueryStats) -> None:
+    """Register a process-wide collector that sees statements from any thread."""
+    _captures.append(stats)
+
+
+def remove_capture(stats: QueryStats) -> None:
+    """Unregister a process-wide collector."""
+    _captures.remove(stats)
+
+
+def _operation(statement: str) -> str:
+    """Classify a statement by its leading keyword."""
+    keyword = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    return keyword if keyword in _OPERATIONS else "other"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if tracing.is_enabled() and tracing.current_span() is not None:
+        conn.info.setdefault("query_spans", []).append(tracing.start_span(
+            "db.query", **{"db.operation": _operation(statement), "db.statement": statement[:200]}
+        ))
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    if conn.info.get("query_spans"):
+        tracing.end_span(conn.info["query_spans"].pop())
+    DB_QUERY_DURATION.labels(operation=_operation(statement)).observe(elapsed)
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    for capture in _captures:
+        capture.record(statement, elapsed)
+    if elapsed >= slow_queries.threshold:
+        slow_queries.record(conn.engine, statement, parameters, executemany, elapsed, _request_scope.get())
+
+
+def _handle_error(exception_context):
+    # Keep the timing stack balanced when a statement fails
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+    if conn is not None and conn.info.get("query_spans"):
+        tracing.end_span(conn.info["query_spans"].pop(), error=exception_context.original_exception)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection."""
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine, name: str = "primary") -> None:
+    """Attach query timing hooks and pool gauges (labelled ``name``) to an engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    if isinstance(engine.pool, QueuePool):
+        observe_pool(engine, name)
@@ -0,0 +1,112 @@
+"""Postgres advisory locks for work that must run on one replica at a time."""
+import hashlib
+import logging
+from contextlib import contextmanager
+from functools import lru_cache
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+
+def advisory_lock_key(name: str) -> int:
+    """Stable signed 64-bit lock key for a name (the same in every process)."""
+    return int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "big", signed=True)
+
+
+def try_advisory_xact_lock(db: Session, name: str) -> bool:
+    """Try to take ``name``'s lock until the current transaction ends.
+    
+    Returns False if another session holds it. Always True on databases
+    without advisory locks (SQLite in development runs a single process).
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return bool(db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": advisory_lock_key(name)}).scalar())
+
+
+@lru_cache
+def _lock_engine():
+    """Unpooled engine for session-level locks, which pin their connection while held."""
+    from backend.db.database import engine
+    
+    return create_engine(engine.url, poolclass=NullPool)
+
+
+class AdvisoryLock:
+    """A session-level advisory lock held on its own connection until released.
+    
+    Unlike ``try_advisory_xact_lock`` it survives commits, so it can guard
+    work spanning many transactions or elect a leader. If the connection
+    drops, Postgres releases the lock; ``still_held()`` notices.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.key = advisory_lock_key(name)
+        self.held = False
+        self._connection = None
+    
+    def try_acquire(self) -> bool:
+        """Take the lock if it is free; True if this instance now holds it."""
+        if self.held:
+            return True
+        engine = _lock_engine()
+        if engine.dialect.name != "postgresql":
+            # Nothing to coordinate with outside Postgres (single-process development)
+            self.held = True
+            return True
+        connection = engine.connect()
+        try:
+            acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self._connection = connection
+        self.held = True
+        return True
+    
+    def still_held(self) -> bool:
+        """Check that the lock's connection is alive; drop the lock if it is not."""
+        if self._connection is None:
+            return self.held
+        try:
+            self._connection.execute(text("SELECT 1"))
+            self._connection.commit()
+            return True
+        except Exception:
+            logger.warning("Lost advisory lock %s", self.name)
+            self._discard()
+            return False
+    
+    def release(self) -> None:
+        if self._connection is not None:
+            try:
+                self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+                self._connection.commit()
+            except Exception:
+                logger.warning("Failed to unlock %s; closing its connection instead", self.name)
+        self._discard()
+    
+    def _discard(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = None
+        self.held = False
+
+
+@contextmanager
+def advisory_lock(name: str):
+    """Hold ``name``'s session-level lock for the block if it is free; yields whether it was taken."""
+    lock = AdvisoryLock(name)
+    acquired = lock.try_acquire()
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            lock.release()
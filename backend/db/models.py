@@ -1,11 +1,18 @@
 """SQLAlchemy database models."""
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Boolean, ForeignKey, Text, Index, UniqueConstraint, DDL, event, Enum as SQLEnum
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from datetime import datetime
 import enum
 from backend.db.database import Base
 
+# Trigram indexes used by admin order search need pg_trgm
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
 
 class OrderStatus(str, enum.Enum):
     """Order status enumeration."""
@@ -23,6 +30,14 @@ class PaymentMethod(str, enum.Enum):
     PAYPAL = "paypal"
 
 
+class MovementKind(str, enum.Enum):
+    """Reason for an inventory movement."""
+    SALE = "sale"
+    RESTOCK = "restock"
+    ADJUSTMENT = "adjustment"
+    RELEASE = "release"  # stock returned by a cancelled order
+
+
 class Product(Base):
     """Product model for iPhone listings."""
     
@@ -55,24 +70,161 @@ class Inventory(Base):
     product_id = Column(Integer, ForeignKey("products.id"), unique=True, nullable=False, index=True)
     quantity = Column(Integer, default=0, nullable=False)
     low_stock_threshold = Column(Integer, default=5, nullable=False)
+    
+    # Hot SKUs spread their stock over this many InventoryShard rows (0 = not sharded)
+    shard_count = Column(Integer, default=0, nullable=False, server_default="0")
+    
+    # Threshold crossing markers, set at write time (NULL while above threshold)
+    low_stock_since = Column(DateTime(timezone=True), nullable=True)
+    out_of_stock_since = Column(DateTime(timezone=True), nullable=True)
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Partial indexes keep low/out-of-stock reads proportional to the flagged rows
+    __table_args__ = (
+        Index(
+            "ix_inventory_low_stock",
+            "product_id",
+            postgresql_where=text("low_stock_since IS NOT NULL"),
+            sqlite_where=text("low_stock_since IS NOT NULL"),
+        ),
+        Index(
+            "ix_inventory_out_of_stock",
+            "product_id",
+            postgresql_where=text("out_of_stock_since IS NOT NULL"),
+            sqlite_where=text("out_of_stock_since IS NOT NULL"),
+        ),
+    )
+    
     # Relationships
     product = relationship("Product", back_populates="inventory")
+    shards = relationship(
+        "InventoryShard", back_populates="inventory", order_by="InventoryShard.shard", cascade="all, delete-orphan"
+    )
     
     def __repr__(self):
         return f"<Inventory(product_id={self.product_id}, quantity={self.quantity})>"
     
+    @property
+    def is_hot(self) -> bool:
+        """Whether stock is spread over shard rows."""
+        return bool(self.shard_count)
+    
+    @property
+    def stock_quantity(self) -> int:
+        """Total units available.
+        
+        For hot SKUs ``quantity`` only holds units not yet allocated to a
+        shard, so the shards are added in (loading them if needed).
+        """
+        if not self.is_hot:
+            return self.quantity
+        return self.quantity + sum(shard.quantity for shard in self.shards)
+    
     @property
     def is_low_stock(self) -> bool:
         """Check if stock is low."""
-        return self.quantity <= self.low_stock_threshold
+        return self.stock_quantity <= self.low_stock_threshold
     
     @property
     def is_out_of_stock(self) -> bool:
         """Check if product is out of stock."""
-        return self.quantity <= 0
+        return self.stock_quantity <= 0
+    
+    def sync_stock_flags(self) -> list[str]:
+        """Update the low/out-of-stock markers and return any new crossings.
+        
+        A crossing is only reported on the transition into a state, so repeated
+        writes while stock stays low do not produce duplicate alerts.
+        """
+        now = datetime.utcnow()
+        crossings = []
+        
+        if self.is_low_stock:
+            if self.low_stock_since is None:
+                self.low_stock_since = now
+                crossings.append("low_stock")
+        else:
+            self.low_stock_since = None
+        
+        if self.is_out_of_stock:
+            if self.out_of_stock_since is None:
+                self.out_of_stock_since = now
+                crossings.append("out_of_stock")
+        else:
+            self.out_of_stock_since = None
+        
+        return crossings
+
+
+class InventoryShard(Base):
+    """A slice of a hot SKU's stock.
+    
+    Checkouts decrement one shard row instead of the shared inventory row, so
+    concurrent purchases of the same SKU take different row locks.
+    """
+    
+    __tablename__ = "inventory_shards"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    inventory_id = Column(Integer, ForeignKey("inventory.id", ondelete="CASCADE"), nullable=False)
+    shard = Column(Integer, nullable=False)
+    quantity = Column(Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("inventory_id", "shard", name="uq_inventory_shards_inventory_shard"),
+    )
+    
+    # Relationships
+    inventory = relationship("Inventory", back_populates="shards")
+    
+    def __repr__(self):
+        return f"<InventoryShard(inventory_id={self.inventory_id}, shard={self.shard}, quantity={self.quantity})>"
+
+
+class InventoryMovement(Base):
+    """One stock change; the ledger is append-only.
+    
+    Written in the same transaction as the change to ``inventory`` (or a
+    shard), so the sum of a product's deltas always equals its stock.
+    """
+    
+    __tablename__ = "inventory_movements"
+    
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    kind = Column(SQLEnum(MovementKind), nullable=False)
+    delta = Column(Integer, nullable=False)  # signed change in units
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True, index=True)
+    note = Column(String(255), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    # Point-in-time queries sum a product's deltas over a time range
+    __table_args__ = (
+        Index("ix_inventory_movements_product_created", "product_id", "created_at"),
+    )
+    
+    def __repr__(self):
+        return f"<InventoryMovement(product_id={self.product_id}, kind={self.kind}, delta={self.delta})>"
+
+
+class InventorySnapshot(Base):
+    """A product's stock as of ``taken_at``, folded from the previous snapshot and the ledger."""
+    
+    __tablename__ = "inventory_snapshots"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    taken_at = Column(DateTime(timezone=True), nullable=False)
+    
+    __table_args__ = (
+        Index("ix_inventory_snapshots_product_taken", "product_id", "taken_at"),
+    )
+    
+    def __repr__(self):
+        return f"<InventorySnapshot(product_id={self.product_id}, quantity={self.quantity}, taken_at={self.taken_at})>"
 
 
 class Order(Base):
@@ -104,6 +256,9 @@ class Order(Base):
     shipping_cost_cad = Column(Float, nullable=False)
     total_cad = Column(Float, nullable=False)
     
+    # Trace context of the checkout request (W3C traceparent), continued by webhooks
+    trace_parent = Column(String(55), nullable=True)
+    
     # Tracking
     tracking_number = Column(String(100), nullable=True)
     shipped_at = Column(DateTime(timezone=True), nullable=True)
@@ -113,6 +268,38 @@ class Order(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Admin search: trigram indexes for substring matches and pattern_ops
+    # for order number prefixes (created_at is indexed on the column)
+    __table_args__ = (
+        Index(
+            "ix_orders_customer_email_trgm",
+            "customer_email",
+            postgresql_using="gin",
+            postgresql_ops={"customer_email": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_orders_customer_name_trgm",
+            "customer_name",
+            postgresql_using="gin",
+            postgresql_ops={"customer_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_orders_tracking_number_trgm",
+            "tracking_number",
+            postgresql_using="gin",
+            postgresql_ops={"tracking_number": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_orders_order_number_prefix",
+            "order_number",
+            postgresql_ops={"order_number": "varchar_pattern_ops"},
+        ),
+        # Keyset pagination for streamed order lists (newest first)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        # Stale PENDING order sweeps (backend.jobs.sweep_pending_orders)
+        Index("ix_orders_status_created_at", "status", "created_at"),
+    )
+    
     # Relationships
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
     
@@ -0,0 +1,283 @@
+"""Monthly range partitions of ``orders`` and ``order_items`` (PostgreSQL only).
+
+Both tables are partitioned by ``created_at`` month in UTC, with partitions
+named ``<table>_pYYYY_MM``. An order and its items are inserted in one
+transaction and both default ``created_at`` to the transaction start, so
+items always land in their order's month. Old months can then be detached
+and dropped whole (see ``backend.jobs.order_partitions``) instead of
+deleted row by row, and queries filtered on ``created_at`` skip the months
+they do not need.
+
+A partitioned table's unique constraints must include the partition key, so
+the primary keys become ``(id, created_at)``, the ``order_number`` index
+becomes ``(order_number, created_at)``, and foreign keys pointing at
+``orders`` are dropped (the checkout writes orders and their items together).
+That index alone would accept the same number twice at different times, so
+every number is also recorded by a trigger in the plain
+``order_number_registry`` table, whose primary key rejects duplicates. The
+registry keeps the numbers of archived months too. Other databases keep plain
+tables.
+
+Converting is an explicit step, run in a maintenance window: it locks both
+tables while their rows are copied. Once converted, ``maintain_partitions``
+runs at startup (``init_db`` and every API worker) and in the
+``order_partitions`` job, so new months always have a partition.
+
+Usage:
+    python -m backend.db.partitioning    # convert existing tables (locks them while copying)
+"""
+import logging
+from datetime import date, datetime, timezone
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from backend.app.config import get_settings
+from backend.db.locks import advisory_lock_key
+from backend.db.models import Order, OrderItem
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = (Order.__table__, OrderItem.__table__)
+
+MAINTENANCE_LOCK = "db.partitioning.maintain"
+
+
+def month_start(moment: datetime) -> date:
+    """First day of ``moment``'s month in UTC."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month: date) -> tuple[datetime, datetime]:
+    """``[start, end)`` of a month as UTC datetimes, matching its partition's bounds."""
+    return (
+        datetime(month.year, month.month, 1, tzinfo=timezone.utc),
+        datetime.combine(add_months(month, 1), datetime.min.time(), tzinfo=timezone.utc),
+    )
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def is_partitioned(conn: Connection, table: str = "orders") -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table},
+    ).scalar())
+
+
+def partition_months(conn: Connection, table: str = "orders") -> list[date]:
+    """Months that currently have a partition of ``table``, oldest first."""
+    names = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ),
+        {"table": table},
+    ).scalars()
+    prefix = f"{table}_p"
+    months = []
+    for name in names:
+        try:
+            months.append(datetime.strptime(name[len(prefix):], "%Y_%m").date())
+        except ValueError:
+            continue
+    return sorted(months)
+
+
+def _months(first: date, last: date) -> list[date]:
+    months = []
+    while first <= last:
+        months.append(first)
+        first = add_months(first, 1)
+    return months
+
+
+def _create_partition(conn: Connection, table: str, month: date) -> None:
+    conn.execute(text(
+        f"CREATE TABLE {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') "
+        f"TO ('{add_months(month, 1):%Y-%m-%d} 00:00:00+00')"
+    ))
+
+
+def create_partitions(conn: Connection, first: date, last: date) -> int:
+    """Create the monthly partitions of every table from ``first`` to ``last`` inclusive.
+    
+    Existing partitions are left alone. Returns the number created.
+    """
+    created = 0
+    for table in PARTITIONED_TABLES:
+        existing = set(partition_months(conn, table.name))
+        for month in _months(first, last):
+            if month not in existing:
+                _create_partition(conn, table.name, month)
+                created += 1
+    return created
+
+
+def ensure_partitions(conn: Connection, months_ahead: Optional[int] = None) -> int:
+    """Create partitions from this month through ``months_ahead`` months from now."""
+    if months_ahead is None:
+        months_ahead = settings.ORDER_PARTITION_PREMAKE_MONTHS
+    current = month_start(datetime.now(timezone.utc))
+    return create_partitions(conn, current, add_months(current, months_ahead))
+
+
+def drop_partition(conn: Connection, month: date) -> None:
+    """Detach and drop ``month`` from every partitioned table."""
+    for table in PARTITIONED_TABLES:
+        name = partition_name(table.name, month)
+        conn.execute(text(f"ALTER TABLE {table.name} DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+
+
+def _create_constraints(conn: Connection, table) -> None:
+    """The model's keys and indexes on the new parent; unique ones gain the partition key."""
+    conn.execute(text(f"ALTER TABLE {table.name} ADD PRIMARY KEY (id, created_at)"))
+    for constraint in table.foreign_key_constraints:
+        if constraint.referred_table in PARTITIONED_TABLES:
+            continue
+        columns = ", ".join(column.name for column in constraint.columns)
+        referred = ", ".join(element.column.name for element in constraint.elements)
+        conn.execute(text(
+            f"ALTER TABLE {table.name} ADD FOREIGN KEY ({columns}) "
+            f"REFERENCES {constraint.referred_table.name} ({referred})"
+        ))
+    for index in table.indexes:
+        if index.unique:
+            columns = ", ".join(column.name for column in index.columns)
+            conn.execute(text(f"CREATE UNIQUE INDEX {index.name} ON {table.name} ({columns}, created_at)"))
+        else:
+            index.create(conn)
+
+
+def _partition_table(conn: Connection, table) -> None:
+    """Move ``table``'s rows into a new partitioned table of the same name."""
+    name = table.name
+    legacy = f"{name}_unpartitioned"
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": name}).scalar()
+    
+    conn.execute(text(f"ALTER TABLE {name} RENAME TO {legacy}"))
+    conn.execute(text(f"UPDATE {legacy} SET created_at = now() WHERE created_at IS NULL"))
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"))
+    conn.execute(text(f"ALTER TABLE {name} ALTER COLUMN created_at SET NOT NULL"))
+    
+    oldest = conn.execute(text(f"SELECT min(created_at) FROM {legacy}")).scalar()
+    current = month_start(datetime.now(timezone.utc))
+    first = month_start(oldest) if oldest else current
+    for month in _months(first, add_months(current, settings.ORDER_PARTITION_PREMAKE_MONTHS)):
+        _create_partition(conn, name, month)
+    
+    copied = conn.execute(text(f"INSERT INTO {name} SELECT * FROM {legacy}")).rowcount
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {name}.id"))
+    # Dropping the old table first frees its index and constraint names
+    conn.execute(text(f"DROP TABLE {legacy}"))
+    _create_constraints(conn, table)
+    logger.info("Partitioned %s by month (%d rows copied)", name, copied)
+
+
+REGISTRY_TABLE = "order_number_registry"
+
+
+def ensure_order_number_registry(conn: Connection) -> bool:
+    """Enforce unique order numbers across partitions through ``order_number_registry``.
+    
+    Creates the table and the insert trigger on ``orders`` and backfills the
+    existing numbers. Returns False, doing nothing, if the trigger exists.
+    """
+    if conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'orders_register_number' "
+        "AND tgrelid = to_regclass(:table))"
+    ), {"table": Order.__tablename__}).scalar():
+        return False
+    length = Order.__table__.c.order_number.type.length
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {REGISTRY_TABLE} ("
+        f"order_number varchar({length}) PRIMARY KEY, "
+        "created_at timestamptz NOT NULL)"
+    ))
+    conn.execute(text(
+        "CREATE OR REPLACE FUNCTION orders_register_number() RETURNS trigger AS $$ "
+        f"BEGIN INSERT INTO {REGISTRY_TABLE} (order_number, created_at) "
+        "VALUES (NEW.order_number, NEW.created_at); RETURN NEW; END $$ LANGUAGE plpgsql"
+    ))
+    # Creating the trigger blocks inserts until commit, so the backfill misses nothing
+    conn.execute(text(
+        "CREATE TRIGGER orders_register_number AFTER INSERT "
+        f"ON {Order.__tablename__} FOR EACH ROW EXECUTE FUNCTION orders_register_number()"
+    ))
+    conn.execute(text(
+        f"INSERT INTO {REGISTRY_TABLE} (order_number, created_at) "
+        f"SELECT order_number, created_at FROM {Order.__tablename__} "
+        "ON CONFLICT (order_number) DO NOTHING"
+    ))
+    return True
+
+
+def partition_orders(engine: Engine) -> bool:
+    """Convert ``orders`` and ``order_items`` to monthly partitioned tables.
+    
+    Runs in one transaction holding exclusive locks on both tables while
+    their rows are copied, so run it in a maintenance window on a large
+    database. Returns False, doing nothing, if the tables are already
+    partitioned or the database is not PostgreSQL.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.begin() as conn:
+        if is_partitioned(conn, Order.__tablename__):
+            return False
+        conn.execute(text(f"LOCK TABLE {', '.join(table.name for table in PARTITIONED_TABLES)} IN ACCESS EXCLUSIVE MODE"))
+        
+        # Foreign keys into a partitioned table need a unique key without created_at
+        references = conn.execute(text(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid = to_regclass(:table)"
+        ), {"table": Order.__tablename__}).all()
+        for table, constraint in references:
+            conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT {constraint}"))
+        
+        for table in PARTITIONED_TABLES:
+            _partition_table(conn, table)
+        ensure_order_number_registry(conn)
+    return True
+
+
+def maintain_partitions(engine: Engine) -> int:
+    """Keep partitioned order tables ready for new orders; returns partitions created.
+    
+    Adds the order number registry if it is missing (tables partitioned by an
+    earlier release) and creates partitions ``ORDER_PARTITION_PREMAKE_MONTHS``
+    ahead. Processes starting together take turns through an advisory lock.
+    Does nothing on unpartitioned tables or other databases.
+    """
+    if engine.dialect.name != "postgresql":
+        return 0
+    with engine.begin() as conn:
+        if not is_partitioned(conn, Order.__tablename__):
+            return 0
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": advisory_lock_key(MAINTENANCE_LOCK)})
+        ensure_order_number_registry(conn)
+        return ensure_partitions(conn)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from backend.db.database import engine
+    
+    if partition_orders(engine):
+        print("orders and order_items are now partitioned by month")
+    else:
+        print("Nothing to do (already partitioned, or not PostgreSQL)")
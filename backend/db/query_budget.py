@@ -0,0 +1,106 @@
+"""Per-route SQL query budgets, N+1 detection and test helpers."""
+import re
+from contextlib import contextmanager
+from typing import Optional
+from backend.app.config import get_settings
+from backend.db.instrumentation import QueryStats, add_capture, remove_capture
+
+settings = get_settings()
+
+# Maximum statements per request, keyed by "METHOD /route/template".
+# Routes not listed fall back to settings.QUERY_BUDGET_DEFAULT. A handler whose
+# query count depends on its input (e.g. a paged stream) can set
+# request.state.query_budget, and request.state.allow_repeated_queries for
+# statements that repeat by design.
+QUERY_BUDGETS = {
+    "GET /api/products/": 3,
+    "GET /api/products/{product_id}": 3,  # +1 to load a hot SKU's stock shards
+    "GET /api/orders/": 4,
+    "GET /api/orders/{order_id}": 3,
+    "GET /api/orders/by-number/{order_number}": 3,
+    "GET /api/admin/orders/search": 5,
+    "GET /api/admin/dashboard/stats": 7,
+}
+
+# Placeholder lists such as "IN (?, ?, ?)" vary with the number of values
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|\$\d+|:\w+))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a request or captured block exceeds its query budget."""
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so executions differing only in list sizes compare equal."""
+    return _PLACEHOLDER_LIST.sub("(...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def repeated_shapes(stats: QueryStats, threshold: Optional[int] = None) -> list[tuple[str, int]]:
+    """Return SELECT shapes executed at least ``threshold`` times, most frequent first.
+    
+    Writes are ignored: batched ORM inserts may run row by row on some
+    dialects, which is not the lookup-per-row pattern this is meant to catch.
+    """
+    threshold = threshold or settings.QUERY_REPEAT_THRESHOLD
+    shapes = {}
+    for statement, count in stats.statements.items():
+        if statement.lstrip()[:6].upper() != "SELECT":
+            continue
+        shape = statement_shape(statement)
+        shapes[shape] = shapes.get(shape, 0) + count
+    return sorted(
+        ((shape, count) for shape, count in shapes.items() if count >= threshold),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+
+
+def budget_for(route_key: str) -> int:
+    """Return the query budget for a "METHOD /template" route key."""
+    return QUERY_BUDGETS.get(route_key, settings.QUERY_BUDGET_DEFAULT)
+
+
+def check_stats(stats: QueryStats, budget: int, allow_repeats: bool = False) -> list[str]:
+    """Describe every budget or N+1 violation in ``stats`` (empty if none)."""
+    problems = []
+    if stats.count > budget:
+        problems.append(f"{stats.count} queries exceeds budget of {budget}")
+    if not allow_repeats:
+        for shape, count in repeated_shapes(stats):
+            problems.append(f"possible N+1: {count}x {shape[:200]}")
+    return problems
+
+
+@contextmanager
+def capture_queries():
+    """Collect every statement executed in the block, from any thread.
+    
+    Works across the thread boundary of ``fastapi.testclient.TestClient``::
+    
+        with capture_queries() as stats:
+            client.get("/api/orders/")
+        print(stats.count)
+    """
+    stats = QueryStats()
+    add_capture(stats)
+    try:
+        yield stats
+    finally:
+        remove_capture(stats)
+
+
+@contextmanager
+def assert_max_queries(budget: int, allow_repeats: bool = False):
+    """Fail if the block issues more than ``budget`` statements or repeats one shape.
+    
+    Example: ``list_orders`` with 100 orders issues at most 4 queries::
+    
+        with assert_max_queries(4):
+            client.get("/api/orders/", params={"limit": 100})
+    """
+    with capture_queries() as stats:
+        yield stats
+    problems = check_stats(stats, budget, allow_repeats)
+    if problems:
+        raise QueryBudgetExceeded("; ".join(problems))
@@ -0,0 +1,22 @@
+"""Shared Redis client."""
+from functools import lru_cache
+from backend.app.config import get_settings
+
+settings = get_settings()
+
+
+@lru_cache
+def get_redis():
+    """Return the process-wide asyncio Redis client (connections are opened lazily).
+    
+    Timeouts are short: callers treat Redis as an optimisation and fall back
+    to local state when it is slow or down.
+    """
+    from redis import asyncio as aioredis
+    
+    return aioredis.from_url(
+        settings.REDIS_URL,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        health_check_interval=30,
+    )
@@ -0,0 +1,140 @@
+"""Slow-query recorder with sampled EXPLAIN plans."""
+import itertools
+import logging
+import random
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+from backend.app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+MAX_STATEMENT_LENGTH = 4000
+
+# Set while an EXPLAIN runs so its own execution is never recorded
+_explaining: ContextVar[bool] = ContextVar("slow_query_explaining", default=False)
+
+# SELECTs that lock rows or have side effects (advisory locks, sequences) are
+# only planned, never re-run: ANALYZE would take the same locks again, and a
+# session-level advisory lock would stay on a pooled connection.
+UNSAFE_TO_ANALYZE = re.compile(
+    r"\bFOR\s+(?:NO\s+KEY\s+|KEY\s+)?(?:UPDATE|SHARE)\b|\bSKIP\s+LOCKED\b|\bNOWAIT\b"
+    r"|\b(?:pg_\w*lock\w*|nextval|setval|pg_notify|set_config)\s*\(",
+    re.IGNORECASE,
+)
+
+
+def parameters_shape(parameters, executemany: bool):
+    """Describe bound parameters by type only; values may contain customer data."""
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "row": parameters_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class SlowQueryRecorder:
+    """Keep the most recent slow statements in a bounded ring buffer.
+    
+    Recording happens on the query path, so it only copies the statement and
+    a parameter type summary. EXPLAIN (ANALYZE, BUFFERS) runs on a background
+    thread for a sampled subset of slow SELECTs (ANALYZE executes the
+    statement, so writes are never explained, and locking SELECTs only get a
+    plain EXPLAIN).
+    """
+    
+    def __init__(self, threshold_ms: float, size: int, explain_sample_rate: float):
+        # A non-positive threshold disables recording
+        self.threshold = threshold_ms / 1000.0 if threshold_ms > 0 else float("inf")
+        self.explain_sample_rate = explain_sample_rate
+        self._records = deque(maxlen=size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._explain_pending = threading.Semaphore(1)
+    
+    def record(self, engine, statement, parameters, executemany, elapsed, scope=None) -> None:
+        """Record a statement that exceeded the threshold."""
+        if _explaining.get():
+            return
+        
+        route = None
+        if scope is not None:
+            from backend.app.middleware import route_template
+            route = f"{scope.get('method')} {route_template(scope)}"
+        
+        entry = {
+            "id": next(self._ids),
+            "recorded_at": datetime.utcnow().isoformat(),
+            "duration_ms": round(elapsed * 1000, 2),
+            "route": route,
+            "statement": statement[:MAX_STATEMENT_LENGTH],
+            "parameters_shape": parameters_shape(parameters, executemany),
+            "plan": None,
+        }
+        with self._lock:
+            self._records.append(entry)
+        logger.warning("Slow query (%.1f ms) on %s: %s", entry["duration_ms"], route, statement[:200])
+        
+        if (
+            self.explain_sample_rate > 0
+            and not executemany
+            and engine.dialect.name == "postgresql"
+            and statement.lstrip()[:6].upper() == "SELECT"
+            and random.random() < self.explain_sample_rate
+            and self._explain_pending.acquire(blocking=False)
+        ):
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+            self._executor.submit(self._explain, engine, entry, statement, parameters)
+    
+    def _explain(self, engine, entry: dict, statement: str, parameters) -> None:
+        """Run EXPLAIN (ANALYZE, BUFFERS) for a recorded statement and attach the plan.
+        
+        Statements matching ``UNSAFE_TO_ANALYZE`` get a plain EXPLAIN, which
+        does not execute them.
+        """
+        token = _explaining.set(True)
+        analyze = not UNSAFE_TO_ANALYZE.search(statement)
+        try:
+            with engine.connect() as conn:
+                timeout_ms = int(settings.SLOW_QUERY_EXPLAIN_TIMEOUT_MS)
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+                rows = conn.exec_driver_sql(
+                    ("EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN ") + statement, parameters
+                ).fetchall()
+                conn.rollback()
+            plan = "\n".join(row[0] for row in rows)
+            entry["plan"] = plan if analyze else "(not executed: the statement takes locks or has side effects)\n" + plan
+        except Exception as exc:
+            entry["plan"] = f"EXPLAIN failed: {exc}"
+        finally:
+            _explaining.reset(token)
+            self._explain_pending.release()
+    
+    def recent(self, limit: Optional[int] = None) -> list[dict]:
+        """Return recorded slow queries, newest first."""
+        with self._lock:
+            records = list(self._records)
+        records.reverse()
+        return records[:limit] if limit else records
+    
+    def clear(self) -> None:
+        """Drop all recorded slow queries."""
+        with self._lock:
+            self._records.clear()
+
+
+slow_queries = SlowQueryRecorder(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    size=settings.SLOW_QUERY_BUFFER_SIZE,
+    explain_sample_rate=settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+)
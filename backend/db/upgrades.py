@@ -0,0 +1,66 @@
+"""Bring databases created by earlier releases up to the current schema.
+
+``Base.metadata.create_all`` only creates missing tables, so columns and
+indexes added to tables that already exist are listed here. ``init_db``
+applies them before partitioning; every step is skipped when it has already
+been applied, so running it again is harmless.
+
+Usage:
+    python -m backend.db.upgrades
+"""
+from sqlalchemy import inspect, text
+from backend.db.database import Base
+from backend.db.models import Inventory, Order
+
+# Columns added to existing tables, in release order
+ADDED_COLUMNS = (
+    # Write-time low/out-of-stock markers
+    Inventory.__table__.c.low_stock_since,
+    Inventory.__table__.c.out_of_stock_since,
+    # Checkout trace context continued by payment webhooks
+    Order.__table__.c.trace_parent,
+    # Sharded stock for hot SKUs
+    Inventory.__table__.c.shard_count,
+)
+
+# Indexes added to existing tables, by (table, index name)
+ADDED_INDEXES = (
+    ("inventory", "ix_inventory_low_stock"),
+    ("inventory", "ix_inventory_out_of_stock"),
+    ("orders", "ix_orders_customer_email_trgm"),
+    ("orders", "ix_orders_customer_name_trgm"),
+    ("orders", "ix_orders_tracking_number_trgm"),
+    ("orders", "ix_orders_order_number_prefix"),
+    ("orders", "ix_orders_created_at_id"),
+    ("orders", "ix_orders_status_created_at"),
+)
+
+
+def upgrade_schema(engine) -> int:
+    """Add missing columns and indexes to existing tables; returns the number of changes."""
+    applied = 0
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        tables = set(inspector.get_table_names())
+        ddl = conn.dialect.ddl_compiler(conn.dialect, None)
+        
+        for column in ADDED_COLUMNS:
+            table = column.table.name
+            if table not in tables or column.name in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl.get_column_specification(column)}"))
+            applied += 1
+        
+        for table_name, index_name in ADDED_INDEXES:
+            if table_name not in tables or index_name in {i["name"] for i in inspector.get_indexes(table_name)}:
+                continue
+            table = Base.metadata.tables[table_name]
+            next(index for index in table.indexes if index.name == index_name).create(conn)
+            applied += 1
+    return applied
+
+
+if __name__ == "__main__":
+    from backend.db.database import engine
+    
+    print(f"Applied {upgrade_schema(engine)} schema changes")
@@ -1,18 +1,27 @@
 """Initialize database with tables and seed data."""
 from backend.db.database import engine, Base, SessionLocal
-from backend.db.models import Product, Inventory, AdminUser
+from backend.db.models import Product, Inventory, AdminUser, MovementKind
+from backend.db.partitioning import maintain_partitions
+from backend.db.upgrades import upgrade_schema
 from backend.app.config import get_settings
-from passlib.context import CryptContext
+from backend.services.inventory import InventoryService
+from backend.services.inventory_ledger import InventoryLedger
 from datetime import datetime
 
 settings = get_settings()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def init_db():
     """Create all database tables."""
     Base.metadata.create_all(bind=engine)
     print("Database tables created")
+    changes = upgrade_schema(engine)
+    if changes:
+        print(f"Schema upgraded: {changes} columns/indexes added")
+    # Converting to partitioned tables is a separate, locking step (python -m backend.db.partitioning)
+    created = maintain_partitions(engine)
+    if created:
+        print(f"Created {created} order partitions")
 
 
 def seed_data():
@@ -23,6 +32,9 @@ def seed_data():
         # Create admin user
         admin = db.query(AdminUser).filter(AdminUser.username == settings.ADMIN_USERNAME).first()
         if not admin:
+            from passlib.context import CryptContext
+            
+            pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
             hashed_password = pwd_context.hash(settings.ADMIN_PASSWORD)
             admin = AdminUser(
                 username=settings.ADMIN_USERNAME,
@@ -87,12 +99,24 @@ def seed_data():
                     quantity=product_data["initial_stock"],
                     low_stock_threshold=product_data["low_stock_threshold"],
                 )
+                inventory.sync_stock_flags()
                 db.add(inventory)
+                InventoryLedger(db).record(product.id, product_data["initial_stock"], MovementKind.RESTOCK, note="initial stock")
                 db.commit()
                 print(f"Product created: {product_data['name']}")
             else:
                 print(f"Product already exists: {product_data['name']}")
         
+        # Backfill low/out-of-stock markers for rows written before they existed
+        changed = InventoryService(db).rebuild_stock_flags()
+        if changed:
+            print(f"Stock flags backfilled: {changed} inventory rows")
+        
+        # Open the movement ledger for stock that predates it
+        opened = InventoryLedger(db).open_balances()
+        if opened:
+            print(f"Inventory ledger opened: {opened} products")
+        
         print("Seed data completed")
     
     except Exception as e:
@@ -0,0 +1 @@
+"""Background jobs, runnable with ``python -m backend.jobs.<name>``."""
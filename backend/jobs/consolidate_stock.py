@@ -0,0 +1,40 @@
+"""Rebalance hot SKUs' stock shards.
+
+Checkouts drain shards unevenly; once a shard is empty, purchases landing on
+it probe other shards and, when stock is fragmented, fall back to locking
+the whole SKU. Rebalancing every few seconds during a launch keeps each
+shard holding an even share.
+
+Usage:
+    python -m backend.jobs.consolidate_stock [--interval SECONDS]
+"""
+import argparse
+import logging
+import time
+from backend.db.database import SessionLocal
+from backend.services.inventory import InventoryService
+
+logger = logging.getLogger(__name__)
+
+
+def run_once() -> int:
+    """Rebalance every hot SKU once; returns the number of SKUs rebalanced."""
+    db = SessionLocal()
+    try:
+        inventory_service = InventoryService(db)
+        return inventory_service.consolidate_hot_stock()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--interval", type=float, default=0.0, help="repeat every N seconds (0 = run once)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    
+    while True:
+        logger.info("Rebalanced %d hot SKUs", run_once())
+        if args.interval <= 0:
+            break
+        time.sleep(args.interval)
@@ -0,0 +1,120 @@
+"""Create upcoming order partitions and archive old ones.
+
+Each run makes sure ``orders`` and ``order_items`` have monthly partitions
+``ORDER_PARTITION_PREMAKE_MONTHS`` ahead, then archives months older than
+``ORDER_ARCHIVE_AFTER_MONTHS`` (off by default). An archived month's orders
+are exported to ``ORDER_ARCHIVE_DIR`` (see ``backend.services.order_archive``),
+and its partitions are then detached and dropped. Nothing is archived unless
+that directory is an existing, writable absolute path. A month stays in the database while
+any of its orders is still open (pending through shipped). Does nothing
+until the tables are partitioned (``python -m backend.db.partitioning``).
+
+Usage:
+    python -m backend.jobs.order_partitions [--interval SECONDS]
+"""
+import argparse
+import logging
+import time
+from datetime import date, datetime, timezone
+from typing import Optional
+from sqlalchemy import func, text
+from backend.app.config import get_settings
+from backend.app.metrics import ORDERS_ARCHIVED
+from backend.db.database import SessionLocal, engine
+from backend.db.models import Order, OrderStatus
+from backend.db.partitioning import (
+    PARTITIONED_TABLES, add_months, drop_partition, is_partitioned, maintain_partitions, month_bounds,
+    month_start, partition_months, partition_name,
+)
+from backend.services.order_archive import order_archive
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = (OrderStatus.PENDING, OrderStatus.PAID, OrderStatus.PROCESSING, OrderStatus.SHIPPED)
+
+# Give up on detaching rather than queue every order query behind the lock
+DETACH_LOCK_TIMEOUT = "5s"
+
+
+def archive_month(month: date) -> Optional[int]:
+    """Export and drop one month; returns the orders archived, or None if it was kept.
+    
+    The month's partitions are locked against writes while they are
+    exported, and dropped in the same transaction only if every order made it
+    to disk.
+    """
+    problem = order_archive.unusable_reason()
+    if problem:
+        raise RuntimeError(f"Refusing to archive {month:%Y-%m}: {problem}")
+    
+    db = SessionLocal()
+    try:
+        for table in PARTITIONED_TABLES:
+            db.execute(text(f"LOCK TABLE {partition_name(table.name, month)} IN SHARE MODE"))
+        
+        start, end = month_bounds(month)
+        in_month = db.query(func.count(Order.id)).filter(Order.created_at >= start, Order.created_at < end)
+        still_open = in_month.filter(Order.status.in_(OPEN_STATUSES)).scalar()
+        if still_open:
+            logger.warning("Keeping orders from %s: %d are still open", f"{month:%Y-%m}", still_open)
+            db.rollback()
+            return None
+        expected = in_month.scalar()
+        
+        written = order_archive.export_month(db, month)
+        if written != expected:
+            raise RuntimeError(f"Exported {written} of {expected} orders from {month:%Y-%m}")
+        
+        db.execute(text(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'"))
+        drop_partition(db.connection(), month)
+        db.commit()
+        return written
+    finally:
+        db.close()
+
+
+def run_once() -> dict:
+    """Create upcoming partitions and archive old months; returns what was done."""
+    totals = {"partitions_created": 0, "months_archived": 0, "orders_archived": 0}
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return totals
+    totals["partitions_created"] = maintain_partitions(engine)
+    with engine.connect() as conn:
+        months = partition_months(conn)
+    
+    if settings.ORDER_ARCHIVE_AFTER_MONTHS <= 0:
+        return totals
+    problem = order_archive.unusable_reason()
+    if problem:
+        logger.error("Not archiving orders: %s", problem)
+        return totals
+    cutoff = add_months(month_start(datetime.now(timezone.utc)), -settings.ORDER_ARCHIVE_AFTER_MONTHS)
+    for month in months:
+        if month >= cutoff:
+            break
+        archived = archive_month(month)
+        if archived is None:
+            continue
+        logger.info("Archived %d orders from %s", archived, f"{month:%Y-%m}")
+        ORDERS_ARCHIVED.inc(archived)
+        totals["months_archived"] += 1
+        totals["orders_archived"] += archived
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--interval", type=float, default=0.0, help="repeat every N seconds (0 = run once)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    
+    while True:
+        logger.info(
+            "Created %(partitions_created)d partitions, archived %(orders_archived)d orders "
+            "from %(months_archived)d months", run_once(),
+        )
+        if args.interval <= 0:
+            break
+        time.sleep(args.interval)
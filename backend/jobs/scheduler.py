@@ -0,0 +1,243 @@
+"""In-process scheduler for periodic jobs, started by the API's lifespan.
+
+Every API worker runs a scheduler, but only the one holding the
+``jobs.scheduler.leader`` advisory lock runs jobs; the others retry the lock
+every ``SCHEDULER_LEADER_RETRY_SECONDS`` and take over when the leader goes
+away. Each run additionally holds a per-job advisory lock, so a job never
+overlaps itself across pods during a leader change. Jobs that guard
+themselves with a lock (such as the order sweeper) keep doing so, which also
+covers manual ``python -m backend.jobs.<name>`` runs. Jobs are synchronous
+and run in a thread, off the event loop serving requests.
+"""
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from backend.app.config import get_settings
+from backend.app.metrics import SCHEDULED_JOB_DURATION, SCHEDULED_JOB_RUNS, SCHEDULER_LEADER
+from backend.db.locks import AdvisoryLock, advisory_lock
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+LEADER_LOCK = "jobs.scheduler.leader"
+
+# Per-job run locks; namespaced apart from the locks jobs take themselves
+RUN_LOCK_PREFIX = "jobs.scheduler.run."
+
+# Seconds between leadership checks while leading
+LEADER_CHECK_SECONDS = 5.0
+
+
+class CronSchedule:
+    """Five-field cron expression (minute hour day-of-month month day-of-week), in UTC.
+    
+    Fields accept ``*``, numbers, ranges (``1-5``), lists (``1,15``) and steps
+    (``*/5``, ``0-30/10``). Day of week is 0-6 with Sunday as 0. As in cron,
+    when both day fields are restricted a day matching either one runs.
+    """
+    
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+    
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)
+        )
+        self.any_day = parts[2] == "*"
+        self.any_weekday = parts[4] == "*"
+    
+    @staticmethod
+    def _parse(field: str, low: int, high: int) -> set[int]:
+        values = set()
+        for item in field.split(","):
+            spec, _, step = item.partition("/")
+            if spec == "*":
+                start, end = low, high
+            elif "-" in spec:
+                start, end = (int(bound) for bound in spec.split("-", 1))
+            else:
+                start = end = int(spec)
+            if start < low or end > high or start > end:
+                raise ValueError(f"Cron field {field!r} outside {low}-{high}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+    
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.isoweekday() % 7) in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+    
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after ``moment``."""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 4)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+
+class IntervalSchedule:
+    """Run every ``seconds``."""
+    
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+    
+    def next_after(self, moment: datetime) -> datetime:
+        return moment + timedelta(seconds=self.seconds)
+
+
+class Job:
+    """A named callable with a schedule."""
+    
+    def __init__(self, name: str, func: Callable[[], object], schedule, jitter: float):
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.jitter = jitter
+        self.next_run: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+    
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+
+class Scheduler:
+    """Run registered jobs on this process while it holds the leader lock."""
+    
+    def __init__(self, jitter: Optional[float] = None):
+        self.jitter = settings.SCHEDULER_JITTER_SECONDS if jitter is None else jitter
+        self.jobs: dict[str, Job] = {}
+        self.leader = AdvisoryLock(LEADER_LOCK)
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+    
+    def add(
+        self,
+        name: str,
+        func: Callable[[], object],
+        cron: Optional[str] = None,
+        every: Optional[float] = None,
+        jitter: Optional[float] = None,
+    ) -> Job:
+        """Register ``func`` to run on a cron expression or every N seconds."""
+        if (cron is None) == (every is None):
+            raise ValueError("Pass exactly one of cron or every")
+        schedule = CronSchedule(cron) if cron is not None else IntervalSchedule(every)
+        job = Job(name, func, schedule, self.jitter if jitter is None else jitter)
+        self.jobs[name] = job
+        return job
+    
+    async def start(self) -> None:
+        self._stopping.clear()
+        self._loop_task = asyncio.create_task(self._run_loop(), name="scheduler")
+    
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop scheduling, wait up to ``timeout`` for running jobs and give up leadership."""
+        self._stopping.set()
+        if self._loop_task:
+            await self._loop_task
+        running = [job.task for job in self.jobs.values() if job.running]
+        if running:
+            await asyncio.wait(running, timeout=timeout)
+        await asyncio.to_thread(self.leader.release)
+        SCHEDULER_LEADER.set(0)
+    
+    async def _run_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                leading = await asyncio.to_thread(self._check_leadership)
+            except Exception:
+                logger.exception("Scheduler leadership check failed")
+                leading = False
+            
+            wait = settings.SCHEDULER_LEADER_RETRY_SECONDS
+            if leading:
+                now = datetime.utcnow()
+                for job in self.jobs.values():
+                    if job.next_run is None:
+                        job.next_run = job.schedule.next_after(now)
+                    elif job.next_run <= now:
+                        job.next_run = job.schedule.next_after(now)
+                        if job.running:
+                            logger.warning("Job %s still running; skipping this run", job.name)
+                            SCHEDULED_JOB_RUNS.labels(job=job.name, result="overlap").inc()
+                        else:
+                            job.task = asyncio.create_task(self._run(job), name=f"job:{job.name}")
+                next_due = min((job.next_run for job in self.jobs.values()), default=None)
+                wait = LEADER_CHECK_SECONDS
+                if next_due is not None:
+                    wait = min(wait, max((next_due - datetime.utcnow()).total_seconds(), 0.05))
+            
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+    
+    def _check_leadership(self) -> bool:
+        was_leader = self.leader.held
+        leading = self.leader.still_held() if was_leader else self.leader.try_acquire()
+        if leading != was_leader:
+            logger.info("Scheduler %s leadership", "acquired" if leading else "lost")
+            SCHEDULER_LEADER.set(1 if leading else 0)
+            if not leading:
+                for job in self.jobs.values():
+                    job.next_run = None
+        return leading
+    
+    async def _run(self, job: Job) -> None:
+        if job.jitter:
+            await asyncio.sleep(random.uniform(0, job.jitter))
+        await asyncio.to_thread(self._execute, job)
+    
+    def _execute(self, job: Job) -> None:
+        """Run a job under its advisory lock and record the outcome."""
+        with advisory_lock(f"{RUN_LOCK_PREFIX}{job.name}") as acquired:
+            if not acquired:
+                logger.info("Job %s is running elsewhere; skipped", job.name)
+                SCHEDULED_JOB_RUNS.labels(job=job.name, result="locked").inc()
+                return
+            start = time.perf_counter()
+            result = "success"
+            try:
+                job.func()
+            except Exception:
+                result = "failure"
+                logger.exception("Job %s failed", job.name)
+            finally:
+                elapsed = time.perf_counter() - start
+                SCHEDULED_JOB_DURATION.labels(job=job.name).observe(elapsed)
+                SCHEDULED_JOB_RUNS.labels(job=job.name, result=result).inc()
+                logger.info("Job %s finished (%s) in %.2fs", job.name, result, elapsed)
+
+
+def build_scheduler() -> Scheduler:
+    """The app's jobs and their schedules."""
+    from backend.jobs import consolidate_stock, inventory_snapshots, order_partitions, sweep_pending_orders
+    
+    scheduler = Scheduler()
+    scheduler.add("sweep_pending_orders", sweep_pending_orders.sweep, cron=settings.JOB_SWEEP_PENDING_ORDERS_CRON)
+    scheduler.add("inventory_snapshots", inventory_snapshots.run_once, cron=settings.JOB_INVENTORY_SNAPSHOTS_CRON)
+    scheduler.add(
+        "consolidate_stock", consolidate_stock.run_once,
+        every=settings.JOB_CONSOLIDATE_STOCK_SECONDS, jitter=0,
+    )
+    scheduler.add("order_partitions", order_partitions.run_once, cron=settings.JOB_ORDER_PARTITIONS_CRON)
+    return scheduler
@@ -0,0 +1,98 @@
+"""Cancel abandoned PENDING orders and return their stock.
+
+Orders left unpaid for ``PENDING_ORDER_TTL_MINUTES`` are cancelled in
+batches of ``PENDING_ORDER_SWEEP_BATCH_SIZE``. Each batch is one transaction:
+a set-based status update, the stock of every item put back into
+``inventory``, and the matching release movements in the ledger. A Postgres
+advisory lock keeps replicas from sweeping at the same time, and
+``SKIP LOCKED`` leaves orders that a payment webhook is updating to the
+next run.
+
+Usage:
+    python -m backend.jobs.sweep_pending_orders [--interval SECONDS]
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import func
+from backend.app.config import get_settings
+from backend.app.metrics import PENDING_ORDERS_SWEPT, STOCK_UNITS_RECLAIMED
+from backend.db.database import SessionLocal
+from backend.db.locks import try_advisory_xact_lock
+from backend.db.models import Order, OrderStatus
+from backend.services.inventory import InventoryService
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = "jobs.sweep_pending_orders"
+
+
+def sweep(ttl_minutes: Optional[int] = None, batch_size: Optional[int] = None) -> dict:
+    """Cancel stale PENDING orders batch by batch; returns totals swept.
+    
+    Stops early, without sweeping, if another replica holds the lock.
+    """
+    ttl_minutes = settings.PENDING_ORDER_TTL_MINUTES if ttl_minutes is None else ttl_minutes
+    batch_size = batch_size or settings.PENDING_ORDER_SWEEP_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(minutes=ttl_minutes)
+    totals = {"orders": 0, "units": 0, "locked_out": False}
+    
+    db = SessionLocal()
+    try:
+        while True:
+            if not try_advisory_xact_lock(db, LOCK_NAME):
+                db.rollback()
+                totals["locked_out"] = True
+                break
+            
+            order_ids = [
+                order_id
+                for (order_id,) in db.query(Order.id)
+                .filter(Order.status == OrderStatus.PENDING, Order.created_at < cutoff)
+                .order_by(Order.created_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            ]
+            if not order_ids:
+                db.commit()
+                break
+            
+            db.query(Order).filter(Order.id.in_(order_ids)).update(
+                {Order.status: OrderStatus.CANCELLED, Order.updated_at: func.now()},
+                synchronize_session=False,
+            )
+            inventory_service = InventoryService(db)
+            units = inventory_service.release_orders(order_ids)
+            db.commit()
+            inventory_service.send_pending_alerts()
+            
+            released = sum(units.values())
+            PENDING_ORDERS_SWEPT.inc(len(order_ids))
+            STOCK_UNITS_RECLAIMED.inc(released)
+            totals["orders"] += len(order_ids)
+            totals["units"] += released
+            if len(order_ids) < batch_size:
+                break
+    finally:
+        db.close()
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--interval", type=float, default=0.0, help="repeat every N seconds (0 = run once)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    
+    while True:
+        result = sweep()
+        if result["locked_out"] and not result["orders"]:
+            logger.info("Another replica is sweeping; skipped")
+        else:
+            logger.info("Cancelled %(orders)d abandoned orders, reclaimed %(units)d units", result)
+        if args.interval <= 0:
+            break
+        time.sleep(args.interval)
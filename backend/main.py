@@ -1,16 +1,25 @@
-"""Main entry point for the application."""
-import uvicorn
-from backend.app.server import app
+"""Main entry point for the application.
+
+Development runs a single auto-reloading uvicorn process; every other
+environment runs the multi-worker launcher in ``backend.app.launcher``.
+"""
 from backend.app.config import get_settings
 
 if __name__ == "__main__":
     settings = get_settings()
-    uvicorn.run(
-        "backend.app.server:app",
-        host=settings.API_HOST,
-        port=settings.API_PORT,
-        reload=settings.ENVIRONMENT == "development"
-    )
+    if settings.ENVIRONMENT == "development":
+        import uvicorn
+        
+        uvicorn.run(
+            "backend.app.server:app",
+            host=settings.API_HOST,
+            port=settings.API_PORT,
+            reload=True
+        )
+    else:
+        from backend.app.launcher import run
+        
+        run()
 
 
 
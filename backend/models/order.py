@@ -1,6 +1,6 @@
 """Pydantic models for orders."""
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 from backend.db.models import OrderStatus, PaymentMethod
 
@@ -24,13 +24,32 @@ class CartItem(BaseModel):
     quantity: int = Field(..., gt=0, le=10)
 
 
-class CheckoutRequest(BaseModel):
-    """Checkout request model."""
+class AdmissionRequest(BaseModel):
+    """Checkout admission request model."""
     items: List[CartItem] = Field(..., min_length=1)
+    
+    def quantities(self) -> dict:
+        """Requested quantity per product id."""
+        totals = {}
+        for item in self.items:
+            totals[item.product_id] = totals.get(item.product_id, 0) + item.quantity
+        return totals
+
+
+class CheckoutRequest(AdmissionRequest):
+    """Checkout request model."""
     shipping_address: ShippingAddress
     payment_method: PaymentMethod
 
 
+class AdmissionResponse(BaseModel):
+    """Checkout admission response model."""
+    status: Literal["admitted", "waiting"]
+    token: Optional[str] = None
+    expires_at: Optional[datetime] = None
+    retry_after: Optional[int] = None
+
+
 class OrderItemResponse(BaseModel):
     """Order item response model."""
     id: int
@@ -71,6 +90,49 @@ class OrderResponse(BaseModel):
     
     class Config:
         from_attributes = True
+    
+    @classmethod
+    def payload(cls, order) -> dict:
+        """Build the JSON-ready body for an ORM order whose items and products are loaded.
+        
+        Database rows already satisfy this schema, so routes return the dict in
+        an ``ORJSONResponse`` instead of validating a model (and having
+        FastAPI validate it again against ``response_model``).
+        """
+        return {
+            "id": order.id,
+            "order_number": order.order_number,
+            "status": order.status,
+            "payment_method": order.payment_method,
+            "customer_name": order.customer_name,
+            "customer_email": order.customer_email,
+            "customer_phone": order.customer_phone,
+            "shipping_address_line1": order.shipping_address_line1,
+            "shipping_address_line2": order.shipping_address_line2,
+            "shipping_city": order.shipping_city,
+            "shipping_state": order.shipping_state,
+            "shipping_postal_code": order.shipping_postal_code,
+            "shipping_country": order.shipping_country,
+            "subtotal_cad": order.subtotal_cad,
+            "shipping_cost_cad": order.shipping_cost_cad,
+            "total_cad": order.total_cad,
+            "tracking_number": order.tracking_number,
+            "items": [
+                {
+                    "id": item.id,
+                    "product_id": item.product_id,
+                    "product_name": item.product.name if item.product else "Unknown",
+                    "quantity": item.quantity,
+                    "price_cad": item.price_cad,
+                    "subtotal_cad": item.quantity * item.price_cad,
+                }
+                for item in order.items
+            ],
+            "created_at": order.created_at,
+            "updated_at": order.updated_at,
+            "shipped_at": order.shipped_at,
+            "delivered_at": order.delivered_at,
+        }
 
 
 class OrderUpdate(BaseModel):
@@ -41,6 +41,24 @@ class ProductResponse(ProductBase):
     
     class Config:
         from_attributes = True
+    
+    @classmethod
+    def payload(cls, product, inventory=None) -> dict:
+        """Build the JSON-ready body for an ORM product and its inventory row (if any), without validation."""
+        return {
+            "name": product.name,
+            "description": product.description,
+            "price_cad": product.price_cad,
+            "image_url": product.image_url,
+            "specifications": product.specifications,
+            "is_active": product.is_active,
+            "id": product.id,
+            "created_at": product.created_at,
+            "updated_at": product.updated_at,
+            "stock_quantity": inventory.stock_quantity if inventory else 0,
+            "is_in_stock": (not inventory.is_out_of_stock) if inventory else False,
+            "is_low_stock": inventory.is_low_stock if inventory else False,
+        }
 
 
 class ProductListResponse(BaseModel):
@@ -0,0 +1,288 @@
+"""Bulk synthetic dataset for load tests and benchmarks.
+
+Generates products with inventory, then orders with items spread over the
+``--months`` before ``--until``. The output depends only on the arguments
+(including ``--seed``), and the distributions are roughly realistic:
+- product popularity follows a Zipf curve;
+- most orders have one item and one unit;
+- order times follow a daily traffic curve that grows over the period;
+- older orders are further along the status lifecycle (recent ones pending
+  or paid, old ones delivered, a few cancelled).
+
+On PostgreSQL (psycopg) rows are streamed with COPY, elsewhere with batched
+multi-row INSERTs, ``--batch-size`` orders per transaction so memory stays
+flat. Data is appended to ``DATABASE_URL``: ids continue after the current
+maximum, missing monthly order partitions are created first, and id
+sequences are moved past the new rows afterwards. Refuses to run if orders
+already exist in the period, whose order numbers could collide.
+
+Usage:
+    python -m backend.perf.generate_data [--products 10000] [--orders 2000000] [--months 12]
+        [--until 2026-01-01] [--seed 42] [--batch-size 10000]
+"""
+import argparse
+import bisect
+import enum
+import itertools
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import func, insert, text
+from backend.app.config import get_settings
+from backend.db.database import engine
+from backend.db.models import Inventory, InventoryMovement, MovementKind, Order, OrderItem, OrderStatus, PaymentMethod, Product
+from backend.db.partitioning import create_partitions, is_partitioned, month_start
+from backend.services.order_numbers import BULK_WORKER, MAX_SEQUENCE, format_order_number
+
+settings = get_settings()
+
+MODELS = [
+    ("iPhone 15 Pro Max", 1749.0), ("iPhone 15 Pro", 1399.0), ("iPhone 15 Plus", 1249.0), ("iPhone 15", 1099.0),
+    ("iPhone 14 Pro", 1199.0), ("iPhone 14", 899.0), ("iPhone 13", 749.0), ("iPhone SE", 579.0),
+]
+STORAGE = [("128GB", 0.0), ("256GB", 200.0), ("512GB", 500.0), ("1TB", 800.0)]
+COLORS = ["Black", "White", "Blue", "Natural Titanium", "Pink", "Yellow", "Green", "Red"]
+
+FIRST_NAMES = ["Maria", "Joao", "Ana", "Pedro", "Lucas", "Juliana", "Gabriel", "Fernanda", "Rafael", "Camila",
+               "Bruno", "Larissa", "Mateus", "Beatriz", "Thiago", "Mariana"]
+LAST_NAMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+              "Costa", "Ribeiro", "Martins", "Carvalho"]
+CITIES = [("Sao Paulo", "SP", 0.35), ("Rio de Janeiro", "RJ", 0.2), ("Belo Horizonte", "MG", 0.1),
+          ("Brasilia", "DF", 0.08), ("Curitiba", "PR", 0.08), ("Porto Alegre", "RS", 0.07),
+          ("Salvador", "BA", 0.06), ("Recife", "PE", 0.06)]
+
+# Share of orders per UTC hour (Brazil evenings peak around 22:00-01:00 UTC)
+HOURLY_TRAFFIC = [6, 5, 3, 2, 1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 6, 6, 6, 6, 6, 7, 8, 8, 7]
+
+ITEMS_PER_ORDER = ([1, 2, 3], [70, 22, 8])
+UNITS_PER_ITEM = ([1, 2, 3], [85, 12, 3])
+
+
+def order_status(rng: random.Random, age_days: float) -> OrderStatus:
+    """Where an order of this age usually is in its lifecycle."""
+    if age_days < 1 / 24:
+        return rng.choices([OrderStatus.PENDING, OrderStatus.PAID], [40, 60])[0]
+    if age_days < 2:
+        return rng.choices([OrderStatus.PAID, OrderStatus.PROCESSING, OrderStatus.CANCELLED], [45, 50, 5])[0]
+    if age_days < 7:
+        return rng.choices([OrderStatus.PROCESSING, OrderStatus.SHIPPED, OrderStatus.CANCELLED], [20, 74, 6])[0]
+    if age_days < 14:
+        return rng.choices([OrderStatus.SHIPPED, OrderStatus.DELIVERED, OrderStatus.CANCELLED], [40, 53, 7])[0]
+    return rng.choices([OrderStatus.DELIVERED, OrderStatus.CANCELLED], [93, 7])[0]
+
+
+class Loader:
+    """Append rows to tables: COPY on psycopg, batched INSERTs elsewhere."""
+    
+    def __init__(self, conn):
+        self.conn = conn
+        self.copy = conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg"
+    
+    def write(self, table, columns: list[str], rows: list[tuple]) -> None:
+        if not rows:
+            return
+        if not self.copy:
+            self.conn.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+            return
+        # COPY takes enum labels, which SQLAlchemy stores as member names
+        rows = ([value.name if isinstance(value, enum.Enum) else value for value in row] for row in rows)
+        with self.conn.connection.driver_connection.cursor() as cursor:
+            with cursor.copy(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+
+
+class DataGenerator:
+    """Deterministic products, inventory, orders and items from a seed."""
+    
+    def __init__(self, seed: int, until: date, months: int):
+        self.rng = random.Random(seed)
+        self.until = datetime(until.year, until.month, until.day, tzinfo=timezone.utc)
+        self.since = self.until - timedelta(days=round(months * 30.44))
+        self.products: list[tuple[int, float, str]] = []  # (id, price, name)
+        self.popularity: list[float] = []  # cumulative weights over self.products
+    
+    def product_rows(self, first_id: int, first_inventory_id: int, count: int):
+        """Yield (product, inventory, opening movement) rows."""
+        rng = self.rng
+        for offset in range(count):
+            product_id = first_id + offset
+            model, base_price = rng.choice(MODELS)
+            storage, uplift = rng.choice(STORAGE)
+            color = rng.choice(COLORS)
+            name = f"{model} {storage} {color} #{product_id}"
+            price = base_price + uplift
+            created_at = self.since - timedelta(days=rng.randint(1, 60))
+            stock = 0 if rng.random() < 0.05 else int(rng.paretovariate(1.2) * 5)
+            threshold = rng.randint(2, 10)
+            self.products.append((product_id, price, name))
+            yield (
+                (product_id, name, f"{model} with {storage} storage in {color}.", price, None,
+                 f"{model}, {storage}", rng.random() < 0.95, created_at),
+                (first_inventory_id + offset, product_id, stock, threshold, 0,
+                 self.until if stock <= threshold else None, self.until if stock <= 0 else None, created_at),
+                (product_id, MovementKind.RESTOCK, stock, "generated stock", created_at),
+            )
+        # Zipf: the n-th most popular product sells 1/n^1.1 as much as the first
+        ranks = list(range(1, len(self.products) + 1))
+        self.rng.shuffle(ranks)
+        self.popularity = list(itertools.accumulate(1 / rank ** 1.1 for rank in ranks))
+    
+    def order_times(self, count: int):
+        """Yield ``count`` increasing order timestamps over the period."""
+        rng = self.rng
+        days = (self.until - self.since).days
+        # Traffic doubles over the period
+        day_weights = [1 + day / max(days - 1, 1) for day in range(days)]
+        total = sum(day_weights)
+        remaining = count
+        for day, weight in enumerate(day_weights):
+            orders_today = remaining if day == days - 1 else min(remaining, round(count * weight / total))
+            remaining -= orders_today
+            start = self.since + timedelta(days=day)
+            moments = sorted(
+                timedelta(hours=hour, seconds=rng.random() * 3600)
+                for hour in rng.choices(range(24), HOURLY_TRAFFIC, k=orders_today)
+            )
+            for moment in moments:
+                yield start + moment
+    
+    def order_rows(self, first_order_id: int, first_item_id: int, count: int):
+        """Yield (order row, item rows) in creation order."""
+        rng = self.rng
+        item_id = first_item_id
+        last_ms, sequence = -1, 0
+        shipping = settings.SHIPPING_COST_CAD
+        for order_id, created_at in enumerate(self.order_times(count), start=first_order_id):
+            created_ms = int(created_at.timestamp() * 1000)
+            if created_ms > last_ms:
+                last_ms, sequence = created_ms, 0
+            elif sequence < MAX_SEQUENCE:
+                sequence += 1
+            else:
+                last_ms, sequence = last_ms + 1, 0
+            created_at = datetime.fromtimestamp(last_ms / 1000, tz=timezone.utc)
+            
+            picks = rng.choices(*ITEMS_PER_ORDER)[0]
+            products = {
+                self.products[bisect.bisect_left(self.popularity, rng.random() * self.popularity[-1])]
+                for _ in range(picks)
+            }
+            items = []
+            subtotal = 0.0
+            for product_id, price, _ in sorted(products):
+                quantity = rng.choices(*UNITS_PER_ITEM)[0]
+                subtotal += price * quantity
+                items.append((item_id, order_id, product_id, quantity, price, created_at))
+                item_id += 1
+            
+            age_days = (self.until - created_at).total_seconds() / 86400
+            status = order_status(rng, age_days)
+            paid = status not in (OrderStatus.PENDING, OrderStatus.CANCELLED)
+            shipped_at = created_at + timedelta(days=rng.uniform(1, 4)) if status in (
+                OrderStatus.SHIPPED, OrderStatus.DELIVERED) else None
+            delivered_at = shipped_at + timedelta(days=rng.uniform(2, 9)) if status == OrderStatus.DELIVERED else None
+            payment_method = PaymentMethod.STRIPE if rng.random() < 0.7 else PaymentMethod.PAYPAL
+            customer = rng.randrange(max(count // 3, 1))
+            first_name = FIRST_NAMES[customer % len(FIRST_NAMES)]
+            last_name = LAST_NAMES[customer // len(FIRST_NAMES) % len(LAST_NAMES)]
+            city, state, _ = rng.choices(CITIES, [weight for *_, weight in CITIES])[0]
+            
+            yield (
+                order_id, format_order_number(last_ms, BULK_WORKER, sequence), status, payment_method,
+                f"{'pi' if payment_method == PaymentMethod.STRIPE else 'PAY'}_{order_id:012d}" if paid else None,
+                f"{first_name} {last_name}", f"customer{customer}@example.com",
+                f"+55 11 9{rng.randrange(10 ** 8):08d}",
+                f"Rua {rng.choice(LAST_NAMES)} {rng.randint(1, 3000)}", None, city, state,
+                f"{rng.randrange(10 ** 5):05d}-{rng.randrange(1000):03d}", "Brazil",
+                subtotal, shipping, subtotal + shipping,
+                f"BR{order_id:09d}" if shipped_at else None, shipped_at, delivered_at,
+                created_at, delivered_at or shipped_at,
+            ), items
+
+
+PRODUCT_COLUMNS = ["id", "name", "description", "price_cad", "image_url", "specifications", "is_active", "created_at"]
+INVENTORY_COLUMNS = ["id", "product_id", "quantity", "low_stock_threshold", "shard_count",
+                     "low_stock_since", "out_of_stock_since", "created_at"]
+MOVEMENT_COLUMNS = ["product_id", "kind", "delta", "note", "created_at"]
+ORDER_COLUMNS = [
+    "id", "order_number", "status", "payment_method", "payment_id", "customer_name", "customer_email",
+    "customer_phone", "shipping_address_line1", "shipping_address_line2", "shipping_city", "shipping_state",
+    "shipping_postal_code", "shipping_country", "subtotal_cad", "shipping_cost_cad", "total_cad",
+    "tracking_number", "shipped_at", "delivered_at", "created_at", "updated_at",
+]
+ORDER_ITEM_COLUMNS = ["id", "order_id", "product_id", "quantity", "price_cad", "created_at"]
+
+
+def next_id(conn, model) -> int:
+    return (conn.execute(func.max(model.id).select()).scalar() or 0) + 1
+
+
+def run(products: int, orders: int, months: int, until: date, seed: int, batch_size: int) -> int:
+    generator = DataGenerator(seed, until, months)
+    started = time.perf_counter()
+    
+    with engine.begin() as conn:
+        overlapping = conn.execute(
+            func.count(Order.id).select().where(Order.created_at >= generator.since, Order.created_at < generator.until)
+        ).scalar()
+        if overlapping:
+            print(f"FAIL {overlapping} orders already exist between {generator.since:%Y-%m-%d} and {until}; "
+                  "pick another --until or load into an empty database")
+            return 1
+        if is_partitioned(conn):
+            create_partitions(conn, month_start(generator.since), month_start(generator.until))
+        first_product, first_inventory = next_id(conn, Product), next_id(conn, Inventory)
+        first_order, first_item = next_id(conn, Order), next_id(conn, OrderItem)
+        
+        loader = Loader(conn)
+        rows = list(generator.product_rows(first_product, first_inventory, products))
+        loader.write(Product.__table__, PRODUCT_COLUMNS, [row[0] for row in rows])
+        loader.write(Inventory.__table__, INVENTORY_COLUMNS, [row[1] for row in rows])
+        loader.write(InventoryMovement.__table__, MOVEMENT_COLUMNS, [row[2] for row in rows])
+    print(f"{products} products and inventory rows in {time.perf_counter() - started:.1f}s")
+    
+    written_orders = written_items = 0
+    order_rows = generator.order_rows(first_order, first_item, orders)
+    while True:
+        batch = list(itertools.islice(order_rows, batch_size))
+        if not batch:
+            break
+        with engine.begin() as conn:
+            loader = Loader(conn)
+            loader.write(Order.__table__, ORDER_COLUMNS, [order for order, _ in batch])
+            items = [item for _, order_items in batch for item in order_items]
+            loader.write(OrderItem.__table__, ORDER_ITEM_COLUMNS, items)
+        written_orders += len(batch)
+        written_items += len(items)
+        elapsed = time.perf_counter() - started
+        print(f"  {written_orders}/{orders} orders, {written_items} items ({written_orders / elapsed:,.0f} orders/s)",
+              end="\r", flush=True)
+    print()
+    
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            for table in (Product, Inventory, InventoryMovement, Order, OrderItem):
+                name = table.__tablename__
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), (SELECT max(id) FROM {name}))"
+                ))
+                conn.execute(text(f"ANALYZE {name}"))
+    
+    print(f"Generated {products} products, {written_orders} orders and {written_items} items "
+          f"in {time.perf_counter() - started:.1f}s (seed {seed})")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=2_000_000)
+    parser.add_argument("--months", type=int, default=12, help="history covered by the orders")
+    parser.add_argument("--until", type=date.fromisoformat, default=datetime.now(timezone.utc).date(),
+                        help="end of the period (UTC date, exclusive); fix it for reproducible data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10_000, help="orders per transaction")
+    args = parser.parse_args()
+    sys.exit(run(args.products, args.orders, args.months, args.until, args.seed, args.batch_size))
@@ -0,0 +1,407 @@
+"""HTTP benchmark: latency percentiles and queries per request for every main route.
+
+Runs the app in-process behind ``httpx.ASGITransport`` (one event loop, like
+one server worker) against ``--database-url``. A new SQLite file is the
+default; a PostgreSQL URL works the same. An empty database is first filled
+by ``backend.perf.generate_data``. Side effects go to local stand-ins:
+- e-mails go to a fake SMTP server (STARTTLS, AUTH and ``--smtp-latency-ms``
+  per message) running on its own thread, since the app sends synchronously;
+- payment providers are replaced by Stripe-signed and PayPal webhook events
+  (no route calls the provider APIs directly).
+
+Each scenario sends ``--requests`` requests at ``--concurrency``, after a
+short warm-up. It reports p50/p95/p99 latency and throughput, plus mean SQL
+statements per request read from the ``db_queries_per_request`` histogram.
+Results are compared with ``--baseline``. The run fails if a scenario errors,
+issues more queries than its baseline, or has a p95 above the baseline by
+more than ``--tolerance``. Latency baselines are machine-specific:
+regenerate them on the reference machine with ``--update-baseline``.
+
+Rate limiting, load shedding, the waiting room and the job scheduler are
+turned off so they do not shape the results.
+
+Usage:
+    python -m backend.perf.http_bench [--database-url URL] [--requests 200] [--concurrency 8]
+        [--only list_products,create_checkout] [--update-baseline]
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import ssl
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+BASELINE_PATH = Path(__file__).with_name("baselines") / "http_bench.json"
+
+STRIPE_WEBHOOK_SECRET = "whsec_bench"
+
+# Products whose stock is topped up so checkouts never run out
+CHECKOUT_PRODUCTS = 20
+
+ENVIRONMENT = {
+    "RATE_LIMIT_ENABLED": "false",
+    "LOAD_SHEDDING_ENABLED": "false",
+    "WAITING_ROOM_ENABLED": "false",
+    "SCHEDULER_ENABLED": "false",
+    "METRICS_ENABLED": "true",
+    "QUERY_BUDGET_ENFORCE": "false",
+    "PROFILING_ENABLED": "false",
+    "TRACING_EXPORTER": "",
+    "SQL_ECHO": "false",
+    "SMTP_HOST": "127.0.0.1",
+    "SMTP_USER": "bench",
+    "SMTP_PASSWORD": "bench",
+    "STRIPE_SECRET_KEY": "sk_test_bench",
+    "STRIPE_WEBHOOK_SECRET": STRIPE_WEBHOOK_SECRET,
+}
+
+
+def self_signed_context() -> ssl.SSLContext:
+    """Server TLS context with a throwaway certificate (smtplib does not verify it)."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+    
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1)).not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    directory = tempfile.mkdtemp(prefix="http-bench-tls-")
+    cert_path, key_path = Path(directory, "cert.pem"), Path(directory, "key.pem")
+    cert_path.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+class FakeSMTPServer:
+    """Accept and discard mail: EHLO, STARTTLS, AUTH, MAIL, RCPT, DATA and QUIT."""
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.messages = 0
+        self.port: Optional[int] = None
+        self._tls = self_signed_context()
+        self._loop = asyncio.new_event_loop()
+    
+    def start(self) -> int:
+        threading.Thread(target=self._loop.run_forever, name="fake-smtp", daemon=True).start()
+        server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._session, "127.0.0.1", 0), self._loop
+        ).result()
+        self.port = server.sockets[0].getsockname()[1]
+        return self.port
+    
+    async def _session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        async def reply(line: str) -> None:
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+        
+        try:
+            await reply("220 localhost fake SMTP")
+            while line := await reader.readline():
+                command = line.decode(errors="replace").strip().upper()
+                if command.startswith(("EHLO", "HELO")):
+                    await reply("250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 STARTTLS")
+                elif command == "STARTTLS":
+                    await reply("220 Ready to start TLS")
+                    await writer.start_tls(self._tls)
+                elif command.startswith("AUTH"):
+                    await reply("235 Authentication successful")
+                elif command == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    while (await reader.readline()) not in (b".\r\n", b""):
+                        pass
+                    await asyncio.sleep(self.latency)
+                    self.messages += 1
+                    await reply("250 OK queued")
+                elif command == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("250 OK")
+        except (ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+
+def stripe_signature(payload: bytes, secret: str = STRIPE_WEBHOOK_SECRET) -> str:
+    """``Stripe-Signature`` header for a payload, as Stripe would sign it."""
+    timestamp = int(time.time())
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+class Scenario:
+    """A named stream of requests against one route."""
+    
+    def __init__(self, name: str, route: str, make_request: Callable[[random.Random], dict]):
+        self.name = name
+        self.route = route  # template, as labelled in the metrics
+        self.make_request = make_request
+
+
+def build_scenarios(data: dict, admin_headers: dict) -> list[Scenario]:
+    """Requests for each route, drawn from the ids and numbers present in the database."""
+    product_ids, order_ids, order_numbers = data["product_ids"], data["order_ids"], data["order_numbers"]
+    checkout_ids = data["checkout_product_ids"]
+    
+    def checkout(rng):
+        return {"method": "POST", "url": "/api/checkout/", "json": {
+            "items": [{"product_id": rng.choice(checkout_ids), "quantity": 1}],
+            "shipping_address": {
+                "name": "Bench Customer", "email": f"bench{rng.randrange(10 ** 6)}@example.com",
+                "address_line1": "Rua Augusta 1500", "city": "Sao Paulo", "state": "SP",
+                "postal_code": "01304-001", "country": "Brazil",
+            },
+            "payment_method": "stripe",
+        }}
+    
+    def stripe_event(rng):
+        payload = json.dumps({
+            "id": f"evt_{rng.randrange(10 ** 12)}", "type": "payment_intent.succeeded",
+            "data": {"object": {"id": f"pi_{rng.randrange(10 ** 12)}", "metadata": {"order_id": str(rng.choice(order_ids))}}},
+        }).encode()
+        return {"method": "POST", "url": "/api/webhooks/stripe", "content": payload,
+                "headers": {"stripe-signature": stripe_signature(payload), "content-type": "application/json"}}
+    
+    def paypal_event(rng):
+        return {"method": "POST", "url": "/api/webhooks/paypal", "json": {
+            "event_type": "PAYMENT.SALE.COMPLETED",
+            "resource": {"id": f"SALE-{rng.randrange(10 ** 12)}", "custom": str(rng.choice(order_ids))},
+        }}
+    
+    return [
+        Scenario("list_products", "/api/products/", lambda rng: {"method": "GET", "url": "/api/products/"}),
+        Scenario("get_product", "/api/products/{product_id}",
+                 lambda rng: {"method": "GET", "url": f"/api/products/{rng.choice(product_ids)}"}),
+        Scenario("list_orders", "/api/orders/", lambda rng: {"method": "GET", "url": "/api/orders/?limit=50"}),
+        Scenario("get_order_by_number", "/api/orders/by-number/{order_number}",
+                 lambda rng: {"method": "GET", "url": f"/api/orders/by-number/{rng.choice(order_numbers)}"}),
+        Scenario("create_checkout", "/api/checkout/", checkout),
+        Scenario("stripe_webhook", "/api/webhooks/stripe", stripe_event),
+        Scenario("paypal_webhook", "/api/webhooks/paypal", paypal_event),
+        Scenario("admin_dashboard", "/api/admin/dashboard/stats",
+                 lambda rng: {"method": "GET", "url": "/api/admin/dashboard/stats", "headers": admin_headers}),
+        Scenario("admin_order_search", "/api/admin/orders/search", lambda rng: {
+            "method": "GET", "headers": admin_headers,
+            "url": f"/api/admin/orders/search?email=customer{rng.randrange(1000)}@&limit=20",
+        }),
+        Scenario("admin_low_stock", "/api/admin/inventory/low-stock",
+                 lambda rng: {"method": "GET", "url": "/api/admin/inventory/low-stock", "headers": admin_headers}),
+    ]
+
+
+def prepare_database(products: int, orders: int, seed: int) -> dict:
+    """Create and seed the schema if needed, top up checkout stock, and sample ids to request."""
+    from sqlalchemy import func
+    from backend.db.database import SessionLocal
+    from backend.db.models import Inventory, Order, Product
+    from backend.init_db import init_db, seed_data
+    from backend.perf import generate_data
+    from backend.services.inventory import InventoryService
+    
+    init_db()
+    seed_data()
+    db = SessionLocal()
+    try:
+        empty = not db.query(func.count(Order.id)).scalar()
+        db.rollback()
+        if empty:
+            until = datetime.now(timezone.utc).date()
+            generate_data.run(products, orders, 6, until, seed, batch_size=10_000)
+        
+        rng = random.Random(seed)
+        product_ids = [pid for (pid,) in db.query(Product.id).filter(Product.is_active == True)]
+        order_rows = db.query(Order.id, Order.order_number).order_by(func.random()).limit(2000).all()
+        
+        checkout_ids = [
+            pid for (pid,) in db.query(Inventory.product_id)
+            .join(Product, Product.id == Inventory.product_id)
+            .filter(Product.is_active == True)
+            .order_by(Inventory.product_id).limit(CHECKOUT_PRODUCTS)
+        ]
+        inventory_service = InventoryService(db)
+        for product_id in checkout_ids:
+            inventory_service.set_stock(product_id, 1_000_000)
+        
+        return {
+            "product_ids": rng.sample(product_ids, min(len(product_ids), 2000)),
+            "order_ids": [order_id for order_id, _ in order_rows],
+            "order_numbers": [number for _, number in order_rows],
+            "checkout_product_ids": checkout_ids,
+        }
+    finally:
+        db.close()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def queries_observed(route: str) -> tuple[float, float]:
+    """(sum, count) of the queries-per-request histogram for a route."""
+    from prometheus_client import REGISTRY
+    
+    labels = {"route": route}
+    return (
+        REGISTRY.get_sample_value("db_queries_per_request_sum", labels) or 0.0,
+        REGISTRY.get_sample_value("db_queries_per_request_count", labels) or 0.0,
+    )
+
+
+async def run_scenario(client, scenario: Scenario, requests: int, concurrency: int, warmup: int, seed: int) -> dict:
+    """Send the scenario's requests and summarize latency, errors and queries."""
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        await client.request(**scenario.make_request(rng))
+    
+    before = queries_observed(scenario.route)
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+    pending = [scenario.make_request(rng) for _ in range(requests)]
+    
+    async def worker():
+        while pending:
+            request = pending.pop()
+            start = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                outcome = None if response.status_code < 400 else str(response.status_code)
+            except Exception as exc:
+                outcome = type(exc).__name__
+            latencies.append(time.perf_counter() - start)
+            if outcome:
+                errors[outcome] = errors.get(outcome, 0) + 1
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    after = queries_observed(scenario.route)
+    
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "rps": requests / elapsed,
+        "queries": (after[0] - before[0]) / max(after[1] - before[1], 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of ``results`` against ``baseline``."""
+    failures = []
+    for name, result in results.items():
+        if result["errors"]:
+            failures.append(f"{name}: errors {result['errors']}")
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["queries"] > base["queries"] + 0.5:
+            failures.append(f"{name}: {result['queries']:.1f} queries per request (baseline {base['queries']:.1f})")
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            failures.append(
+                f"{name}: p95 {result['p95_ms']:.1f} ms exceeds baseline {base['p95_ms']:.1f} ms by more than {tolerance:.0%}"
+            )
+    return failures
+
+
+async def bench(args) -> int:
+    import httpx
+    from backend.app.config import get_settings
+    from backend.app.server import app
+    
+    settings = get_settings()
+    data = prepare_database(args.products, args.orders, args.seed)
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        login = await client.post(
+            "/api/admin/login", params={"username": settings.ADMIN_USERNAME, "password": settings.ADMIN_PASSWORD}
+        )
+        login.raise_for_status()
+        admin_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        
+        scenarios = build_scenarios(data, admin_headers)
+        if args.only:
+            wanted = set(args.only.split(","))
+            scenarios = [scenario for scenario in scenarios if scenario.name in wanted]
+        
+        results = {}
+        print(f"{args.requests} requests per scenario at concurrency {args.concurrency} ({settings.DATABASE_URL.split(':')[0]})")
+        print(f"{'scenario':<22}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'queries':>9}  errors")
+        for index, scenario in enumerate(scenarios):
+            result = await run_scenario(
+                client, scenario, args.requests, args.concurrency, args.warmup, args.seed + index
+            )
+            results[scenario.name] = result
+            print(f"{scenario.name:<22}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+                  f"{result['rps']:>9.0f}{result['queries']:>9.1f}  {result['errors'] or '-'}")
+    
+    if args.update_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update({
+            name: {key: round(result[key], 2) for key in ("p50_ms", "p95_ms", "p99_ms", "queries")}
+            for name, result in results.items()
+        })
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    failures = compare(results, baseline, args.tolerance)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=f"sqlite:///{tempfile.gettempdir()}/http-bench.db")
+    parser.add_argument("--products", type=int, default=500, help="generated into an empty database")
+    parser.add_argument("--orders", type=int, default=20_000, help="generated into an empty database")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per scenario")
+    parser.add_argument("--smtp-latency-ms", type=float, default=20.0)
+    parser.add_argument("--only", help="comma-separated scenario names")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed p95 increase over the baseline")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+    
+    smtp = FakeSMTPServer(args.smtp_latency_ms / 1000)
+    # Settings are read once per process, so configure before the app is imported
+    os.environ.update(ENVIRONMENT, DATABASE_URL=args.database_url, SMTP_PORT=str(smtp.start()))
+    status = asyncio.run(bench(args))
+    print(f"Fake SMTP server accepted {smtp.messages} messages")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
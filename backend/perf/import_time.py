@@ -0,0 +1,63 @@
+"""Import-time budget check for the API server.
+
+Imports ``backend.app.server`` in fresh interpreters and fails if the best
+of several runs exceeds the budget, or if a module that should load lazily
+(payment SDKs, password hashing, the profiler) is imported at startup.
+
+Usage:
+    python -m backend.perf.import_time [--budget SECONDS] [--runs N]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+IMPORT_BUDGET_SECONDS = 2.5
+TARGET = "backend.app.server"
+
+# Loaded on first use; importing any of these at startup is a regression
+LAZY_MODULES = ("stripe", "paypalrestsdk", "passlib", "pyinstrument")
+
+_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import {TARGET}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def measure() -> dict:
+    """Import the target in a fresh interpreter and report time and loaded modules."""
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def check(budget: float, runs: int) -> list[str]:
+    """Return failure messages (empty if within budget)."""
+    results = [measure() for _ in range(runs)]
+    best = min(result["seconds"] for result in results)
+    print(f"{TARGET}: best of {runs} imports {best:.3f}s (budget {budget:.2f}s)")
+    
+    failures = []
+    if best > budget:
+        failures.append(f"import took {best:.3f}s, budget is {budget:.2f}s")
+    loaded = set(results[0]["modules"])
+    for module in LAZY_MODULES:
+        if module in loaded:
+            failures.append(f"{module} is imported at startup; it should load on first use")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_SECONDS)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    
+    failures = check(args.budget, args.runs)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
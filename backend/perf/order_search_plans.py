@@ -0,0 +1,88 @@
+"""EXPLAIN-based regression check for admin order search.
+
+Runs each search shape through the Postgres planner with sequential scans
+disabled and fails if the plan does not use the index it was designed for.
+
+Usage:
+    python -m backend.perf.order_search_plans
+"""
+import json
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from backend.db.database import engine, Base, SessionLocal
+from backend.db import models  # noqa: F401  (register tables)
+from backend.services.order_search import OrderSearchService
+
+now = datetime.utcnow()
+
+# (description, search filters, acceptable index names)
+CASES = [
+    ("email substring", {"email": "example.com"}, {"ix_orders_customer_email_trgm"}),
+    ("name substring", {"name": "silva"}, {"ix_orders_customer_name_trgm"}),
+    ("tracking substring", {"tracking_number": "BR123"}, {"ix_orders_tracking_number_trgm"}),
+    (
+        "order number prefix",
+        {"order_number": "ORD-2025"},
+        {"ix_orders_order_number_prefix", "ix_orders_order_number"},
+    ),
+    (
+        "created_at range",
+        {"created_from": now - timedelta(days=7), "created_to": now},
+        {"ix_orders_created_at"},
+    ),
+]
+
+
+def _plan_nodes(plan: dict):
+    """Yield every node of a JSON EXPLAIN plan."""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def explain(db, filters: dict) -> dict:
+    """Return the JSON plan for the count query of a search."""
+    query = OrderSearchService(db).build_query(**filters).with_entities(func.count())
+    compiled = query.statement.compile(dialect=engine.dialect)
+    result = db.connection().exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + compiled.string, compiled.params
+    ).scalar()
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]["Plan"]
+
+
+def check() -> list[str]:
+    """Run all cases and return a list of failure messages."""
+    if engine.dialect.name != "postgresql":
+        return [f"plan check requires PostgreSQL, got {engine.dialect.name}"]
+    
+    Base.metadata.create_all(bind=engine)
+    failures = []
+    db = SessionLocal()
+    try:
+        db.connection().exec_driver_sql("SET LOCAL enable_seqscan = off")
+        for description, filters, expected in CASES:
+            nodes = list(_plan_nodes(explain(db, filters)))
+            used = {node["Index Name"] for node in nodes if "Index Name" in node}
+            seq_scans = [node for node in nodes if node["Node Type"] == "Seq Scan"]
+            if seq_scans or not used & expected:
+                failures.append(
+                    f"{description}: expected one of {sorted(expected)}, "
+                    f"plan used {sorted(used) or 'no index'}"
+                    + (" with a sequential scan" if seq_scans else "")
+                )
+            else:
+                print(f"ok   {description}: {', '.join(sorted(used))}")
+    finally:
+        db.rollback()
+        db.close()
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,137 @@
+"""Microbenchmark: cost of serializing one 100-order page.
+
+Compares the previous response path (validated models, then FastAPI's
+``response_model`` re-validation and ``jsonable_encoder`` + ``json.dumps``)
+with ``OrderResponse.payload`` dicts returned in an ``ORJSONResponse``. Uses
+in-memory stand-ins for ORM rows, so no database is needed. Exits non-zero
+if the two paths produce different JSON, i.e. if a payload builder or the
+datetime encoding drifted from its response model.
+
+Usage:
+    python -m backend.perf.serialization_bench [--orders 100] [--items 3] [--repeat 200]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from backend.app.responses import ORJSONResponse
+from backend.db.models import OrderStatus, PaymentMethod
+from backend.models.order import OrderListResponse, OrderResponse
+
+
+def fake_orders(count: int, items_per_order: int) -> list:
+    """Build ORM-shaped orders with loaded items and products.
+    
+    ``created_at`` is timezone-aware, as PostgreSQL returns it, and
+    ``updated_at`` naive, as SQLite does, so both encodings are compared.
+    """
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    orders = []
+    for index in range(count):
+        items = [
+            SimpleNamespace(
+                id=index * items_per_order + position,
+                product_id=position + 1,
+                product=SimpleNamespace(name=f"iPhone 15 Pro {128 * (position + 1)}GB"),
+                quantity=position + 1,
+                price_cad=1399.0 + position * 200,
+            )
+            for position in range(items_per_order)
+        ]
+        orders.append(SimpleNamespace(
+            id=index + 1,
+            order_number=f"ORD-20250101-{index:08X}",
+            status=OrderStatus.PAID,
+            payment_method=PaymentMethod.STRIPE,
+            customer_name="Maria Silva",
+            customer_email=f"customer{index}@example.com",
+            customer_phone="+55 11 99999-0000",
+            shipping_address_line1="Rua Augusta 1500",
+            shipping_address_line2=None,
+            shipping_city="Sao Paulo",
+            shipping_state="SP",
+            shipping_postal_code="01304-001",
+            shipping_country="Brazil",
+            subtotal_cad=sum(item.quantity * item.price_cad for item in items),
+            shipping_cost_cad=50.0,
+            total_cad=sum(item.quantity * item.price_cad for item in items) + 50.0,
+            tracking_number=None,
+            items=items,
+            created_at=now + timedelta(minutes=index),
+            updated_at=(now + timedelta(minutes=index, seconds=30)).replace(tzinfo=None),
+            shipped_at=None,
+            delivered_at=None,
+        ))
+    return orders
+
+
+def legacy_order_dict(order) -> dict:
+    """The keyword arguments routes used to pass to ``OrderResponse(**...)``."""
+    fields = {name: getattr(order, name) for name in OrderResponse.model_fields if name != "items"}
+    fields["items"] = [
+        {
+            "id": item.id,
+            "product_id": item.product_id,
+            "product_name": item.product.name,
+            "quantity": item.quantity,
+            "price_cad": item.price_cad,
+            "subtotal_cad": item.quantity * item.price_cad,
+        }
+        for item in order.items
+    ]
+    return fields
+
+
+async def legacy_page(orders: list, field) -> bytes:
+    """Validate models, let FastAPI re-validate and encode them, then json.dumps."""
+    page = OrderListResponse(orders=[OrderResponse(**legacy_order_dict(order)) for order in orders], total=len(orders))
+    content = await serialize_response(field=field, response_content=page)
+    return JSONResponse(content).body
+
+
+def payload_page(orders: list) -> bytes:
+    """Build plain payload dicts and encode them with orjson."""
+    return ORJSONResponse({"orders": [OrderResponse.payload(order) for order in orders], "total": len(orders)}).body
+
+
+async def run(order_count: int, items_per_order: int, repeat: int) -> int:
+    orders = fake_orders(order_count, items_per_order)
+    field = create_response_field(name="response", type_=OrderListResponse)
+    
+    legacy_body = await legacy_page(orders, field)
+    fast_body = payload_page(orders)
+    if json.loads(legacy_body) != json.loads(fast_body):
+        print("FAIL OrderResponse.payload output differs from the response_model path")
+        return 1
+    
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await legacy_page(orders, field)
+    legacy = (time.perf_counter() - start) / repeat
+    
+    start = time.perf_counter()
+    for _ in range(repeat):
+        payload_page(orders)
+    fast = (time.perf_counter() - start) / repeat
+    
+    print(f"{order_count} orders x {items_per_order} items, {len(fast_body)} bytes "
+          f"({len(gzip.compress(fast_body))} gzipped), averaged over {repeat} runs")
+    print(f"  response_model + jsonable_encoder: {legacy * 1000:8.3f} ms/page")
+    print(f"  payload dicts + orjson:            {fast * 1000:8.3f} ms/page  ({legacy / fast:.1f}x faster)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.orders, args.items, args.repeat)))
@@ -0,0 +1,127 @@
+"""Contention benchmark: concurrent checkouts of one hot SKU versus shard count.
+
+Each worker thread repeatedly deducts one unit through ``InventoryService``
+and then holds its transaction open for ``--hold-ms`` (standing in for the
+order and order-item inserts and the rest of checkout) before committing.
+With one shard every checkout waits for the previous one's row lock;
+throughput should grow with the shard count until threads or the database
+become the bottleneck. Runs against ``DATABASE_URL`` on a throwaway inactive
+product, and fails if the final stock does not match the units sold.
+
+Needs PostgreSQL: SQLite serializes all writers regardless of rows.
+
+Usage:
+    python -m backend.perf.stock_contention [--shards 1,2,4,8,16] [--threads 16] [--seconds 5] [--hold-ms 5]
+"""
+import argparse
+import sys
+import threading
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.app.config import get_settings
+from backend.db.models import Inventory, InventoryMovement, InventorySnapshot, Product
+from backend.services.inventory import InventoryService
+
+settings = get_settings()
+
+INITIAL_STOCK = 1_000_000
+
+
+def checkout_worker(Session, product_id: int, hold: float, stop: threading.Event, sold: list) -> None:
+    """Deduct one unit per transaction until ``stop`` is set."""
+    db = Session()
+    count = 0
+    try:
+        while not stop.is_set():
+            inventory_service = InventoryService(db)
+            if not inventory_service.deduct_stock(product_id, 1, commit=False):
+                db.rollback()
+                break
+            time.sleep(hold)
+            db.commit()
+            count += 1
+    finally:
+        db.close()
+        sold.append(count)
+
+
+def run_round(Session, product_id: int, shard_count: int, threads: int, seconds: float, hold: float) -> tuple[float, bool]:
+    """Return (checkouts per second, stock consistent) for one shard count."""
+    db = Session()
+    try:
+        inventory_service = InventoryService(db)
+        inventory_service.set_stock(product_id, INITIAL_STOCK)
+        inventory_service.set_hot(product_id, shard_count)
+    finally:
+        db.close()
+    
+    stop = threading.Event()
+    sold: list = []
+    workers = [
+        threading.Thread(target=checkout_worker, args=(Session, product_id, hold, stop, sold))
+        for _ in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    
+    db = Session()
+    try:
+        remaining = InventoryService(db).get_stock(product_id)
+    finally:
+        db.close()
+    return sum(sold) / elapsed, remaining == INITIAL_STOCK - sum(sold)
+
+
+def run(shard_counts: list[int], threads: int, seconds: float, hold_ms: float) -> int:
+    engine = create_engine(settings.DATABASE_URL, pool_size=threads + 2, max_overflow=0)
+    if engine.dialect.name != "postgresql":
+        print(f"SKIP needs PostgreSQL, DATABASE_URL is {engine.dialect.name}")
+        return 2
+    Session = sessionmaker(bind=engine, autoflush=False)
+    
+    db = Session()
+    product = Product(name="Stock contention benchmark", price_cad=0.0, is_active=False)
+    db.add(product)
+    db.flush()
+    db.add(Inventory(product_id=product.id, quantity=0, low_stock_threshold=0))
+    db.commit()
+    product_id = product.id
+    db.close()
+    
+    failures = 0
+    print(f"{threads} threads, {hold_ms:g} ms held per checkout, {seconds:g} s per round")
+    try:
+        baseline = None
+        for shard_count in shard_counts:
+            rate, consistent = run_round(Session, product_id, shard_count, threads, seconds, hold_ms / 1000)
+            baseline = baseline or rate
+            print(f"  {shard_count:3d} shards: {rate:9.1f} checkouts/s  ({rate / baseline:.1f}x)"
+                  f"{'' if consistent else '  FAIL stock does not match units sold'}")
+            failures += not consistent
+    finally:
+        db = Session()
+        # Shards go with the inventory row (ON DELETE CASCADE)
+        for model in (InventoryMovement, InventorySnapshot, Inventory):
+            db.query(model).filter(model.product_id == product_id).delete()
+        db.query(Product).filter(Product.id == product_id).delete()
+        db.commit()
+        db.close()
+        engine.dispose()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", default="1,2,4,8,16", help="comma-separated shard counts")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--hold-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    sys.exit(run([int(count) for count in args.shards.split(",")], args.threads, args.seconds, args.hold_ms))
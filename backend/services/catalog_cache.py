@@ -0,0 +1,173 @@
+"""Last-known-good catalog snapshot for riding out database outages.
+
+Catalog reads are refreshed into a snapshot of every product (the
+``ProductResponse.payload`` bodies) every ``CATALOG_SNAPSHOT_SECONDS``, kept in
+process and in Redis so a worker that starts during an outage can still load
+it. When a product query fails because the database is down, unreachable or
+timed out, ``list_products`` and ``get_product`` answer from the snapshot with
+``X-Catalog-Stale: true`` and an ``Age`` header. After a failure the database
+is left alone for ``DATABASE_RETRY_SECONDS``, and the first successful query
+after the outage refreshes the snapshot in the background.
+
+Stock figures in the snapshot are only for display: checkout, the waiting room
+and inventory reads always go to the database.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Optional
+import orjson
+from fastapi import HTTPException, status
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import joinedload
+from backend.app.config import get_settings
+from backend.app import responses
+from backend.app.responses import ORJSONResponse
+from backend.app.metrics import record_cache_lookup
+from backend.db.database import SessionLocal
+from backend.db.models import Inventory, Product
+from backend.db.redis_client import get_redis
+from backend.models.product import ProductResponse
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Connection failures, statement timeouts and pool checkout timeouts; query
+# bugs (ProgrammingError, IntegrityError) still surface as errors
+DATABASE_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError)
+
+REDIS_KEY = "catalog:snapshot"
+
+# After a failed query, serve the snapshot without trying the database for this long
+DATABASE_RETRY_SECONDS = 2.0
+
+
+def _unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Catalog temporarily unavailable",
+        headers={"Retry-After": str(int(DATABASE_RETRY_SECONDS) + 1)},
+    )
+
+
+class CatalogCache:
+    """Keep a catalog snapshot fresh while the database is up and serve it while it is down."""
+    
+    def __init__(self):
+        self._products: list[dict] = []
+        self._by_id: dict[int, dict] = {}
+        self._taken_at: Optional[float] = None
+        self._database_down_until = 0.0
+        self._recovering = False
+        self._refresh: Optional[asyncio.Task] = None
+    
+    def database_available(self) -> bool:
+        """False for ``DATABASE_RETRY_SECONDS`` after a failed catalog query."""
+        return time.monotonic() >= self._database_down_until
+    
+    def database_failed(self, exc: Exception) -> None:
+        """Record a failed catalog query; the next requests are served stale."""
+        logger.warning("Catalog query failed, serving the snapshot: %s", getattr(exc, "orig", exc))
+        self._database_down_until = time.monotonic() + DATABASE_RETRY_SECONDS
+        self._recovering = True
+    
+    def database_ok(self) -> None:
+        """Record a successful catalog query, refreshing the snapshot in the background if it is due."""
+        if self._refresh is not None and not self._refresh.done():
+            return
+        due = self._taken_at is None or time.time() - self._taken_at >= settings.CATALOG_SNAPSHOT_SECONDS
+        if due or self._recovering:
+            # A fresh context, so the refresh's queries are not counted against this request
+            self._refresh = asyncio.get_running_loop().create_task(
+                self.refresh(from_database=self._recovering), context=contextvars.Context()
+            )
+    
+    async def refresh(self, from_database: bool = False) -> None:
+        """Reload the snapshot, adopting another worker's from Redis when it is recent enough."""
+        try:
+            if not from_database and await self._load_redis(settings.CATALOG_SNAPSHOT_SECONDS):
+                return
+            raw = await asyncio.to_thread(self._dump_database)
+            self._adopt(orjson.loads(raw))
+            self._recovering = False
+            try:
+                await get_redis().set(REDIS_KEY, raw, ex=settings.CATALOG_STALE_MAX_SECONDS)
+            except Exception as exc:
+                logger.warning("Failed to publish the catalog snapshot: %s", exc)
+        except Exception as exc:
+            logger.warning("Catalog snapshot refresh failed: %s", exc)
+    
+    def _dump_database(self) -> bytes:
+        """Every product's payload, encoded with the time it was read."""
+        db = SessionLocal()
+        try:
+            taken_at = time.time()
+            products = (
+                db.query(Product)
+                .options(joinedload(Product.inventory).selectinload(Inventory.shards))
+                .order_by(Product.id)
+                .all()
+            )
+            return responses.dumps({
+                "taken_at": taken_at,
+                "products": [ProductResponse.payload(product, product.inventory) for product in products],
+            })
+        finally:
+            db.close()
+    
+    def _adopt(self, snapshot: dict) -> None:
+        self._products = snapshot["products"]
+        self._by_id = {product["id"]: product for product in self._products}
+        self._taken_at = snapshot["taken_at"]
+    
+    async def _load_redis(self, max_age: float) -> bool:
+        """Adopt the shared snapshot if it is newer than ours and at most ``max_age`` seconds old."""
+        try:
+            raw = await get_redis().get(REDIS_KEY)
+        except Exception as exc:
+            logger.warning("Failed to read the catalog snapshot from Redis: %s", exc)
+            return False
+        if not raw:
+            return False
+        snapshot = orjson.loads(raw)
+        if time.time() - snapshot["taken_at"] > max_age:
+            return False
+        if self._taken_at is None or snapshot["taken_at"] > self._taken_at:
+            self._adopt(snapshot)
+        return True
+    
+    async def _stale_age(self) -> int:
+        """Age in seconds of a servable snapshot; raises 503 when there is none."""
+        max_age = settings.CATALOG_STALE_MAX_SECONDS
+        if self._taken_at is None or time.time() - self._taken_at > max_age:
+            await self._load_redis(max_age)
+        available = self._taken_at is not None and time.time() - self._taken_at <= max_age
+        record_cache_lookup("catalog_snapshot", available)
+        if not available:
+            raise _unavailable()
+        return int(time.time() - self._taken_at)
+    
+    def _stale_response(self, body, age: int) -> ORJSONResponse:
+        return ORJSONResponse(body, headers={"X-Catalog-Stale": "true", "Age": str(age)})
+    
+    async def stale_list(self, active_only: bool, skip: int, limit: int) -> ORJSONResponse:
+        """A ``list_products`` page from the snapshot, ordered by product id."""
+        age = await self._stale_age()
+        products = [product for product in self._products if product["is_active"]] if active_only else self._products
+        return self._stale_response({"products": products[skip:skip + limit], "total": len(products)}, age)
+    
+    async def stale_product(self, product_id: int) -> ORJSONResponse:
+        """A ``get_product`` body from the snapshot.
+        
+        Products missing from the snapshot get a 503 rather than a 404, since
+        they may have been added since it was taken.
+        """
+        age = await self._stale_age()
+        product = self._by_id.get(product_id)
+        if product is None:
+            raise _unavailable()
+        return self._stale_response(product, age)
+
+
+catalog_cache = CatalogCache()
@@ -1,11 +1,14 @@
 """Email service for sending notifications."""
 import smtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from backend.app.config import get_settings
-from backend.db.models import Order, OrderItem, Product
+from backend.app import tracing
+from backend.app.metrics import EMAIL_SEND_DURATION
+from backend.db.models import Order, OrderItem
 
 settings = get_settings()
 
@@ -31,6 +34,9 @@ class EmailService:
         if not self.smtp_user or not self.smtp_password:
             return False
         
+        start = time.perf_counter()
+        result = "error"
+        send_span = tracing.start_span("email.send", **{"email.subject": subject})
         try:
             msg = MIMEMultipart("alternative")
             msg["Subject"] = subject
@@ -46,18 +52,26 @@ class EmailService:
                 server.login(self.smtp_user, self.smtp_password)
                 server.send_message(msg)
             
+            result = "sent"
             return True
         except Exception:
             return False
+        finally:
+            EMAIL_SEND_DURATION.labels(result=result).observe(time.perf_counter() - start)
+            if send_span is not None:
+                send_span.set_attribute("email.result", result)
+            tracing.end_span(send_span)
     
     async def send_order_confirmation(self, order: Order, db: Session) -> bool:
         """Send order confirmation email to customer."""
         # Get order items
-        items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-        products = {}
-        for item in items:
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            products[item.id] = product.name if product else "Unknown"
+        items = (
+            db.query(OrderItem)
+            .options(joinedload(OrderItem.product))
+            .filter(OrderItem.order_id == order.id)
+            .all()
+        )
+        products = {item.id: item.product.name if item.product else "Unknown" for item in items}
         
         subject = f"Order Confirmation - {order.order_number}"
         
@@ -140,13 +154,6 @@ class EmailService:
         if not settings.ADMIN_EMAIL:
             return False
         
-        # Get order items
-        items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-        products = {}
-        for item in items:
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            products[item.id] = product.name if product else "Unknown"
-        
         subject = f"New Order Received - {order.order_number}"
         
         html_body = f"""
@@ -162,6 +169,36 @@ class EmailService:
         """
         
         return self._send_email(settings.ADMIN_EMAIL, subject, html_body)
+    
+    def send_low_stock_alert(self, alerts: list) -> bool:
+        """Send low/out-of-stock threshold alerts to admin."""
+        if not settings.ADMIN_EMAIL or not alerts:
+            return False
+        
+        out_of_stock = any(alert["type"] == "out_of_stock" for alert in alerts)
+        subject = "Out of Stock Alert" if out_of_stock else "Low Stock Alert"
+        
+        html_body = """
+        <html>
+        <body>
+            <h2>Inventory Alert</h2>
+            <ul>
+        """
+        
+        for alert in alerts:
+            label = "Out of stock" if alert["type"] == "out_of_stock" else "Low stock"
+            html_body += (
+                f"<li>{label}: {alert['product_name']} - {alert['quantity']} left "
+                f"(threshold {alert['low_stock_threshold']})</li>"
+            )
+        
+        html_body += """
+            </ul>
+        </body>
+        </html>
+        """
+        
+        return self._send_email(settings.ADMIN_EMAIL, subject, html_body)
 
 
 
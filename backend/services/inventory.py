@@ -1,9 +1,15 @@
 """Inventory management service."""
-from sqlalchemy.orm import Session
-from backend.db.models import Inventory, Product
+import logging
+import random
+from sqlalchemy import func, update
+from typing import Optional
+from sqlalchemy.orm import Session, contains_eager
+from backend.db.models import Inventory, InventoryShard, MovementKind, OrderItem, Product
 from backend.app.config import get_settings
+from backend.services.inventory_ledger import InventoryLedger
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 
 class InventoryService:
@@ -11,33 +17,266 @@ class InventoryService:
     
     def __init__(self, db: Session):
         self.db = db
+        self.ledger = InventoryLedger(db)
+        self.pending_alerts = []
+    
+    def _apply_quantity(
+        self,
+        inventory: Inventory,
+        quantity: int,
+        kind: MovementKind = MovementKind.ADJUSTMENT,
+        order_id: Optional[int] = None,
+    ) -> None:
+        """Set a new total quantity, record the movement and queue alerts for threshold crossings."""
+        self.ledger.record(inventory.product_id, quantity - (inventory.stock_quantity or 0), kind, order_id)
+        if inventory.is_hot:
+            self._distribute(inventory, quantity)
+        else:
+            inventory.quantity = quantity
+        self._sync_flags(inventory)
+    
+    def _sync_flags(self, inventory: Inventory) -> None:
+        """Queue alerts for threshold crossings of the current total."""
+        for crossing in inventory.sync_stock_flags():
+            self.pending_alerts.append({
+                "type": crossing,
+                "product_id": inventory.product_id,
+                "quantity": inventory.stock_quantity,
+                "low_stock_threshold": inventory.low_stock_threshold,
+            })
+    
+    def _lock_shards(self, inventory: Inventory) -> list:
+        """Lock the inventory row and its shards (in that order) and reload them."""
+        self.db.query(Inventory).filter(Inventory.id == inventory.id).populate_existing().with_for_update().one()
+        self.db.expire(inventory, ["shards"])
+        return (
+            self.db.query(InventoryShard)
+            .filter(InventoryShard.inventory_id == inventory.id)
+            .order_by(InventoryShard.shard)
+            .populate_existing()
+            .with_for_update()
+            .all()
+        )
+    
+    def _distribute(self, inventory: Inventory, total: int) -> None:
+        """Spread ``total`` units evenly over the inventory's ``shard_count`` shards.
+        
+        With ``shard_count`` 0 everything moves back onto the inventory row.
+        The caller must hold the locks from ``_lock_shards``.
+        """
+        shards = {shard.shard: shard for shard in inventory.shards}
+        count = inventory.shard_count
+        for index, shard in list(shards.items()):
+            if index >= count:
+                inventory.shards.remove(shard)
+        
+        inventory.quantity = 0 if count else total
+        for index in range(count):
+            quantity = total // count + (1 if index < total % count else 0)
+            if index in shards:
+                shards[index].quantity = quantity
+            else:
+                inventory.shards.append(InventoryShard(shard=index, quantity=quantity))
+        self.db.flush()
+    
+    def _shard_update(self, inventory: Inventory, shard: int, delta: int):
+        """Atomically add ``delta`` to one shard, refusing to go below zero."""
+        return self.db.execute(
+            update(InventoryShard)
+            .where(
+                InventoryShard.inventory_id == inventory.id,
+                InventoryShard.shard == shard,
+                InventoryShard.quantity + delta >= 0,
+            )
+            .values(quantity=InventoryShard.quantity + delta)
+            .execution_options(synchronize_session=False)
+        )
+    
+    def _deduct_from_shard(self, inventory: Inventory, quantity: int) -> bool:
+        """Take ``quantity`` from one shard, trying them from a random start.
+        
+        Each attempt is a conditional UPDATE of a single shard row, so
+        concurrent checkouts only wait for each other when they pick the same
+        shard. Returns False if no single shard has enough.
+        """
+        count = inventory.shard_count
+        start = random.randrange(count)
+        for offset in range(count):
+            if self._shard_update(inventory, (start + offset) % count, -quantity).rowcount:
+                return True
+        return False
+    
+    def _commit(self) -> None:
+        """Commit pending changes and dispatch the alerts they produced."""
+        self.db.commit()
+        self.send_pending_alerts()
+    
+    def send_pending_alerts(self) -> None:
+        """Send queued threshold alerts; call after the stock change is committed."""
+        if not self.pending_alerts:
+            return
+        
+        alerts, self.pending_alerts = self.pending_alerts, []
+        names = dict(
+            self.db.query(Product.id, Product.name)
+            .filter(Product.id.in_({alert["product_id"] for alert in alerts}))
+            .all()
+        )
+        for alert in alerts:
+            alert["product_name"] = names.get(alert["product_id"], "Unknown")
+            logger.warning(
+                "Stock alert %s for %s: %s left (threshold %s)",
+                alert["type"], alert["product_name"], alert["quantity"], alert["low_stock_threshold"],
+            )
+        
+        try:
+            from backend.services.email import EmailService
+            EmailService().send_low_stock_alert(alerts)
+        except Exception:
+            # Alerts are best-effort and must never fail a stock change
+            logger.exception("Failed to send stock alert email")
     
     def get_stock(self, product_id: int) -> int:
-        """Get current stock for a product."""
+        """Get current stock for a product (summed over shards for hot SKUs)."""
         inventory = self.db.query(Inventory).filter(Inventory.product_id == product_id).first()
-        return inventory.quantity if inventory else 0
+        return inventory.stock_quantity if inventory else 0
     
     def check_stock(self, product_id: int, quantity: int) -> bool:
         """Check if sufficient stock is available."""
         inventory = self.db.query(Inventory).filter(Inventory.product_id == product_id).first()
         if not inventory:
             return False
-        return inventory.quantity >= quantity
+        return inventory.stock_quantity >= quantity
     
-    def deduct_stock(self, product_id: int, quantity: int) -> bool:
-        """Deduct stock from inventory."""
+    def deduct_stock(self, product_id: int, quantity: int, commit: bool = True, order_id: Optional[int] = None) -> bool:
+        """Deduct stock from inventory.
+        
+        With ``commit=False`` the caller owns the transaction and must call
+        ``send_pending_alerts()`` once it has committed.
+        """
         inventory = self.db.query(Inventory).filter(Inventory.product_id == product_id).first()
         
-        if not inventory:
+        if not inventory or not self.deduct_inventory(inventory, quantity, order_id):
             return False
         
+        if commit:
+            self._commit()
+        return True
+    
+    def deduct_inventory(self, inventory: Inventory, quantity: int, order_id: Optional[int] = None) -> bool:
+        """Deduct stock from an already loaded inventory row without committing.
+        
+        Returns False, changing nothing, if the stock does not cover
+        ``quantity``; the caller should roll back whatever else it did.
+        """
+        if inventory.is_hot:
+            return self._deduct_hot(inventory, quantity, order_id)
+        
+        # Lock and re-read the row, so the check sees other checkouts' committed deductions
+        self.db.query(Inventory).filter(Inventory.id == inventory.id).populate_existing().with_for_update().one()
+        
         if inventory.quantity < quantity:
             return False
         
-        inventory.quantity -= quantity
-        self.db.commit()
+        self._apply_quantity(inventory, inventory.quantity - quantity, MovementKind.SALE, order_id)
         return True
     
+    def _deduct_hot(self, inventory: Inventory, quantity: int, order_id: Optional[int] = None) -> bool:
+        """Deduct from a sharded SKU, locking the whole SKU only as a fallback.
+        
+        The fallback runs when stock is fragmented (no single shard has
+        ``quantity`` although the total does) and rebalances the shards.
+        """
+        if self._deduct_from_shard(inventory, quantity):
+            self.db.expire(inventory, ["shards"])
+        else:
+            self._lock_shards(inventory)
+            total = inventory.stock_quantity
+            if total < quantity:
+                return False
+            self._distribute(inventory, total - quantity)
+        
+        self.ledger.record(inventory.product_id, -quantity, MovementKind.SALE, order_id)
+        self._sync_flags(inventory)
+        return True
+    
+    def _return_units(self, inventory: Inventory, quantity: int) -> None:
+        """Put units back without recording a movement.
+        
+        Hot SKUs get them on a random shard without locking the SKU; other
+        rows are locked so a concurrent checkout cannot overwrite the change.
+        """
+        if inventory.is_hot:
+            self._shard_update(inventory, random.randrange(inventory.shard_count), quantity)
+            self.db.expire(inventory, ["shards"])
+        else:
+            self.db.query(Inventory).filter(Inventory.id == inventory.id).populate_existing().with_for_update().one()
+            inventory.quantity += quantity
+        self._sync_flags(inventory)
+    
+    def release_stock(self, product_id: int, quantity: int, order_id: Optional[int] = None, commit: bool = True) -> bool:
+        """Return stock held by a cancelled order."""
+        inventory = self.db.query(Inventory).filter(Inventory.product_id == product_id).first()
+        if not inventory:
+            return False
+        
+        self.ledger.record(product_id, quantity, MovementKind.RELEASE, order_id)
+        self._return_units(inventory, quantity)
+        if commit:
+            self._commit()
+        return True
+    
+    def _order_units(self, order_ids: list[int]) -> dict[int, int]:
+        """Units per product across the items of ``order_ids``."""
+        return dict(
+            self.db.query(OrderItem.product_id, func.sum(OrderItem.quantity))
+            .filter(OrderItem.order_id.in_(order_ids))
+            .group_by(OrderItem.product_id)
+            .order_by(OrderItem.product_id)
+            .all()
+        )
+    
+    def deduct_order(self, order_id: int) -> bool:
+        """Take an order's stock again, all or nothing, without committing.
+        
+        For a payment that arrives after its order was cancelled and
+        restocked. Every row is locked and checked before anything is
+        deducted, so False means nothing changed.
+        """
+        units = self._order_units([order_id])
+        inventories = self.db.query(Inventory).filter(Inventory.product_id.in_(units)).order_by(Inventory.product_id).all()
+        if len(inventories) < len(units):
+            return False
+        
+        for inventory in inventories:
+            if inventory.is_hot:
+                self._lock_shards(inventory)
+            else:
+                self.db.query(Inventory).filter(Inventory.id == inventory.id).populate_existing().with_for_update().one()
+            if inventory.stock_quantity < units[inventory.product_id]:
+                return False
+        
+        for inventory in inventories:
+            self.deduct_inventory(inventory, units[inventory.product_id], order_id)
+        return True
+    
+    def release_orders(self, order_ids: list[int]) -> dict[int, int]:
+        """Return the stock of a batch of cancelled orders without committing.
+        
+        Set-based: one ledger insert for every (order, product) pair and one
+        update per product, however many orders are in the batch. Returns
+        units released per product.
+        """
+        units = self._order_units(order_ids)
+        if not units:
+            return {}
+        
+        self.ledger.record_order_releases(order_ids)
+        inventories = self.db.query(Inventory).filter(Inventory.product_id.in_(units)).order_by(Inventory.product_id)
+        for inventory in inventories.all():
+            self._return_units(inventory, units[inventory.product_id])
+        return units
+    
     def add_stock(self, product_id: int, quantity: int) -> bool:
         """Add stock to inventory."""
         inventory = self.db.query(Inventory).filter(Inventory.product_id == product_id).first()
@@ -46,14 +285,15 @@ class InventoryService:
             # Create inventory record if it doesn't exist
             inventory = Inventory(
                 product_id=product_id,
-                quantity=quantity,
+                quantity=0,
                 low_stock_threshold=5
             )
             self.db.add(inventory)
-        else:
-            inventory.quantity += quantity
         
-        self.db.commit()
+        if inventory.is_hot:
+            self._lock_shards(inventory)
+        self._apply_quantity(inventory, inventory.stock_quantity + quantity, MovementKind.RESTOCK)
+        self._commit()
         return True
     
     def set_stock(self, product_id: int, quantity: int) -> bool:
@@ -63,50 +303,104 @@ class InventoryService:
         if not inventory:
             inventory = Inventory(
                 product_id=product_id,
-                quantity=quantity,
+                quantity=0,
                 low_stock_threshold=5
             )
             self.db.add(inventory)
-        else:
-            inventory.quantity = quantity
         
-        self.db.commit()
+        if inventory.is_hot:
+            self._lock_shards(inventory)
+        self._apply_quantity(inventory, quantity)
+        self._commit()
+        return True
+    
+    def set_hot(self, product_id: int, shard_count: int) -> bool:
+        """Spread a SKU's stock over ``shard_count`` shard rows (0 turns sharding off)."""
+        inventory = self.db.query(Inventory).filter(Inventory.product_id == product_id).first()
+        if not inventory:
+            return False
+        
+        shards = self._lock_shards(inventory)
+        total = inventory.quantity + sum(shard.quantity for shard in shards)
+        inventory.shard_count = shard_count
+        self._distribute(inventory, total)
+        self._commit()
         return True
     
+    def consolidate_hot_stock(self) -> int:
+        """Rebalance every hot SKU's shards so each holds an even share of its stock.
+        
+        Checkouts drain shards unevenly; run this periodically so a single
+        purchase rarely finds its shard empty and falls back to the locked
+        path. Returns the number of SKUs rebalanced.
+        """
+        inventory_ids = [row.id for row in self.db.query(Inventory.id).filter(Inventory.shard_count > 0)]
+        for inventory_id in inventory_ids:
+            inventory = self.db.get(Inventory, inventory_id)
+            shards = self._lock_shards(inventory)
+            self._distribute(inventory, inventory.quantity + sum(shard.quantity for shard in shards))
+            self._sync_flags(inventory)
+            self._commit()
+        return len(inventory_ids)
+    
+    def rebuild_stock_flags(self) -> int:
+        """Recompute low/out-of-stock markers for every row (backfill after upgrade).
+        
+        Returns the number of rows whose markers changed. No alerts are sent.
+        """
+        changed = 0
+        for inventory in self.db.query(Inventory).all():
+            before = (inventory.low_stock_since, inventory.out_of_stock_since)
+            inventory.sync_stock_flags()
+            if (inventory.low_stock_since, inventory.out_of_stock_since) != before:
+                changed += 1
+        self.db.commit()
+        return changed
+    
     def get_low_stock_products(self) -> list:
         """Get list of products with low stock."""
-        low_stock = self.db.query(Inventory).join(Product).filter(
-            Inventory.quantity <= Inventory.low_stock_threshold,
-            Product.is_active == True
-        ).all()
+        low_stock = (
+            self.db.query(Inventory)
+            .join(Inventory.product)
+            .options(contains_eager(Inventory.product))
+            .filter(Inventory.low_stock_since.isnot(None), Product.is_active == True)
+            .all()
+        )
         
         return [
             {
                 "product_id": inv.product_id,
                 "product_name": inv.product.name,
-                "quantity": inv.quantity,
+                "quantity": inv.stock_quantity,
                 "low_stock_threshold": inv.low_stock_threshold,
+                "low_stock_since": inv.low_stock_since,
             }
             for inv in low_stock
         ]
     
     def get_out_of_stock_products(self) -> list:
         """Get list of out of stock products."""
-        out_of_stock = self.db.query(Inventory).join(Product).filter(
-            Inventory.quantity <= 0,
-            Product.is_active == True
-        ).all()
+        out_of_stock = (
+            self.db.query(Inventory)
+            .join(Inventory.product)
+            .options(contains_eager(Inventory.product))
+            .filter(Inventory.out_of_stock_since.isnot(None), Product.is_active == True)
+            .all()
+        )
         
         return [
             {
                 "product_id": inv.product_id,
                 "product_name": inv.product.name,
-                "quantity": inv.quantity,
+                "quantity": inv.stock_quantity,
+                "out_of_stock_since": inv.out_of_stock_since,
             }
             for inv in out_of_stock
         ]
-
-
-
-
-
+    
+    def count_low_stock_products(self) -> int:
+        """Count active products currently flagged as low stock."""
+        return self.db.query(Inventory).join(Inventory.product).filter(
+            Inventory.low_stock_since.isnot(None),
+            Product.is_active == True
+        ).count()
@@ -0,0 +1,166 @@
+"""Append-only inventory movement ledger with periodic snapshots."""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import and_, case, cast, func, insert, literal, or_, select
+from sqlalchemy.orm import Session
+from backend.db.models import Inventory, InventoryMovement, InventorySnapshot, MovementKind, OrderItem
+from backend.app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class InventoryLedger:
+    """Record stock movements and answer point-in-time stock queries.
+    
+    ``inventory`` (and its shards) stays the row checkouts lock to avoid
+    overselling; every change to it also inserts a movement here in the same
+    transaction. Snapshots fold the ledger incrementally, so a point-in-time
+    query reads one snapshot plus the deltas after it instead of the whole
+    history.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def record(
+        self,
+        product_id: int,
+        delta: int,
+        kind: MovementKind,
+        order_id: Optional[int] = None,
+        note: Optional[str] = None,
+    ) -> None:
+        """Add a movement to the current transaction (no-op for a zero delta)."""
+        if delta:
+            self.db.add(InventoryMovement(product_id=product_id, delta=delta, kind=kind, order_id=order_id, note=note))
+    
+    def record_order_releases(self, order_ids: list[int], note: str = "order cancelled") -> None:
+        """Record a release movement per (order, product) of cancelled orders in one INSERT ... SELECT."""
+        items = (
+            select(
+                OrderItem.product_id,
+                cast(literal(MovementKind.RELEASE, InventoryMovement.kind.type), InventoryMovement.kind.type),
+                func.sum(OrderItem.quantity),
+                OrderItem.order_id,
+                literal(note),
+            )
+            .where(OrderItem.order_id.in_(order_ids))
+            .group_by(OrderItem.order_id, OrderItem.product_id)
+        )
+        self.db.execute(
+            insert(InventoryMovement).from_select(["product_id", "kind", "delta", "order_id", "note"], items)
+        )
+    
+    def order_restocked(self, order_id: int) -> bool:
+        """Whether an order's units are back in stock.
+        
+        True only if the order has a release movement and its movements net to
+        zero or more. An order cancelled without a release still holds its stock.
+        """
+        releases, net = (
+            self.db.query(
+                func.coalesce(func.sum(case((InventoryMovement.kind == MovementKind.RELEASE, 1), else_=0)), 0),
+                func.coalesce(func.sum(InventoryMovement.delta), 0),
+            )
+            .filter(InventoryMovement.order_id == order_id)
+            .one()
+        )
+        return releases > 0 and net >= 0
+    
+    def movements(self, product_id: int, limit: int = 50, before_id: Optional[int] = None) -> list:
+        """A product's movements, newest first, keyset-paged by ``before_id``."""
+        query = self.db.query(InventoryMovement).filter(InventoryMovement.product_id == product_id)
+        if before_id is not None:
+            query = query.filter(InventoryMovement.id < before_id)
+        return query.order_by(InventoryMovement.id.desc()).limit(limit).all()
+    
+    def stock_at(self, product_id: int, at: Optional[datetime] = None) -> int:
+        """Stock of a product at ``at`` (default: now): the latest snapshot before it plus later deltas."""
+        snapshots = self.db.query(InventorySnapshot).filter(InventorySnapshot.product_id == product_id)
+        deltas = self.db.query(func.coalesce(func.sum(InventoryMovement.delta), 0)).filter(
+            InventoryMovement.product_id == product_id
+        )
+        if at is not None:
+            snapshots = snapshots.filter(InventorySnapshot.taken_at <= at)
+            deltas = deltas.filter(InventoryMovement.created_at <= at)
+        
+        snapshot = snapshots.order_by(InventorySnapshot.taken_at.desc()).first()
+        if snapshot:
+            deltas = deltas.filter(InventoryMovement.created_at > snapshot.taken_at)
+        return (snapshot.quantity if snapshot else 0) + deltas.scalar()
+    
+    def open_balances(self) -> int:
+        """Record current stock as an opening adjustment for products with no movements yet.
+        
+        Needed once for stock that predates the ledger. Returns the number of
+        products opened.
+        """
+        has_movements = self.db.query(InventoryMovement.id).filter(
+            InventoryMovement.product_id == Inventory.product_id
+        ).exists()
+        opened = 0
+        for inventory in self.db.query(Inventory).filter(~has_movements).all():
+            self.record(inventory.product_id, inventory.stock_quantity, MovementKind.ADJUSTMENT, note="opening balance")
+            opened += 1
+        self.db.commit()
+        return opened
+    
+    def take_snapshots(self, lag_seconds: Optional[float] = None) -> int:
+        """Snapshot every product with movements since its last snapshot.
+        
+        Snapshots stop ``lag_seconds`` in the past so that a transaction
+        still in flight (its rows are stamped with its start time) cannot
+        commit a movement behind a snapshot. Returns the number of snapshots
+        written.
+        """
+        if lag_seconds is None:
+            lag_seconds = settings.INVENTORY_SNAPSHOT_LAG_SECONDS
+        cutoff = datetime.utcnow() - timedelta(seconds=lag_seconds)
+        
+        latest_taken = (
+            self.db.query(InventorySnapshot.product_id, func.max(InventorySnapshot.taken_at).label("taken_at"))
+            .group_by(InventorySnapshot.product_id)
+            .subquery()
+        )
+        latest = (
+            self.db.query(InventorySnapshot.product_id, InventorySnapshot.quantity, InventorySnapshot.taken_at)
+            .join(latest_taken, and_(
+                InventorySnapshot.product_id == latest_taken.c.product_id,
+                InventorySnapshot.taken_at == latest_taken.c.taken_at,
+            ))
+            .subquery()
+        )
+        rows = (
+            self.db.query(
+                InventoryMovement.product_id,
+                func.coalesce(func.max(latest.c.quantity), 0) + func.sum(InventoryMovement.delta),
+            )
+            .outerjoin(latest, latest.c.product_id == InventoryMovement.product_id)
+            .filter(
+                InventoryMovement.created_at <= cutoff,
+                or_(latest.c.taken_at.is_(None), InventoryMovement.created_at > latest.c.taken_at),
+            )
+            .group_by(InventoryMovement.product_id)
+            .all()
+        )
+        self.db.add_all(
+            InventorySnapshot(product_id=product_id, quantity=quantity, taken_at=cutoff)
+            for product_id, quantity in rows
+        )
+        self.db.commit()
+        return len(rows)
+    
+    def reconcile(self) -> list[dict]:
+        """Compare each product's ledger balance with its current stock; return mismatches."""
+        mismatches = []
+        for inventory in self.db.query(Inventory).all():
+            ledger = self.stock_at(inventory.product_id)
+            if ledger != inventory.stock_quantity:
+                mismatches.append({
+                    "product_id": inventory.product_id,
+                    "ledger_quantity": ledger,
+                    "stock_quantity": inventory.stock_quantity,
+                })
+        return mismatches
@@ -0,0 +1,131 @@
+"""Cold storage for orders from dropped monthly partitions.
+
+Each archived month becomes a directory of gzip-compressed NDJSON files,
+one per order-number day (``2026-04/orders-2026-04-17.ndjson.gz``), with one
+``OrderResponse`` body per line. The date in ``ORD-YYYYMMDD-...`` order
+numbers therefore points a lookup at a single small file.
+"""
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime
+from pathlib import Path
+from typing import Optional
+import orjson
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, selectinload
+from backend.app.config import get_settings
+from backend.app import responses
+from backend.db.models import Order, OrderItem
+from backend.db.partitioning import month_bounds
+from backend.models.order import OrderResponse
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+ORDER_NUMBER_DATE = re.compile(r"^ORD-(\d{8})-")
+
+# Orders loaded per query while exporting
+EXPORT_PAGE_SIZE = 500
+
+
+def order_day(order_number: str, created_at: Optional[datetime] = None) -> Optional[date]:
+    """The day an order is filed under: its order number's date, else its creation date."""
+    match = ORDER_NUMBER_DATE.match(order_number)
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y%m%d").date()
+        except ValueError:
+            pass
+    return created_at.date() if created_at else None
+
+
+def _partial(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+class OrderArchive:
+    """Write and look up archived orders under ``ORDER_ARCHIVE_DIR``."""
+    
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory or settings.ORDER_ARCHIVE_DIR)
+    
+    def unusable_reason(self) -> Optional[str]:
+        """Why archived months cannot safely be written here, or None if they can.
+        
+        Archiving drops the database copy, so the directory must already
+        exist (a mounted volume, not a path inside the container) and be
+        writable.
+        """
+        if not self.directory.is_absolute():
+            return f"ORDER_ARCHIVE_DIR {self.directory} is not an absolute path"
+        if not self.directory.is_dir():
+            return f"ORDER_ARCHIVE_DIR {self.directory} does not exist"
+        if not os.access(self.directory, os.W_OK | os.X_OK):
+            return f"ORDER_ARCHIVE_DIR {self.directory} is not writable"
+        return None
+    
+    def day_path(self, month: date, day: date) -> Path:
+        return self.directory / f"{month:%Y-%m}" / f"orders-{day:%Y-%m-%d}.ndjson.gz"
+    
+    def export_month(self, db: Session, month: date) -> int:
+        """Write every order created in ``month`` (UTC); returns the number written.
+        
+        Files are written under temporary names and renamed only once the
+        whole month is on disk, so an interrupted export leaves no partial
+        files behind and can simply be re-run.
+        """
+        start, end = month_bounds(month)
+        query = (
+            db.query(Order)
+            .options(selectinload(Order.items).selectinload(OrderItem.product))
+            .filter(Order.created_at >= start, Order.created_at < end)
+            .order_by(Order.created_at, Order.id)
+        )
+        # Final path -> open temporary file
+        files: dict[Path, gzip.GzipFile] = {}
+        written = 0
+        cursor = None
+        try:
+            while True:
+                page = query if cursor is None else query.filter(tuple_(Order.created_at, Order.id) > tuple_(*cursor))
+                orders = page.limit(EXPORT_PAGE_SIZE).all()
+                for order in orders:
+                    path = self.day_path(month, order_day(order.order_number, order.created_at))
+                    if path not in files:
+                        path.parent.mkdir(parents=True, exist_ok=True)
+                        files[path] = gzip.open(_partial(path), "wb")
+                    files[path].write(responses.dumps(OrderResponse.payload(order)) + b"\n")
+                written += len(orders)
+                if len(orders) < EXPORT_PAGE_SIZE:
+                    break
+                cursor = (orders[-1].created_at, orders[-1].id)
+                db.expunge_all()
+        except BaseException:
+            for path, file in files.items():
+                file.close()
+                _partial(path).unlink(missing_ok=True)
+            raise
+        
+        for path, file in files.items():
+            file.close()
+            os.replace(_partial(path), path)
+        return written
+    
+    def find(self, order_number: str) -> Optional[dict]:
+        """An archived order's ``OrderResponse`` body, or None."""
+        day = order_day(order_number)
+        if day is None:
+            return None
+        needle = b'"order_number":' + orjson.dumps(order_number)
+        # An order number's day can fall in the month before or after its partition
+        for path in sorted(self.directory.glob(f"*/orders-{day:%Y-%m-%d}.ndjson.gz")):
+            with gzip.open(path, "rb") as file:
+                for line in file:
+                    if needle in line:
+                        return orjson.loads(line)
+        return None
+
+
+order_archive = OrderArchive()
@@ -0,0 +1,115 @@
+"""Time-sortable, collision-free order numbers.
+
+Numbers look like ``ORD-20261019-0F3K9Z2M4X``: the UTC date, then ten
+Crockford base32 characters encoding the millisecond of the day, a worker id
+and a per-millisecond sequence (Snowflake style). Numbers sort in creation
+order, so new rows append to the right of the ``order_number`` index instead
+of landing at random pages, and a date prefix (``ORD-20261019``) selects one
+day with a range scan.
+
+Worker ids are leased with Postgres advisory locks, so no two live processes
+on any replica share one. Without Postgres a random id is used (development
+runs a single process).
+"""
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from backend.db.locks import AdvisoryLock
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "ORD"
+
+# Crockford base32: no I, L, O or U, and ASCII order matches numeric order
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+SUFFIX_LENGTH = 10
+
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+# Never leased; numbers bulk-loaded by backend.perf.generate_data use it
+BULK_WORKER = MAX_WORKER
+
+DAY_MS = 86_400_000
+
+# Worker id candidates tried before giving up
+LEASE_ATTEMPTS = 64
+
+# Seconds between checks that the worker id lease's connection is alive
+LEASE_CHECK_SECONDS = 10.0
+
+
+def _encode(value: int) -> str:
+    chars = []
+    for _ in range(SUFFIX_LENGTH):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def format_order_number(timestamp_ms: int, worker: int, sequence: int) -> str:
+    """The order number for a Unix-epoch millisecond, worker id and sequence."""
+    day, ms_of_day = divmod(timestamp_ms, DAY_MS)
+    date = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(days=day)
+    value = (ms_of_day << (WORKER_BITS + SEQUENCE_BITS)) | (worker << SEQUENCE_BITS) | sequence
+    return f"{PREFIX}-{date:%Y%m%d}-{_encode(value)}"
+
+
+class OrderNumberGenerator:
+    """Issue order numbers from this process's leased worker id."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lease: Optional[AdvisoryLock] = None
+        self._worker: Optional[int] = None
+        self._pid: Optional[int] = None
+        self._checked_at = 0.0
+        self._last_ms = -1
+        self._sequence = 0
+    
+    def _lease_worker(self) -> int:
+        """This process's worker id, leasing a free one on first use or after losing it."""
+        now = time.monotonic()
+        if self._pid != os.getpid():
+            # A lease taken before a fork belongs to the parent
+            self._lease = self._worker = None
+            self._pid = os.getpid()
+        elif self._lease is not None and now - self._checked_at >= LEASE_CHECK_SECONDS:
+            self._checked_at = now
+            if not self._lease.still_held():
+                self._lease = self._worker = None
+        
+        if self._worker is None:
+            for candidate in random.sample(range(BULK_WORKER), LEASE_ATTEMPTS):
+                lease = AdvisoryLock(f"order_numbers.worker.{candidate}")
+                if lease.try_acquire():
+                    self._lease, self._worker, self._checked_at = lease, candidate, now
+                    logger.info("Leased order number worker id %d", candidate)
+                    break
+            else:
+                raise RuntimeError("No free order number worker id")
+        return self._worker
+    
+    def generate(self) -> str:
+        """Next order number, later than any this process issued before."""
+        with self._lock:
+            worker = self._lease_worker()
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms, self._sequence = now_ms, 0
+            elif self._sequence < MAX_SEQUENCE:
+                # Same millisecond, or the clock stepped back: keep counting from the last one
+                self._sequence += 1
+            else:
+                self._last_ms, self._sequence = self._last_ms + 1, 0
+            timestamp_ms, sequence = self._last_ms, self._sequence
+        return format_order_number(timestamp_ms, worker, sequence)
+
+
+order_numbers = OrderNumberGenerator()
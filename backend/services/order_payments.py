@@ -0,0 +1,102 @@
+"""Order status changes reported by the payment providers, and cancellations.
+
+Each change locks the order row and checks its status first, so a webhook
+delivered twice, or one racing the abandoned-order sweeper, changes an order
+at most once and never revives a settled order by accident.
+
+Cancelling an order that has not shipped returns its stock. A payment for a
+cancelled order whose stock was returned (per the ledger) takes the stock
+again if it is still there. Otherwise the order stays cancelled with the
+payment id recorded, which marks it for a refund. A cancelled order with no
+release movement still holds its stock and is simply marked paid.
+"""
+import enum
+import logging
+from sqlalchemy.orm import Session
+from backend.app.metrics import PAYMENTS_AFTER_CANCEL
+from backend.db.models import Order, OrderStatus
+from backend.services.inventory import InventoryService
+
+logger = logging.getLogger(__name__)
+
+# Statuses whose stock is still in the warehouse, set aside for the order
+HOLDS_STOCK = (OrderStatus.PENDING, OrderStatus.PAID, OrderStatus.PROCESSING)
+
+
+class PaymentOutcome(str, enum.Enum):
+    """What a payment event did to its order."""
+    PAID = "paid"
+    REINSTATED = "reinstated"  # Paid after cancellation; the stock was taken again
+    REFUND_DUE = "refund_due"  # Paid after cancellation; the stock is gone
+    CANCELLED = "cancelled"
+    IGNORED = "ignored"  # Already settled by an earlier event
+
+
+class OrderPaymentService:
+    """Apply payment events to orders."""
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.inventory_service = InventoryService(db)
+    
+    def _lock(self, order: Order) -> Order:
+        """Lock the order row and reload it."""
+        return self.db.query(Order).filter(Order.id == order.id).populate_existing().with_for_update().one()
+    
+    def mark_paid(self, order: Order, payment_id: str) -> PaymentOutcome:
+        """Record a successful payment and commit."""
+        order = self._lock(order)
+        if order.status == OrderStatus.PENDING:
+            outcome = PaymentOutcome.PAID
+        elif order.status == OrderStatus.CANCELLED and not order.payment_id:
+            if not self.inventory_service.ledger.order_restocked(order.id):
+                # Cancelled without returning its stock, so the units are still the order's
+                outcome = PaymentOutcome.REINSTATED
+            elif self.inventory_service.deduct_order(order.id):
+                outcome = PaymentOutcome.REINSTATED
+            else:
+                outcome = PaymentOutcome.REFUND_DUE
+            PAYMENTS_AFTER_CANCEL.labels(outcome=outcome.value).inc()
+        else:
+            self.db.rollback()
+            return PaymentOutcome.IGNORED
+        
+        order.payment_id = payment_id
+        if outcome != PaymentOutcome.REFUND_DUE:
+            order.status = OrderStatus.PAID
+        self.db.commit()
+        self.inventory_service.send_pending_alerts()
+        
+        if outcome == PaymentOutcome.REFUND_DUE:
+            logger.error(
+                "Payment %s arrived for cancelled order %s whose stock is gone; refund it",
+                payment_id, order.order_number,
+            )
+        elif outcome == PaymentOutcome.REINSTATED:
+            logger.warning("Payment %s reinstated cancelled order %s", payment_id, order.order_number)
+        return outcome
+    
+    def mark_failed(self, order: Order) -> PaymentOutcome:
+        """Cancel a pending order whose payment failed, return its stock and commit."""
+        order = self._lock(order)
+        if order.status != OrderStatus.PENDING:
+            self.db.rollback()
+            return PaymentOutcome.IGNORED
+        return self._cancel(order)
+    
+    def cancel(self, order: Order) -> PaymentOutcome:
+        """Cancel an order and commit, returning its stock unless it has shipped."""
+        order = self._lock(order)
+        if order.status == OrderStatus.CANCELLED:
+            self.db.rollback()
+            return PaymentOutcome.IGNORED
+        return self._cancel(order)
+    
+    def _cancel(self, order: Order) -> PaymentOutcome:
+        """Cancel a locked order; stock goes back while the order still holds it."""
+        if order.status in HOLDS_STOCK:
+            self.inventory_service.release_orders([order.id])
+        order.status = OrderStatus.CANCELLED
+        self.db.commit()
+        self.inventory_service.send_pending_alerts()
+        return PaymentOutcome.CANCELLED
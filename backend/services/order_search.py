@@ -0,0 +1,69 @@
+"""Admin order search service."""
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import desc
+from sqlalchemy.orm import Session, Query, selectinload
+from backend.db.models import Order, OrderItem, OrderStatus
+
+# Trigram indexes cannot serve patterns shorter than one trigram
+MIN_SUBSTRING_LENGTH = 3
+
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input matches literally."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class OrderSearchService:
+    """Service for searching orders by customer, number, tracking and date."""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def build_query(
+        self,
+        email: Optional[str] = None,
+        name: Optional[str] = None,
+        order_number: Optional[str] = None,
+        tracking_number: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        status: Optional[OrderStatus] = None,
+    ) -> Query:
+        """Build the filtered order query.
+        
+        Email, name and tracking number are case-insensitive substring matches
+        (served by trigram indexes); order number is a prefix match (served by
+        the varchar_pattern_ops index); the date range is half-open.
+        """
+        query = self.db.query(Order)
+        
+        if email:
+            query = query.filter(Order.customer_email.ilike(f"%{_escape_like(email)}%", escape="\\"))
+        if name:
+            query = query.filter(Order.customer_name.ilike(f"%{_escape_like(name)}%", escape="\\"))
+        if tracking_number:
+            query = query.filter(Order.tracking_number.ilike(f"%{_escape_like(tracking_number)}%", escape="\\"))
+        if order_number:
+            query = query.filter(Order.order_number.like(f"{_escape_like(order_number.upper())}%", escape="\\"))
+        if created_from:
+            query = query.filter(Order.created_at >= created_from)
+        if created_to:
+            query = query.filter(Order.created_at < created_to)
+        if status:
+            query = query.filter(Order.status == status)
+        
+        return query
+    
+    def search(self, skip: int = 0, limit: int = 50, **filters) -> tuple[list[Order], int]:
+        """Return one page of matching orders (newest first) and the total count."""
+        query = self.build_query(**filters)
+        total = query.count()
+        orders = (
+            query.options(selectinload(Order.items).selectinload(OrderItem.product))
+            .order_by(desc(Order.created_at), desc(Order.id))
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+        return orders, total
@@ -1,23 +1,37 @@
 """Payment processing service for Stripe and PayPal."""
-import stripe
-import paypalrestsdk
+from functools import lru_cache
 from typing import Optional, Dict
 from backend.app.config import get_settings
 from backend.db.models import Order, PaymentMethod
+from backend.app import tracing
+from backend.app.metrics import PAYMENT_PROVIDER_DURATION
 
 settings = get_settings()
 
-# Initialize Stripe
-if settings.STRIPE_SECRET_KEY:
-    stripe.api_key = settings.STRIPE_SECRET_KEY
 
-# Initialize PayPal
-if settings.PAYPAL_CLIENT_ID and settings.PAYPAL_CLIENT_SECRET:
-    paypalrestsdk.configure({
-        "mode": settings.PAYPAL_MODE,
-        "client_id": settings.PAYPAL_CLIENT_ID,
-        "client_secret": settings.PAYPAL_CLIENT_SECRET
-    })
+# Provider SDKs are slow to import, so they are loaded and configured on first use
+@lru_cache
+def _stripe():
+    """Return the configured ``stripe`` module."""
+    import stripe
+    
+    if settings.STRIPE_SECRET_KEY:
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
+
+
+@lru_cache
+def _paypal():
+    """Return the configured ``paypalrestsdk`` module."""
+    import paypalrestsdk
+    
+    if settings.PAYPAL_CLIENT_ID and settings.PAYPAL_CLIENT_SECRET:
+        paypalrestsdk.configure({
+            "mode": settings.PAYPAL_MODE,
+            "client_id": settings.PAYPAL_CLIENT_ID,
+            "client_secret": settings.PAYPAL_CLIENT_SECRET
+        })
+    return paypalrestsdk
 
 
 class PaymentService:
@@ -29,15 +43,19 @@ class PaymentService:
         if not settings.STRIPE_SECRET_KEY:
             raise ValueError("Stripe secret key not configured")
         
+        stripe = _stripe()
         try:
-            intent = stripe.PaymentIntent.create(
-                amount=int(order.total_cad * 100),  # Convert to cents
-                currency="cad",
-                metadata={
-                    "order_id": order.id,
-                    "order_number": order.order_number,
-                },
-            )
+            with tracing.span("payment.stripe.create_payment_intent", **{"order.id": order.id}), \
+                    PAYMENT_PROVIDER_DURATION.labels(provider="stripe", operation="create_payment_intent").time():
+                intent = stripe.PaymentIntent.create(
+                    amount=int(order.total_cad * 100),  # Convert to cents
+                    currency="cad",
+                    metadata={
+                        "order_id": order.id,
+                        "order_number": order.order_number,
+                        "traceparent": order.trace_parent or "",
+                    },
+                )
             return {
                 "client_secret": intent.client_secret,
                 "payment_intent_id": intent.id,
@@ -51,6 +69,7 @@ class PaymentService:
         if not settings.STRIPE_WEBHOOK_SECRET:
             raise ValueError("Stripe webhook secret not configured")
         
+        stripe = _stripe()
         try:
             event = stripe.Webhook.construct_event(
                 payload, signature, settings.STRIPE_WEBHOOK_SECRET
@@ -67,6 +86,7 @@ class PaymentService:
         if not settings.PAYPAL_CLIENT_ID or not settings.PAYPAL_CLIENT_SECRET:
             raise ValueError("PayPal credentials not configured")
         
+        paypalrestsdk = _paypal()
         payment = paypalrestsdk.Payment({
             "intent": "sale",
             "payer": {
@@ -86,7 +106,11 @@ class PaymentService:
             }
         })
         
-        if payment.create():
+        with tracing.span("payment.paypal.create_payment", **{"order.id": order.id}), \
+                PAYMENT_PROVIDER_DURATION.labels(provider="paypal", operation="create_payment").time():
+            created = payment.create()
+        
+        if created:
             return {
                 "payment_id": payment.id,
                 "approval_url": next(link.href for link in payment.links if link.rel == "approval_url"),
@@ -97,9 +121,13 @@ class PaymentService:
     @staticmethod
     def execute_paypal_payment(payment_id: str, payer_id: str) -> Dict:
         """Execute a PayPal payment."""
-        payment = paypalrestsdk.Payment.find(payment_id)
+        paypalrestsdk = _paypal()
+        with tracing.span("payment.paypal.execute_payment"), \
+                PAYMENT_PROVIDER_DURATION.labels(provider="paypal", operation="execute_payment").time():
+            payment = paypalrestsdk.Payment.find(payment_id)
+            executed = payment.execute({"payer_id": payer_id})
         
-        if payment.execute({"payer_id": payer_id}):
+        if executed:
             return {
                 "payment_id": payment.id,
                 "state": payment.state,
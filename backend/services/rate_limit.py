@@ -0,0 +1,152 @@
+"""Token-bucket rate limiting backed by Redis, with an in-process fallback."""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from fastapi import HTTPException, Request, status
+from backend.app.config import get_settings
+from backend.app.metrics import RATE_LIMIT_DECISIONS
+from backend.db.redis_client import get_redis
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Refill, take and report in one atomic round trip. Uses the Redis clock so
+# every API pod sees the same time.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(retry_after)}
+"""
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+# After a Redis failure, use the local limiter for this long before retrying
+REDIS_RETRY_SECONDS = 5.0
+LOCAL_MAX_KEYS = 10000
+
+
+def parse_rate(rate: str) -> tuple[int, float]:
+    """Parse "<requests>/<second|minute|hour>" into (capacity, tokens per second)."""
+    count, _, period = rate.partition("/")
+    capacity = int(count)
+    return capacity, capacity / _PERIODS[period.strip().rstrip("s")]
+
+
+class LocalTokenBucket:
+    """In-process token buckets, used while Redis is unavailable.
+    
+    Limits are per worker process, so the effective limit is looser than
+    with Redis; buckets are evicted least-recently-used beyond ``max_keys``.
+    """
+    
+    def __init__(self, max_keys: int = LOCAL_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def take(self, key: str, capacity: int, rate: float) -> tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            retry_after = 0.0
+            if allowed:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+
+class RateLimiter:
+    """Per-rule token buckets keyed by client identity (IP, email, username)."""
+    
+    def __init__(self, rules: dict[str, str]):
+        self.rules = {name: parse_rate(rate) for name, rate in rules.items()}
+        self.local = LocalTokenBucket()
+        self._script = None
+        self._redis_down_until = 0.0
+    
+    async def _take_redis(self, key: str, capacity: int, rate: float) -> Optional[tuple[bool, float]]:
+        """Take a token from Redis, or return None if Redis is unavailable."""
+        if time.monotonic() < self._redis_down_until:
+            return None
+        try:
+            if self._script is None:
+                self._script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+            allowed, retry_after = await self._script(keys=[key], args=[capacity, rate])
+        except Exception as exc:
+            self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+            logger.warning("Rate limiter falling back to local buckets: %s", exc)
+            return None
+        return bool(allowed), float(retry_after)
+    
+    async def hit(self, rule: str, identity: str) -> tuple[bool, float]:
+        """Consume one token for ``identity`` under ``rule``; return (allowed, retry_after_seconds)."""
+        capacity, rate = self.rules[rule]
+        key = f"ratelimit:{rule}:{identity.lower()[:200]}"
+        result = await self._take_redis(key, capacity, rate)
+        backend = "redis"
+        if result is None:
+            result = self.local.take(key, capacity, rate)
+            backend = "local"
+        RATE_LIMIT_DECISIONS.labels(
+            rule=rule, result="allowed" if result[0] else "limited", backend=backend
+        ).inc()
+        return result
+    
+    async def enforce(self, rule: str, *identities: str) -> None:
+        """Raise 429 with ``Retry-After`` if any identity is over the rule's limit."""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        for identity in identities:
+            allowed, retry_after = await self.hit(rule, identity)
+            if not allowed:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests, please retry later",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+
+
+def client_ip(request: Request) -> str:
+    """Client address (behind the ingress this relies on FORWARDED_ALLOW_IPS)."""
+    return request.client.host if request.client else "unknown"
+
+
+def limit_by_ip(rule: str):
+    """Dependency applying ``rule`` to the client IP."""
+    async def dependency(request: Request) -> None:
+        await rate_limiter.enforce(rule, f"ip:{client_ip(request)}")
+    return dependency
+
+
+rate_limiter = RateLimiter({
+    "login": settings.RATE_LIMIT_LOGIN,
+    "login_user": settings.RATE_LIMIT_LOGIN_USER,
+    "checkout": settings.RATE_LIMIT_CHECKOUT,
+    "webhook": settings.RATE_LIMIT_WEBHOOK,
+    "admission": settings.RATE_LIMIT_ADMISSION,
+})
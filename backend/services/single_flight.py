@@ -0,0 +1,67 @@
+"""Request coalescing ("single flight") for hot reads.
+
+When many requests ask for the same thing at once, e.g. one product page at
+a launch, only the first runs the fetch; the others wait for it and share its
+result. The result is also reused for ``SINGLE_FLIGHT_TTL_MS`` after it
+arrives, which covers the burst that comes in just behind. Fetches are
+synchronous database reads and run in a worker thread, so the event loop keeps
+accepting the requests that join them.
+
+Calls are counted in ``single_flight_requests_total`` by route and result
+(``fetch``, ``shared`` or ``cached``); the collapse ratio is
+``1 - fetch / total``.
+"""
+import asyncio
+import time
+from typing import Any, Callable, Hashable
+from backend.app.config import get_settings
+from backend.app.metrics import SINGLE_FLIGHT_REQUESTS
+
+settings = get_settings()
+
+
+class SingleFlight:
+    """Share in-flight and just-finished fetches among identical requests, per worker process.
+    
+    Errors are shared with the requests waiting on a fetch but never reused
+    afterwards. Results are shared objects, so callers must not mutate them.
+    """
+    
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self._results: dict[Hashable, tuple[float, Any]] = {}
+    
+    async def do(self, route: str, params: Hashable, fetch: Callable[[], Any]) -> Any:
+        """Return ``fetch()`` for ``(route, params)``, joining a running or recent call if there is one."""
+        key = (route, params)
+        cached = self._results.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            SINGLE_FLIGHT_REQUESTS.labels(route=route, result="cached").inc()
+            return cached[1]
+        
+        call = self._calls.get(key)
+        if call is None:
+            SINGLE_FLIGHT_REQUESTS.labels(route=route, result="fetch").inc()
+            # A task of its own, so the first caller disconnecting does not cancel it for the rest
+            call = asyncio.ensure_future(asyncio.to_thread(fetch))
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            SINGLE_FLIGHT_REQUESTS.labels(route=route, result="shared").inc()
+        return await asyncio.shield(call)
+    
+    def _finish(self, key: Hashable, call: asyncio.Future) -> None:
+        del self._calls[key]
+        if call.cancelled() or call.exception() is not None or self.ttl <= 0:
+            return
+        entry = (time.monotonic() + self.ttl, call.result())
+        self._results[key] = entry
+        asyncio.get_running_loop().call_later(self.ttl, self._expire, key, entry)
+    
+    def _expire(self, key: Hashable, entry: tuple[float, Any]) -> None:
+        if self._results.get(key) is entry:
+            del self._results[key]
+
+
+single_flight = SingleFlight(ttl=settings.SINGLE_FLIGHT_TTL_MS / 1000)
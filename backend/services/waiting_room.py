@@ -0,0 +1,255 @@
+"""Checkout admission control for launch-day traffic.
+
+Buyers ask for an admission before checking out. An admission holds the
+requested quantities for ``WAITING_ROOM_ADMISSION_SECONDS``; while stock minus
+held quantities is too low, buyers are told to wait (or that the product is
+sold out) without the checkout touching the database. Holds live in Redis, so
+every worker and pod shares them.
+"""
+import json
+import logging
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+from backend.app.config import get_settings
+from backend.app.metrics import WAITING_ROOM_DECISIONS
+from backend.db.models import Inventory, Product
+from backend.db.redis_client import get_redis
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Admit a cart only if every product has enough unheld stock, then hold it.
+# KEYS: one hold set per product (members "<token>|<quantity>", scored by expiry).
+# ARGV: hold ms, token, then (available, quantity) per key.
+# Returns {1} when admitted, or {0, retry_ms} to wait for the earliest hold to expire.
+ADMIT_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local hold_ms = tonumber(ARGV[1])
+local token = ARGV[2]
+local retry_ms = 0
+for i, key in ipairs(KEYS) do
+    local available = tonumber(ARGV[1 + 2 * i])
+    local quantity = tonumber(ARGV[2 + 2 * i])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now)
+    local held = 0
+    for _, member in ipairs(redis.call('ZRANGE', key, 0, -1)) do
+        held = held + tonumber(string.match(member, '|(%d+)$'))
+    end
+    if available - held < quantity then
+        local first = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        local wait = math.max(tonumber(first[2]) - now, 1)
+        if wait > retry_ms then
+            retry_ms = wait
+        end
+    end
+end
+if retry_ms > 0 then
+    return {0, retry_ms}
+end
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now + hold_ms, token .. '|' .. ARGV[2 + 2 * i])
+    redis.call('PEXPIRE', key, hold_ms)
+end
+return {1}
+"""
+
+# Take an admission token so no other checkout can use it.
+# KEYS: the token key. Returns {admitted quantities, remaining ms}, or nil if absent.
+CLAIM_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+    return false
+end
+local ttl = redis.call('PTTL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return {raw, ttl}
+"""
+
+# Shorten a used admission's holds to ARGV[2] ms instead of dropping them, so
+# workers whose stock cache predates the order cannot over-admit meanwhile.
+# KEYS: the hold sets. ARGV: token, linger ms, then quantities.
+RELEASE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+for i = 1, #KEYS do
+    redis.call('ZADD', KEYS[i], 'XX', now + tonumber(ARGV[2]), ARGV[1] .. '|' .. ARGV[2 + i])
+end
+return 1
+"""
+
+
+def _hold_key(product_id: int) -> str:
+    return f"waitingroom:holds:{product_id}"
+
+
+def _token_key(token: str) -> str:
+    return f"waitingroom:token:{token}"
+
+
+class WaitingRoom:
+    """Issue, verify and release checkout admissions.
+    
+    A checkout claims its admission token, so concurrent checkouts cannot
+    share one; the token is restored if the checkout fails before its order
+    is committed. If Redis is unavailable the room fails open: buyers are
+    admitted and checkout falls back to the database's own stock check.
+    """
+    
+    def __init__(self):
+        self._admit = None
+        self._claim = None
+        self._release = None
+        self._stock: dict[int, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+    
+    def available_stock(self, db: Session, product_ids: set[int]) -> dict[int, int]:
+        """Stock of active products, cached for ``WAITING_ROOM_STOCK_CACHE_SECONDS``.
+        
+        Unknown or inactive products are missing from the result.
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = {pid: entry for pid, entry in self._stock.items() if pid in product_ids and entry[1] > now}
+        missing = product_ids - cached.keys()
+        if missing:
+            rows = (
+                db.query(Inventory)
+                .join(Product, Product.id == Inventory.product_id)
+                .filter(Inventory.product_id.in_(missing), Product.is_active == True)
+                .all()
+            )
+            expires = now + settings.WAITING_ROOM_STOCK_CACHE_SECONDS
+            fetched = {row.product_id: (row.stock_quantity, expires) for row in rows}
+            # Products without a row are cached as sold out so they are not re-queried
+            fetched.update({pid: (-1, expires) for pid in missing - fetched.keys()})
+            with self._lock:
+                self._stock.update(fetched)
+            cached.update(fetched)
+        return {pid: quantity for pid, (quantity, _) in cached.items() if quantity >= 0}
+    
+    async def admit(self, db: Session, quantities: dict[int, int]) -> dict:
+        """Try to admit a cart of ``{product_id: quantity}``.
+        
+        Returns ``{"status": "admitted", "token", "expires_at"}`` or
+        ``{"status": "waiting", "retry_after"}``; raises 404 for unknown
+        products and 409 when a product no longer has enough stock.
+        """
+        stock = self.available_stock(db, set(quantities))
+        for product_id, quantity in quantities.items():
+            if product_id not in stock:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Product with ID {product_id} not found"
+                )
+            if stock[product_id] < quantity:
+                WAITING_ROOM_DECISIONS.labels(result="sold_out").inc()
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Product {product_id} is sold out. Available: {stock[product_id]}"
+                )
+        
+        token = secrets.token_urlsafe(16)
+        hold_seconds = settings.WAITING_ROOM_ADMISSION_SECONDS
+        product_ids = sorted(quantities)
+        args = [hold_seconds * 1000, token]
+        for product_id in product_ids:
+            args += [stock[product_id], quantities[product_id]]
+        
+        try:
+            if self._admit is None:
+                self._admit = get_redis().register_script(ADMIT_SCRIPT)
+            result = await self._admit(keys=[_hold_key(pid) for pid in product_ids], args=args)
+            if result[0] == 1:
+                await get_redis().set(_token_key(token), json.dumps(quantities), ex=hold_seconds)
+        except Exception as exc:
+            logger.warning("Waiting room unavailable, admitting without a hold: %s", exc)
+            WAITING_ROOM_DECISIONS.labels(result="unavailable").inc()
+            return {"status": "admitted", "token": token, "expires_at": datetime.utcnow() + timedelta(seconds=hold_seconds)}
+        
+        if result[0] == 0:
+            WAITING_ROOM_DECISIONS.labels(result="waiting").inc()
+            retry_after = min(int(result[1]) / 1000, settings.WAITING_ROOM_POLL_SECONDS)
+            return {"status": "waiting", "retry_after": max(1, round(retry_after))}
+        
+        WAITING_ROOM_DECISIONS.labels(result="admitted").inc()
+        return {"status": "admitted", "token": token, "expires_at": datetime.utcnow() + timedelta(seconds=hold_seconds)}
+    
+    async def verify(self, token: Optional[str], quantities: dict[int, int]) -> Optional[dict]:
+        """Claim ``token``, raising 403 unless it is a live admission covering ``quantities``.
+        
+        Returns the claimed admission for ``release`` or ``restore``, or None
+        if Redis is unavailable and the token was accepted unverified.
+        """
+        if not token:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Checkout admission required (X-Admission-Token)"
+            )
+        try:
+            if self._claim is None:
+                self._claim = get_redis().register_script(CLAIM_SCRIPT)
+            claimed = await self._claim(keys=[_token_key(token)])
+        except Exception as exc:
+            logger.warning("Waiting room unavailable, accepting admission unverified: %s", exc)
+            return None
+        if not claimed:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Checkout admission expired, already used, or does not cover this cart"
+            )
+        
+        raw, ttl_ms = claimed
+        admission = {
+            "token": token,
+            "raw": raw,
+            "ttl_ms": int(ttl_ms),
+            "quantities": {int(pid): quantity for pid, quantity in json.loads(raw).items()},
+        }
+        if any(admission["quantities"].get(pid, 0) < quantity for pid, quantity in quantities.items()):
+            # Not this cart's admission; leave it usable for the right one
+            await self.restore(admission)
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Checkout admission expired, already used, or does not cover this cart"
+            )
+        return admission
+    
+    async def restore(self, admission: Optional[dict]) -> None:
+        """Put back an admission claimed by a checkout that failed before committing."""
+        if not admission or admission["ttl_ms"] <= 0:
+            return
+        try:
+            await get_redis().set(_token_key(admission["token"]), admission["raw"], px=admission["ttl_ms"], nx=True)
+        except Exception as exc:
+            # The buyer has to ask for a new admission
+            logger.warning("Failed to restore checkout admission: %s", exc)
+    
+    async def release(self, admission: Optional[dict]) -> None:
+        """Let a claimed admission's holds lapse once its order has deducted the stock."""
+        if not admission:
+            return
+        quantities = admission["quantities"]
+        try:
+            if self._release is None:
+                self._release = get_redis().register_script(RELEASE_SCRIPT)
+            linger_ms = int(settings.WAITING_ROOM_STOCK_CACHE_SECONDS * 1000)
+            await self._release(
+                keys=[_hold_key(pid) for pid in quantities],
+                args=[admission["token"], linger_ms, *quantities.values()],
+            )
+        except Exception as exc:
+            # Holds expire on their own
+            logger.warning("Failed to release checkout admission: %s", exc)
+            return
+        with self._lock:
+            for pid in quantities:
+                self._stock.pop(pid, None)
+
+
+waiting_room = WaitingRoom()